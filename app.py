@@ -15,6 +15,13 @@ from routes.pembayaran_routes import pembayaran_bp
 
 from models.Warung import Warung
 from models.Makanan import Makanan
+from models import db as models_db
+from models import query_stats
+from models import migrations
+from models import explain_check
+from models import image_store
+from models import image_jobs
+from models import terjual
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,9 +33,69 @@ app.config.update({
     "MYSQL_HOST": os.environ.get("MYSQL_HOST", "127.0.0.1"),
     "MYSQL_USER": os.environ.get("MYSQL_USER", "eatrushd"),
     "MYSQL_PASSWORD": os.environ.get("MYSQL_PASSWORD", "6!6Sgk1KP5s+Md"),
-    "MYSQL_DB": os.environ.get("MYSQL_DB", "eatrushd_eatrushh")
+    "MYSQL_DB": os.environ.get("MYSQL_DB", "eatrushd_eatrushh"),
+    # replica baca untuk finder get_db_connection(readonly=True); kosong = semua ke primary.
+    # USER/PASSWORD/DB replica yang kosong ikut nilai primary.
+    "MYSQL_REPLICA_HOST": os.environ.get("MYSQL_REPLICA_HOST", ""),
+    "MYSQL_REPLICA_PORT": int(os.environ.get("MYSQL_REPLICA_PORT", 3306)),
+    "MYSQL_REPLICA_USER": os.environ.get("MYSQL_REPLICA_USER", ""),
+    "MYSQL_REPLICA_PASSWORD": os.environ.get("MYSQL_REPLICA_PASSWORD", ""),
+    "MYSQL_REPLICA_DB": os.environ.get("MYSQL_REPLICA_DB", ""),
+    # detik bacaan session tetap ke primary setelah request tulis (read-your-writes)
+    "MYSQL_STICKY_PRIMARY_SECONDS": float(os.environ.get("MYSQL_STICKY_PRIMARY_SECONDS", 5)),
+    "MYSQL_POOL_SIZE": int(os.environ.get("MYSQL_POOL_SIZE", 5)),
+    "MYSQL_POOL_MAX_OVERFLOW": int(os.environ.get("MYSQL_POOL_MAX_OVERFLOW", 10)),
+    "MYSQL_POOL_RECYCLE": int(os.environ.get("MYSQL_POOL_RECYCLE", 1800)),
+    "MYSQL_POOL_PRE_PING": os.environ.get("MYSQL_POOL_PRE_PING", "1") == "1",
+    "MYSQL_POOL_TIMEOUT": float(os.environ.get("MYSQL_POOL_TIMEOUT", 10)),
+    # server-side prepared statement untuk query panas yang memakai cursor(prepared=True)
+    "MYSQL_PREPARED_STATEMENTS": os.environ.get("MYSQL_PREPARED_STATEMENTS", "0") == "1",
+    "MYSQL_PREPARED_CACHE_SIZE": int(os.environ.get("MYSQL_PREPARED_CACHE_SIZE", 32)),
+    "DB_REQUEST_SCOPED": os.environ.get("DB_REQUEST_SCOPED", "1") == "1",
+    # thread untuk fan_out (query independen paralel dalam satu request); 0 = berurutan
+    "DB_FANOUT_WORKERS": int(os.environ.get("DB_FANOUT_WORKERS", 4)),
+    # @transactional_retry: ulangi transaksi pesanan yang kena deadlock / lock wait timeout
+    "DB_RETRY_ATTEMPTS": int(os.environ.get("DB_RETRY_ATTEMPTS", 4)),
+    "DB_RETRY_BASE_DELAY": float(os.environ.get("DB_RETRY_BASE_DELAY", 0.05)),
+    "DB_RETRY_MAX_DELAY": float(os.environ.get("DB_RETRY_MAX_DELAY", 1.0)),
+    # gambar di disk (content-addressed); kosong = <instance>/images
+    "IMAGE_STORE_DIR": os.environ.get("IMAGE_STORE_DIR", ""),
+    # "" = send_file, "x-sendfile" (Apache/lighttpd) atau "x-accel-redirect" (nginx)
+    "IMAGE_SENDFILE": os.environ.get("IMAGE_SENDFILE", ""),
+    "IMAGE_ACCEL_PREFIX": os.environ.get("IMAGE_ACCEL_PREFIX", "/_gambar/"),
+    # batas ukuran request (upload); lebih besar -> 413 sebelum body dibaca
+    "MAX_CONTENT_LENGTH": int(os.environ.get("MAX_CONTENT_LENGTH", 12 * 1024 * 1024)),
+    # anggaran piksel upload (lebar x tinggi), dicek dari header sebelum decode
+    "IMAGE_MAX_PIXELS": int(os.environ.get("IMAGE_MAX_PIXELS", 40_000_000)),
+    # LRU gambar panas per proses worker (byte); 0 = mati
+    "IMAGE_LRU_BYTES": int(os.environ.get("IMAGE_LRU_BYTES", 64 * 1024 * 1024)),
+    # proses encoder gambar upload di background; 0 = inline di request
+    "IMAGE_WORKERS": int(os.environ.get("IMAGE_WORKERS", 2)),
+    # varian ukuran (?w=) yang dibuat saat upload
+    "IMAGE_VARIANT_WIDTHS": tuple(int(w) for w in os.environ.get("IMAGE_VARIANT_WIDTHS", "160,400,800").split(",")),
+    # encoding tambahan tiap varian, dipilih dari header Accept (AVIF dilewati jika Pillow tidak bisa)
+    "IMAGE_ALT_FORMATS": tuple(f for f in os.environ.get("IMAGE_ALT_FORMATS", "AVIF,JPEG").upper().split(",") if f),
+    "SQL_STATS_ENABLED": os.environ.get("SQL_STATS_ENABLED", "1") == "1",
+    "SQL_STATS_TOP_N": int(os.environ.get("SQL_STATS_TOP_N", 5)),
+    "SQL_STATS_LOG_THRESHOLD_MS": float(os.environ.get("SQL_STATS_LOG_THRESHOLD_MS", 50)),
+    # "warn" / "raise" saat development untuk menangkap pola N+1
+    "SQL_REPEAT_DETECTION": os.environ.get("SQL_REPEAT_DETECTION", "off"),
+    "SQL_REPEAT_THRESHOLD": int(os.environ.get("SQL_REPEAT_THRESHOLD", 3)),
 })
 
+# urutan penting: after_request dijalankan terbalik, jadi commit unit of work
+# (models_db) berjalan sebelum ringkasan SQL ditulis ke header
+query_stats.init_app(app)
+models_db.init_app(app)
+# perintah `flask db status|upgrade|check-indexes|explain`
+migrations.init_app(app)
+explain_check.init_app(app)
+# perintah `flask images migrate|optimize|lqip` + X-Sendfile
+image_store.init_app(app)
+image_jobs.init_app(app)
+# perintah `flask terjual check [--fix]`
+terjual.init_app(app)
+
 def safe_register(bp, name=None):
     try:
         if bp:
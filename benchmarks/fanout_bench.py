@@ -0,0 +1,82 @@
+"""
+Latensi sebelum/sesudah fan_out untuk tiga route yang query-nya dijalankan paralel.
+
+Setiap route diminta berulang kali lewat Flask test client, bergantian antara
+DB_FANOUT_WORKERS=0 (berurutan, perilaku lama) dan paralel. Yang dilaporkan
+p50/p95/rata-rata per mode. Penghematan sebanding dengan round-trip ke MySQL,
+jadi ukur terhadap server yang sama jaraknya dengan produksi.
+
+Membutuhkan data seed (`flask --app app db explain --seed` di database scratch).
+
+    python benchmarks/fanout_bench.py --requests 200 --workers 4
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import url_for  # noqa: E402
+
+from app import app  # noqa: E402
+from models.explain_check import _context  # noqa: E402
+
+# (peran, endpoint, argumen url_for)
+ROUTES = [
+    ("pembeli", "home.home", {}),
+    ("pembeli", "obrolan.room_chat", {"id_ruang": "{ruang}"}),
+    ("penjual", "pesanan.detail_pesanan_warung", {"id_pesanan": "{pesanan_warung}"}),
+]
+
+
+def timed_requests(client, url, n):
+    durations = []
+    for _ in range(n):
+        start = time.perf_counter()
+        resp = client.get(url)
+        durations.append(time.perf_counter() - start)
+        if resp.status_code >= 400:
+            raise SystemExit(f"GET {url} -> {resp.status_code}")
+    return durations
+
+
+def summary(durations):
+    ordered = sorted(durations)
+    p95 = ordered[max(0, int(len(ordered) * 0.95) - 1)]
+    return statistics.median(ordered) * 1000, p95 * 1000, statistics.mean(ordered) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    app.config["SQL_REPEAT_DETECTION"] = "off"
+    with app.app_context():
+        ctx = _context()
+
+    print(f"{'route':<34}{'mode':<12}{'p50 ms':>9}{'p95 ms':>9}{'mean ms':>9}")
+    for role, endpoint, url_args in ROUTES:
+        url_args = {k: v.format(**ctx) if isinstance(v, str) else v for k, v in url_args.items()}
+        with app.test_request_context():
+            url = url_for(endpoint, **url_args)
+        with app.test_client() as client:
+            with client.session_transaction() as sess:
+                sess["user"] = {"IdPengguna": ctx[role], "NamaPengguna": f"bench_{role}", "Peran": role}
+            results = {"berurutan": [], "paralel": []}
+            # bergantian per blok supaya cache MySQL menguntungkan kedua mode sama rata
+            block = max(1, args.requests // 10)
+            for _ in range(10):
+                for mode, workers in (("berurutan", 0), ("paralel", args.workers)):
+                    app.config["DB_FANOUT_WORKERS"] = workers
+                    results[mode].extend(timed_requests(client, url, block))
+        for mode, durations in results.items():
+            p50, p95, mean = summary(durations)
+            print(f"{endpoint:<34}{mode:<12}{p50:>9.2f}{p95:>9.2f}{mean:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark server-side prepared statement untuk 10 statement terpanas.
+
+Setiap statement dijalankan N kali di satu koneksi, dua kali: lewat protokol teks
+biasa (server mem-parse SQL setiap kali) dan lewat cursor(prepared=True) dengan
+StatementCache (parse sekali, lalu COM_STMT_EXECUTE). Yang dilaporkan: waktu per
+eksekusi di sisi klien dan counter server Com_stmt_prepare / Com_stmt_execute
+sebagai bukti statement hanya di-parse sekali.
+
+Membutuhkan database berisi data (mis. hasil `flask db explain --seed`). UPDATE
+dijalankan di dalam transaksi yang di-rollback.
+
+    python benchmarks/prepared_statements_bench.py --iterations 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from models.Makanan import KOLOM_RINGKAS as MAKANAN_KOLOM  # noqa: E402
+from models.Warung import KOLOM_RINGKAS as WARUNG_KOLOM  # noqa: E402
+from models.db import ConnectionPool  # noqa: E402
+from models.read_models import MakananItem  # noqa: E402
+
+# (nama, sql, fungsi parameter dari contoh id)
+TOP_STATEMENTS = [
+    ("makanan_by_id", f"SELECT {MAKANAN_KOLOM} FROM Makanan WHERE IdMakanan=%s",
+     lambda s: (s["IdMakanan"],)),
+    ("warung_by_id", f"SELECT {WARUNG_KOLOM} FROM Warung WHERE IdWarung=%s",
+     lambda s: (s["IdWarung"],)),
+    ("menu_warung", f"SELECT {MakananItem.SELECT} FROM Makanan WHERE IdWarung=%s ORDER BY NamaMakanan ASC",
+     lambda s: (s["IdWarung"],)),
+    ("chat_history", "SELECT * FROM Obrolan WHERE IdRuang = %s ORDER BY Waktu ASC",
+     lambda s: (s["IdRuang"],)),
+    ("room_lookup", "SELECT IdRuang FROM Obrolan WHERE IdPengguna = %s AND IdWarung = %s LIMIT 1",
+     lambda s: (s["IdPengguna"], s["IdWarungChat"])),
+    ("status_pesanan", "SELECT Status FROM PesananWarung WHERE IdPesananWarung=%s",
+     lambda s: (s["IdPesananWarung"],)),
+    ("status_for_update", "SELECT Status FROM PesananWarung WHERE IdPesananWarung=%s FOR UPDATE",
+     lambda s: (s["IdPesananWarung"],)),
+    ("item_pesanan", "SELECT IdMakanan, BanyakPesanan FROM Pesanan WHERE IdPesananWarung=%s",
+     lambda s: (s["IdPesananWarung"],)),
+    ("update_status", "UPDATE PesananWarung SET Status=%s WHERE IdPesananWarung=%s",
+     lambda s: (s["Status"], s["IdPesananWarung"])),
+    ("restock", "UPDATE Makanan SET Stok = COALESCE(Stok,0) + %s WHERE IdMakanan=%s",
+     lambda s: (0, s["IdMakanan"])),
+]
+
+
+def sample_ids(conn):
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute("SELECT IdMakanan, IdWarung FROM Makanan LIMIT 1")
+        sample = dict(cur.fetchone())
+        cur.execute("SELECT IdRuang, IdPengguna, IdWarung AS IdWarungChat FROM Obrolan LIMIT 1")
+        sample.update(cur.fetchone())
+        cur.execute("SELECT IdPesananWarung, Status FROM PesananWarung LIMIT 1")
+        sample.update(cur.fetchone())
+        return sample
+    finally:
+        cur.close()
+
+
+def stmt_counters(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute("SHOW SESSION STATUS WHERE Variable_name IN ('Com_stmt_prepare', 'Com_stmt_execute')")
+        return {name: int(value) for name, value in cur.fetchall()}
+    finally:
+        cur.close()
+
+
+def run(conn, sql, params, iterations, prepared):
+    conn.start_transaction()
+    try:
+        cur = conn.cursor(prepared=prepared)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            cur.execute(sql, params)
+            if cur.with_rows:
+                cur.fetchall()
+        elapsed = time.perf_counter() - start
+        cur.close()
+    finally:
+        conn.rollback()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    connect_kwargs = {
+        "host": app.config["MYSQL_HOST"],
+        "user": app.config["MYSQL_USER"],
+        "password": app.config["MYSQL_PASSWORD"],
+        "database": app.config["MYSQL_DB"],
+        "consume_results": True,
+    }
+    pool = ConnectionPool(connect_kwargs, size=1, max_overflow=0, prepared=True)
+    conn = pool.acquire()
+    try:
+        sample = sample_ids(conn)
+        print(f"{'statement':<20}{'teks µs':>10}{'prepared µs':>13}{'hemat':>8}{'prepare':>9}{'execute':>9}")
+        total_text = total_prepared = 0.0
+        for name, sql, make_params in TOP_STATEMENTS:
+            params = make_params(sample)
+            run(conn, sql, params, 10, prepared=False)  # pemanasan buffer pool
+            text = run(conn, sql, params, args.iterations, prepared=False)
+            before = stmt_counters(conn)
+            prepared = run(conn, sql, params, args.iterations, prepared=True)
+            after = stmt_counters(conn)
+            total_text += text
+            total_prepared += prepared
+            per_text = text / args.iterations * 1e6
+            per_prepared = prepared / args.iterations * 1e6
+            print(f"{name:<20}{per_text:>10.1f}{per_prepared:>13.1f}{(1 - prepared / text) * 100:>7.1f}%"
+                  f"{after['Com_stmt_prepare'] - before['Com_stmt_prepare']:>9}"
+                  f"{after['Com_stmt_execute'] - before['Com_stmt_execute']:>9}")
+        print(f"{'total':<20}{total_text * 1000:>9.1f}ms{total_prepared * 1000:>11.1f}ms"
+              f"{(1 - total_prepared / total_text) * 100:>7.1f}%")
+        print("pool:", {k: v for k, v in pool.stats().items() if k.startswith("stmt_")})
+    finally:
+        conn.close()
+        pool.dispose()
+
+
+if __name__ == "__main__":
+    main()
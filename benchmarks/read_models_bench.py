@@ -0,0 +1,171 @@
+"""
+Benchmark pemetaan baris -> objek untuk halaman daftar.
+
+Membandingkan jalur lama (cursor dictionary -> objek Makanan/Pesanan lewat
+constructor keyword -> disalin lagi ke dict untuk template) dengan read model
+namedtuple (cursor tuple -> map_rows). Data dibuat di memori, tanpa database.
+
+    python benchmarks/read_models_bench.py
+    python benchmarks/read_models_bench.py --menu 10000 --orders 50000 --repeat 5
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.Makanan import Makanan  # noqa: E402
+from models.Pesanan import Pesanan  # noqa: E402
+from models.Warung import Warung  # noqa: E402
+from models.read_models import MakananItem, PesananPembeliItem, map_rows  # noqa: E402
+
+
+# Nilai contoh per kolom read model. Baris dibentuk dari _fields, jadi kolom baru
+# yang belum punya nilai di sini langsung gagal dengan KeyError yang jelas.
+LQIP_CONTOH = "data:image/webp;base64," + "A" * 200
+
+MENU_VALUES = {
+    "IdMakanan": lambda i: i,
+    "IdWarung": lambda i: i % 60 + 1,
+    "NamaMakanan": lambda i: f"Nasi Goreng {i}",
+    "HargaMakanan": lambda i: Decimal(15000 + i % 20 * 1000),
+    "DetailMakanan": lambda i: "Pedas manis",
+    "Stok": lambda i: i % 100,
+    "Rating": lambda i: Decimal("4.5"),
+    "AdaGambar": lambda i: i % 3 != 0,
+    "HashGambarMakanan": lambda i: "ab" * 32 if i % 3 else None,
+    "LqipMakanan": lambda i: LQIP_CONTOH if i % 3 else None,
+}
+
+ORDER_VALUES = {
+    "IdPesananWarung": lambda i: i,
+    "IdPembeli": lambda i: i % 300 + 1,
+    "IdWarung": lambda i: i % 60 + 1,
+    "TotalHarga": lambda i: Decimal(45000 + i % 50 * 1000),
+    "DeskripsiPesanan": lambda i: "Tanpa sambal",
+    "Status": lambda i: "Selesai",
+    "DibuatPada": lambda i: datetime(2024, 1, 1) - timedelta(minutes=i),
+    "NamaWarung": lambda i: f"Warung {i % 60}",
+}
+
+
+def make_rows(item_cls, values, n):
+    cols = item_cls._fields
+    makers = [values[col] for col in cols]
+    rows = [tuple(make(i) for make in makers) for i in range(n)]
+    return cols, rows
+
+
+def make_menu_rows(n):
+    return make_rows(MakananItem, MENU_VALUES, n)
+
+
+def make_order_rows(n):
+    return make_rows(PesananPembeliItem, ORDER_VALUES, n)
+
+
+def as_dicts(cols, rows):
+    return [dict(zip(cols, r)) for r in rows]
+
+
+# -------------------------
+# Jalur lama (disalin dari kode sebelum read model)
+# -------------------------
+def old_menu(dict_rows):
+    objs = [
+        Makanan(
+            id_makanan=r["IdMakanan"], nama=r["NamaMakanan"], harga=r["HargaMakanan"],
+            deskripsi=r["DetailMakanan"], rating=r["Rating"], id_warung=r["IdWarung"],
+            stok=r["Stok"], hash_gambar=r["HashGambarMakanan"], ada_gambar=r["AdaGambar"],
+        )
+        for r in dict_rows
+    ]
+    return [
+        {
+            "IdMakanan": m.get_id_makanan(),
+            "NamaMakanan": m.get_nama_makanan(),
+            "HargaMakanan": m.get_harga_makanan(),
+            "DetailMakanan": m.get_deskripsi_makanan(),
+            "Stok": m.get_stok_makanan(),
+            "GambarMakanan": f"/makanan/gambar/{m.get_id_makanan()}" if m.has_gambar() else None,
+        }
+        for m in objs
+    ]
+
+
+def old_orders(dict_rows):
+    hasil = []
+    for r in dict_rows:
+        waktu = r.get("DibuatPada")
+        waktu_str = (waktu.isoformat() if hasattr(waktu, "isoformat") else str(waktu))
+        warung_obj = Warung(id_warung=int(r["IdWarung"]), nama_warung=str(r.get("NamaWarung") or "Warung"))
+        hasil.append(Pesanan(
+            id_pesanan=int(r["IdPesananWarung"]), id_pembeli=int(r["IdPembeli"]),
+            id_warung=int(r["IdWarung"]), total_harga=float(r.get("TotalHarga") or 0.0),
+            status=str(r.get("Status") or ""), catatan=str(r.get("DeskripsiPesanan") or ""),
+            waktu_dibuat=waktu_str, details=[], warung=warung_obj,
+        ))
+    return hasil
+
+
+# -------------------------
+# Jalur baru
+# -------------------------
+def new_menu(cols, rows):
+    return map_rows(MakananItem, rows, cols)
+
+
+def new_orders(cols, rows):
+    return map_rows(PesananPembeliItem, rows, cols)
+
+
+def measure(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+        del result
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return best, retained, peak
+
+
+def report(label, n, stats):
+    best, retained, peak = stats
+    print(f"  {label:<8} {best * 1000:9.1f} ms   {retained / 1e6:8.2f} MB tersimpan   "
+          f"{peak / 1e6:8.2f} MB puncak   {retained / n:6.0f} B/baris")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--menu", type=int, default=10000)
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cols, rows = make_menu_rows(args.menu)
+    dict_rows = as_dicts(cols, rows)
+    print(f"Menu: {args.menu} baris")
+    report("lama", args.menu, measure(lambda: old_menu(dict_rows), args.repeat))
+    report("baru", args.menu, measure(lambda: new_menu(cols, rows), args.repeat))
+
+    cols, rows = make_order_rows(args.orders)
+    dict_rows = as_dicts(cols, rows)
+    print(f"Pesanan: {args.orders} baris")
+    report("lama", args.orders, measure(lambda: old_orders(dict_rows), args.repeat))
+    report("baru", args.orders, measure(lambda: new_orders(cols, rows), args.repeat))
+
+
+if __name__ == "__main__":
+    main()
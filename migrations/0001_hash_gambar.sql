@@ -0,0 +1,7 @@
+-- Versi gambar: sha256 isi BLOB, dipakai finder ringkas (tanpa BLOB) sebagai
+-- penanda versi gambar. Baris lama diisi langsung dari BLOB yang ada.
+ALTER TABLE Makanan ADD COLUMN HashGambarMakanan CHAR(64) NULL AFTER SizeGambarMakanan;
+ALTER TABLE Warung ADD COLUMN HashGambarWarung CHAR(64) NULL AFTER SizeGambarWarung;
+
+UPDATE Makanan SET HashGambarMakanan = SHA2(GambarMakanan, 256) WHERE GambarMakanan IS NOT NULL;
+UPDATE Warung SET HashGambarWarung = SHA2(GambarWarung, 256) WHERE GambarWarung IS NOT NULL;
@@ -0,0 +1,22 @@
+-- Paket index untuk predikat jalur panas (lihat HOT_PREDICATES di models/migrations.py).
+-- Index yang kolom depannya sudah dilayani index lain (mis. index foreign key) dilewati runner.
+
+-- isi room chat: WHERE IdRuang = ? ORDER BY Waktu
+CREATE INDEX idx_obrolan_ruang_waktu ON Obrolan (IdRuang, Waktu);
+-- cari ruang + pesan terakhir per pasangan pembeli/warung di inbox
+CREATE INDEX idx_obrolan_pengguna_warung_waktu ON Obrolan (IdPengguna, IdWarung, Waktu);
+
+-- dashboard & daftar pesanan warung per periode
+CREATE INDEX idx_pesananwarung_warung_dibuat ON PesananWarung (IdWarung, DibuatPada);
+-- keranjang / daftar pesanan pembeli per status
+CREATE INDEX idx_pesananwarung_pembeli_status ON PesananWarung (IdPembeli, Status);
+
+-- item pesanan: jumlah terjual per makanan dan detail per pesanan warung
+CREATE INDEX idx_pesanan_makanan ON Pesanan (IdMakanan);
+CREATE INDEX idx_pesanan_pesananwarung ON Pesanan (IdPesananWarung);
+
+-- menu warung, urut nama
+CREATE INDEX idx_makanan_warung_nama ON Makanan (IdWarung, NamaMakanan);
+
+-- warung milik penjual (require_penjual, home_warung)
+CREATE INDEX idx_warung_penjual ON Warung (IdPenjual);
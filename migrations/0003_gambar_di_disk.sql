@@ -0,0 +1,11 @@
+-- Gambar pindah ke penyimpanan content-addressed di disk (models/image_store.py).
+-- Kolom HashGambar* sekarang menunjuk file sha256; BLOB dikosongkan oleh
+-- `flask images migrate`. Penanda "ada gambar" membaca kolom hash.
+ALTER TABLE Pengguna ADD COLUMN HashGambarPengguna CHAR(64) NULL AFTER MimeGambarPengguna;
+
+UPDATE Pengguna SET HashGambarPengguna = SHA2(GambarPengguna, 256)
+    WHERE GambarPengguna IS NOT NULL AND HashGambarPengguna IS NULL;
+UPDATE Makanan SET HashGambarMakanan = SHA2(GambarMakanan, 256)
+    WHERE GambarMakanan IS NOT NULL AND HashGambarMakanan IS NULL;
+UPDATE Warung SET HashGambarWarung = SHA2(GambarWarung, 256)
+    WHERE GambarWarung IS NOT NULL AND HashGambarWarung IS NULL;
@@ -0,0 +1,15 @@
+-- Antrean pemrosesan gambar upload (models/image_jobs.py). Satu baris per upload;
+-- UI penjual mem-poll Status sampai 'selesai' (atau 'usang' jika sudah ada upload
+-- yang lebih baru, 'gagal' jika encoder error dan file asli tetap dipakai).
+CREATE TABLE IF NOT EXISTS AntreanGambar (
+    IdJob INT AUTO_INCREMENT PRIMARY KEY,
+    Jenis VARCHAR(16) NOT NULL,
+    IdObjek INT NOT NULL,
+    HashAsli CHAR(64) NOT NULL,
+    HashHasil CHAR(64) NULL,
+    Status ENUM('antri', 'selesai', 'usang', 'gagal') NOT NULL DEFAULT 'antri',
+    Pesan VARCHAR(255) NULL,
+    DibuatPada DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    SelesaiPada DATETIME NULL,
+    KEY idx_antreangambar_objek (Jenis, IdObjek)
+);
@@ -0,0 +1,5 @@
+-- Placeholder LQIP (data URI WEBP 16 px) yang dihitung saat upload
+-- (image_store.placeholder). Ikut dibaca finder ringkas, jadi halaman daftar bisa
+-- menggambar kartu sebelum thumbnail datang. Gambar lama: `flask images lqip`.
+ALTER TABLE Makanan ADD COLUMN LqipMakanan VARCHAR(400) NULL AFTER HashGambarMakanan;
+ALTER TABLE Warung ADD COLUMN LqipWarung VARCHAR(400) NULL AFTER HashGambarWarung;
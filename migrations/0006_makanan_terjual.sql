@@ -0,0 +1,22 @@
+-- Counter jumlah terjual per makanan (models/terjual.py): dijaga Pesanan.update_status
+-- saat pesanan menjadi / berhenti 'Selesai', jadi urutan terlaris di home tidak lagi
+-- menjumlahkan seluruh tabel Pesanan per request. Selisih: `flask terjual check --fix`.
+-- Skema lama sudah punya kolom Terjual (dibaca home sebelum ini): ADD dilewati runner
+-- jika kolomnya ada, lalu definisinya disamakan (NULL -> 0, NOT NULL DEFAULT 0).
+ALTER TABLE Makanan ADD COLUMN Terjual INT NOT NULL DEFAULT 0;
+UPDATE Makanan SET Terjual = 0 WHERE Terjual IS NULL;
+ALTER TABLE Makanan MODIFY COLUMN Terjual INT NOT NULL DEFAULT 0;
+
+UPDATE Makanan m
+    JOIN (
+        SELECT p.IdMakanan, SUM(p.BanyakPesanan) AS Jumlah
+        FROM Pesanan p
+        JOIN PesananWarung pw ON pw.IdPesananWarung = p.IdPesananWarung
+        WHERE pw.Status = 'Selesai'
+        GROUP BY p.IdMakanan
+    ) s ON s.IdMakanan = m.IdMakanan
+    SET m.Terjual = s.Jumlah;
+
+-- ORDER BY Terjual DESC/ASC, IdMakanan DESC/ASC dibaca langsung dari index
+-- (InnoDB menyimpan primary key di setiap index sekunder)
+CREATE INDEX idx_makanan_terjual ON Makanan (Terjual);
@@ -92,6 +92,7 @@ class AuthModel:
                 return jsonify({'status': 'success', 'message': 'Email sudah terdaftar. Login otomatis.'})
     
             try:
+                conn.start_transaction()
                 cur2 = conn.cursor()
                 cur2.execute(
                     "INSERT INTO Pengguna (NamaPengguna, Email, Password, Peran) VALUES (%s, %s, %s, %s)",
@@ -16,6 +16,10 @@ class Keranjang:
         return asdict(self)
 
 def normalize_item(raw: Dict[str, Any]) -> Keranjang:
+    item, _ = _normalize_item_with_makanan(raw)
+    return item
+
+def _normalize_item_with_makanan(raw: Dict[str, Any]) -> Tuple[Keranjang, Makanan]:
     if not raw:
         raise ValueError("Payload item kosong")
     try:
@@ -46,7 +50,7 @@ def normalize_item(raw: Dict[str, Any]) -> Keranjang:
     except Exception:
         harga = 0.0
 
-    return Keranjang(
+    item = Keranjang(
         id_makanan=id_makanan,
         id_warung=id_warung,
         nama=nama,
@@ -54,6 +58,7 @@ def normalize_item(raw: Dict[str, Any]) -> Keranjang:
         qty=qty,
         note=note,
     )
+    return item, m
 
 def find_index(cart: List[Dict[str, Any]], id_makanan: int, note: Optional[str] = None) -> Tuple[int, Optional[Dict[str, Any]]]:
     target_id = int(id_makanan)
@@ -74,8 +79,9 @@ def find_index(cart: List[Dict[str, Any]], id_makanan: int, note: Optional[str]
             continue
     return -1, None
 
-def check_stock(id_makanan: int, requested_qty: int) -> Tuple[bool, int]:
-    m = Makanan().get_by_id(id_makanan)
+def check_stock(id_makanan: int, requested_qty: int, makanan: Optional[Makanan] = None) -> Tuple[bool, int]:
+    # makanan yang sudah diambil pemanggil dipakai ulang, tidak query lagi
+    m = makanan if makanan is not None else Makanan().get_by_id(id_makanan)
     if not m:
         return False, 0
     try:
@@ -160,6 +166,7 @@ def delete_user_carts_db(user_id: int) -> None:
         from .db import get_db_connection
         conn = get_db_connection()
         cur = conn.cursor()
+        conn.start_transaction()
         cur.execute(
             "DELETE p FROM Pesanan p "
             "JOIN PesananWarung pw ON p.IdPesananWarung = pw.IdPesananWarung "
@@ -195,8 +202,12 @@ def create_or_replace_cart_db(id_pembeli: int, id_warung: int, items: List[Dict[
         except Exception:
             return False, "Format item tidak valid"
 
+    makanan_map = Makanan().get_by_ids(stok_map)
+
     for mid, total_req in stok_map.items():
-        ok, sisa = check_stock(mid, total_req)
+        if mid not in makanan_map:
+            return False, f"Makanan id={mid} tidak ditemukan"
+        ok, sisa = check_stock(mid, total_req, makanan=makanan_map[mid])
         if not ok:
             return False, f"Stok tidak cukup untuk id={mid} (Diminta: {total_req}, Sisa: {sisa})"
 
@@ -208,7 +219,7 @@ def create_or_replace_cart_db(id_pembeli: int, id_warung: int, items: List[Dict[
         except Exception:
             continue
         
-        m = Makanan().get_by_id(mid)
+        m = makanan_map.get(mid)
         if not m:
             return False, f"Makanan id={mid} tidak ditemukan"
         
@@ -225,7 +236,8 @@ def create_or_replace_cart_db(id_pembeli: int, id_warung: int, items: List[Dict[
         from .db import get_db_connection
         conn = get_db_connection()
         cur = conn.cursor()
-        
+        conn.start_transaction()
+
         cur.execute(
             "DELETE p FROM Pesanan p JOIN PesananWarung pw ON p.IdPesananWarung = pw.IdPesananWarung WHERE pw.IdPembeli=%s AND pw.Status='Keranjang'",
             (int(id_pembeli),)
@@ -291,7 +303,7 @@ def _upsert_db_cart_from_session(user_id: int, warung_id: int) -> None:
 
 def add_item_to_server_cart(payload: Dict[str, Any], user_id: int) -> Tuple[bool, str]:
     try:
-        item = normalize_item(payload)
+        item, makanan = _normalize_item_with_makanan(payload)
     except Exception as e:
         return False, f"Payload item tidak valid: {e}"
 
@@ -318,7 +330,7 @@ def add_item_to_server_cart(payload: Dict[str, Any], user_id: int) -> Tuple[bool
     current_id_usage = sum(int(x.get('qty', 0)) for x in cart if int(x.get('id_makanan', 0)) == int(item.id_makanan))
     total_needed = current_id_usage + int(item.qty)
 
-    ok, avail = check_stock(item.id_makanan, total_needed)
+    ok, avail = check_stock(item.id_makanan, total_needed, makanan=makanan)
     if not ok:
         return False, f"Stok tidak cukup (tersisa {avail})"
 
@@ -1,45 +1,23 @@
 # models/Makanan.py
-from .db import get_db_connection 
+from .db import after_commit, get_db_connection
+from .read_models import MakananItem, fetch_all
+from . import image_jobs, image_store
 import base64
-from io import BytesIO
-from PIL import Image
-
-def process_image_bytes(input_bytes: bytes, max_width=800, max_height=800, quality=80, target_format="WEBP"):
-    """
-    Resize (maintain aspect ratio) if larger than max, then encode to target_format.
-    Returns (out_bytes, mime_type, out_size, width, height).
-    """
-    img = Image.open(BytesIO(input_bytes))
-    img = img.convert("RGBA") if img.mode in ("LA", "RGBA", "P") else img.convert("RGB")
-
-    orig_w, orig_h = img.size
-    ratio = min(max_width / orig_w, max_height / orig_h, 1.0)
-    if ratio < 1.0:
-        new_w = int(orig_w * ratio)
-        new_h = int(orig_h * ratio)
-        img = img.resize((new_w, new_h), Image.LANCZOS)
-    else:
-        new_w, new_h = orig_w, orig_h
-
-    out = BytesIO()
-    fmt = target_format.upper()
-    save_kwargs = {}
-    if fmt in ("JPEG", "JPG"):
-        save_kwargs["quality"] = quality
-        save_kwargs["optimize"] = True
-    elif fmt == "WEBP":
-        save_kwargs["quality"] = quality
-        save_kwargs["method"] = 6
-
-    if fmt in ("JPEG", "JPG") and img.mode == "RGBA":
-        background = Image.new("RGB", img.size, (255,255,255))
-        background.paste(img, mask=img.split()[3])
-        img = background
-
-    img.save(out, format=fmt, **save_kwargs)
-    out_bytes = out.getvalue()
-    mime = "image/webp" if fmt == "WEBP" else f"image/{fmt.lower()}"
-    return out_bytes, mime, len(out_bytes), new_w, new_h
+import functools
+import hashlib
+
+# Kolom untuk finder/listing: cukup penanda & metadata gambar. Isi gambar ada di
+# image_store (file bernama HashGambarMakanan), bukan di BLOB GambarMakanan.
+KOLOM_RINGKAS = """
+    IdMakanan, IdWarung, NamaMakanan, HargaMakanan, DetailMakanan,
+    Stok, Rating, MimeGambarMakanan, SizeGambarMakanan, HashGambarMakanan,
+    LqipMakanan, HashGambarMakanan IS NOT NULL AS AdaGambar
+"""
+
+
+def hitung_hash_gambar(data: bytes) -> str:
+    """Versi gambar = sha256 isi gambar (hex), disimpan di kolom HashGambar*."""
+    return hashlib.sha256(data).hexdigest()
 
 
 class Makanan:
@@ -62,7 +40,10 @@ class Makanan:
                  id_warung=None,
                  stok=0,
                  mime_gambar=None,
-                 size_gambar=None):
+                 size_gambar=None,
+                 hash_gambar=None,
+                 ada_gambar=None,
+                 lqip_gambar=None):
         self._id_makanan = id_makanan
         self._nama_makanan = nama
         self._harga_makanan = harga
@@ -73,6 +54,34 @@ class Makanan:
         self._stok_makanan = stok
         self._mime_gambar = mime_gambar
         self._size_gambar = size_gambar
+        self._hash_gambar = hash_gambar or (hitung_hash_gambar(gambar) if gambar else None)
+        # placeholder LQIP (data URI kecil) untuk halaman daftar
+        self._lqip_gambar = lqip_gambar
+        # Objek dari finder ringkas tidak membawa BLOB; bytes dimuat saat diminta.
+        self._gambar_dimuat = gambar is not None or ada_gambar is None
+        self._ada_gambar = bool(gambar) if ada_gambar is None else bool(ada_gambar)
+        # upload yang sudah masuk image_store tapi belum ditulis ke baris ini
+        self._gambar_baru = False
+        # opsi encode yang menunggu dikirim ke image_jobs setelah baris tersimpan
+        self._olah_gambar = None
+        self._job_gambar = None
+
+    @staticmethod
+    def _dari_row(row):
+        return Makanan(
+            id_makanan=row["IdMakanan"],
+            nama=row["NamaMakanan"],
+            harga=row["HargaMakanan"],
+            deskripsi=row["DetailMakanan"],
+            rating=row["Rating"],
+            id_warung=row["IdWarung"],
+            stok=row["Stok"],
+            mime_gambar=row["MimeGambarMakanan"],
+            size_gambar=row["SizeGambarMakanan"],
+            hash_gambar=row["HashGambarMakanan"],
+            ada_gambar=row["AdaGambar"],
+            lqip_gambar=row["LqipMakanan"]
+        )
 
 
     def get_stok_makanan(self):
@@ -112,10 +121,26 @@ class Makanan:
         self._rating_makanan = new_rating
 
     def get_gambar_makanan(self):
+        if not self._gambar_dimuat:
+            if self._gambar_baru:
+                self._gambar_makanan = image_store.get_store().read(self._hash_gambar)
+            else:
+                self._gambar_makanan, mime = Makanan.ambil_gambar(self._id_makanan)
+                self._mime_gambar = self._mime_gambar or mime
+            self._gambar_dimuat = True
         return self._gambar_makanan
 
     def set_gambar_makanan(self, new_gambar):
         self._gambar_makanan = new_gambar
+        self._gambar_dimuat = True
+        self._ada_gambar = bool(new_gambar)
+        self._hash_gambar = hitung_hash_gambar(new_gambar) if new_gambar else None
+        self._lqip_gambar = None
+        self._olah_gambar = None
+
+    def has_gambar(self):
+        """Cek ada gambar tanpa memuat BLOB."""
+        return self._ada_gambar
 
     def get_id_warung(self):
         return self._id_warung
@@ -128,16 +153,61 @@ class Makanan:
 
     def get_size_gambar(self):
         return self._size_gambar
+
+    def get_hash_gambar(self):
+        return self._hash_gambar
+
+    def get_lqip_gambar(self):
+        return self._lqip_gambar
+
+    def get_job_gambar(self):
+        """IdJob AntreanGambar upload terakhir (None jika diproses inline)."""
+        return self._job_gambar
+
+    @staticmethod
+    def ambil_gambar(id_makanan):
+        """Ambil (bytes, mime) gambar makanan dari image_store; (None, None) jika tidak ada."""
+        return image_store.load_image("makanan", id_makanan)
+
+    def _simpan_gambar_ke_store(self):
+        """Tulis isi gambar ke image_store; kolom BLOB tidak diisi lagi."""
+        if self._gambar_makanan:
+            self._hash_gambar = image_store.put(self._gambar_makanan)
+            self._lqip_gambar = image_store.placeholder(self._gambar_makanan)
+
+    def _pakai_gambar_tersimpan(self, digest, mime, size, lqip=None):
+        """Upload sudah ada di image_store; bytes hanya dimuat jika diminta."""
+        self._gambar_makanan = None
+        self._gambar_dimuat = False
+        self._gambar_baru = True
+        self._ada_gambar = True
+        self._hash_gambar = digest
+        self._mime_gambar = mime
+        self._size_gambar = size
+        self._lqip_gambar = lqip
+
+    def _setelah_commit_gambar(self, conn):
+        """
+        Buang info gambar lama dari cache dan antrekan olah gambar baru, setelah
+        baris ini di-commit (lewat after_commit: di request, setelah unit of work).
+        """
+        after_commit(conn, functools.partial(image_store.forget, "makanan", self._id_makanan))
+        if self._olah_gambar and self._id_makanan:
+            key, digest, olah = self._id_makanan, self._hash_gambar, self._olah_gambar
+            self._olah_gambar = None
+
+            def antrekan():
+                # resize/encode di background (image_jobs)
+                self._job_gambar = image_jobs.submit("makanan", key, digest, **olah)
+                image_jobs.remember_job(self._job_gambar)
+
+            after_commit(conn, antrekan)
     
     def get_all(self, only_available=True, limit=None, offset=None):
         conn = get_db_connection()
         cur = conn.cursor(dictionary=True)
         try:
-            sql = """
-                SELECT IdMakanan, IdWarung, NamaMakanan, HargaMakanan, DetailMakanan,
-                       Stok, GambarMakanan, Rating, MimeGambarMakanan, SizeGambarMakanan
-                FROM Makanan
-            """
+            sql = f"SELECT {KOLOM_RINGKAS} FROM Makanan"
             params = []
             if only_available:
                 sql += " WHERE Tersedia=1"
@@ -152,61 +222,45 @@ class Makanan:
             cur.execute(sql, tuple(params) if params else None)
             rows = cur.fetchall()
 
-            result = []
-            for row in rows:
-                result.append(Makanan(
-                    id_makanan=row["IdMakanan"],
-                    nama=row["NamaMakanan"],
-                    harga=row["HargaMakanan"],
-                    deskripsi=row["DetailMakanan"],
-                    rating=row["Rating"],
-                    gambar=row["GambarMakanan"],
-                    id_warung=row["IdWarung"],
-                    stok=row["Stok"],
-                    mime_gambar=row["MimeGambarMakanan"],
-                    size_gambar=row["SizeGambarMakanan"]
-                ))
-            return result
+            return [Makanan._dari_row(row) for row in rows]
         finally:
             cur.close()
             conn.close()
 
     def get_by_id(self, id_makanan):
         conn = get_db_connection()
-        cur = conn.cursor(dictionary=True)
+        cur = conn.cursor(prepared=True, dictionary=True)
         try:
-            cur.execute("""
-                SELECT IdMakanan, IdWarung, NamaMakanan, HargaMakanan, DetailMakanan,
-                       Stok, GambarMakanan, Rating, MimeGambarMakanan, SizeGambarMakanan
-                FROM Makanan WHERE IdMakanan=%s
-            """, (id_makanan,))
+            cur.execute(f"SELECT {KOLOM_RINGKAS} FROM Makanan WHERE IdMakanan=%s", (id_makanan,))
             row = cur.fetchone()
             if not row:
                 return None
+            return Makanan._dari_row(row)
+        finally:
+            cur.close()
+            conn.close()
 
-            return Makanan(
-                id_makanan=row["IdMakanan"],
-                nama=row["NamaMakanan"],
-                harga=row["HargaMakanan"],
-                deskripsi=row["DetailMakanan"],
-                rating=row["Rating"],
-                gambar=row["GambarMakanan"],
-                id_warung=row["IdWarung"],
-                stok=row["Stok"],
-                mime_gambar=row["MimeGambarMakanan"],
-                size_gambar=row["SizeGambarMakanan"]
-            )
+    def get_by_ids(self, ids):
+        """{IdMakanan: Makanan} untuk banyak id sekaligus (satu query IN), id yang tidak ada dilewati."""
+        ids = tuple(int(i) for i in ids)
+        if not ids:
+            return {}
+        conn = get_db_connection()
+        cur = conn.cursor(dictionary=True)
+        try:
+            placeholders = ",".join(["%s"] * len(ids))
+            cur.execute(f"SELECT {KOLOM_RINGKAS} FROM Makanan WHERE IdMakanan IN ({placeholders})", ids)
+            return {row["IdMakanan"]: Makanan._dari_row(row) for row in cur.fetchall()}
         finally:
             cur.close()
             conn.close()
 
     def get_by_warung(self, id_warung, limit=None, offset=None):
-        conn = get_db_connection()
+        conn = get_db_connection(readonly=True)
         cur = conn.cursor(dictionary=True)
         try:
-            sql = """
-                SELECT IdMakanan, IdWarung, NamaMakanan, HargaMakanan, DetailMakanan,
-                       Stok, GambarMakanan, Rating, MimeGambarMakanan, SizeGambarMakanan
+            sql = f"""
+                SELECT {KOLOM_RINGKAS}
                 FROM Makanan
                 WHERE IdWarung=%s
                 ORDER BY NamaMakanan ASC
@@ -222,21 +276,24 @@ class Makanan:
             cur.execute(sql, tuple(params))
             rows = cur.fetchall()
 
-            result = []
-            for row in rows:
-                result.append(Makanan(
-                    id_makanan=row["IdMakanan"],
-                    nama=row["NamaMakanan"],
-                    harga=row["HargaMakanan"],
-                    deskripsi=row["DetailMakanan"],
-                    rating=row["Rating"],
-                    gambar=row["GambarMakanan"],
-                    id_warung=row["IdWarung"],
-                    stok=row["Stok"],
-                    mime_gambar=row["MimeGambarMakanan"],
-                    size_gambar=row["SizeGambarMakanan"]
-                ))
-            return result
+            return [Makanan._dari_row(row) for row in rows]
+        finally:
+            cur.close()
+            conn.close()
+
+    @staticmethod
+    def get_menu_warung(id_warung):
+        """Menu warung sebagai list MakananItem (read model ringkas untuk template)."""
+        conn = get_db_connection(readonly=True)
+        cur = conn.cursor()
+        try:
+            cur.execute(f"""
+                SELECT {MakananItem.SELECT}
+                FROM Makanan
+                WHERE IdWarung=%s
+                ORDER BY NamaMakanan ASC
+            """, (id_warung,))
+            return fetch_all(MakananItem, cur)
         finally:
             cur.close()
             conn.close()
@@ -245,26 +302,29 @@ class Makanan:
     # INSERT & UPDATE
     # -------------------------
     def save_new(self):
+        self._simpan_gambar_ke_store()
         conn = get_db_connection()
         cur = conn.cursor()
         try:
             cur.execute("""
                 INSERT INTO Makanan
-                (IdWarung, NamaMakanan, DetailMakanan, HargaMakanan, GambarMakanan,
-                 MimeGambarMakanan, SizeGambarMakanan, Stok, Tersedia)
-                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,1)
+                (IdWarung, NamaMakanan, DetailMakanan, HargaMakanan,
+                 MimeGambarMakanan, SizeGambarMakanan, HashGambarMakanan, LqipMakanan, Stok, Tersedia)
+                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,1)
             """, (
                 self._id_warung,
                 self._nama_makanan,
                 self._deskripsi_makanan,
                 self._harga_makanan,
-                self._gambar_makanan,
                 self._mime_gambar,
                 self._size_gambar,
+                self._hash_gambar,
+                self._lqip_gambar,
                 self._stok_makanan
             ))
             conn.commit()
             self._id_makanan = cur.lastrowid
+            self._setelah_commit_gambar(conn)
             return self._id_makanan
         finally:
             cur.close()
@@ -277,15 +337,38 @@ class Makanan:
         conn = get_db_connection()
         cur = conn.cursor()
         try:
+            if not self._gambar_dimuat and not self._gambar_baru:
+                # BLOB tidak pernah dimuat -> jangan timpa gambar di DB
+                cur.execute("""
+                    UPDATE Makanan SET
+                        NamaMakanan=%s,
+                        HargaMakanan=%s,
+                        DetailMakanan=%s,
+                        Stok=%s
+                    WHERE IdMakanan=%s
+                """,
+                (
+                    self._nama_makanan,
+                    self._harga_makanan,
+                    self._deskripsi_makanan,
+                    self._stok_makanan,
+                    self._id_makanan
+                ))
+                conn.commit()
+                return cur.rowcount
+
+            self._simpan_gambar_ke_store()
             cur.execute("""
                 UPDATE Makanan SET
                     NamaMakanan=%s,
                     HargaMakanan=%s,
                     DetailMakanan=%s,
                     Stok=%s,
-                    GambarMakanan=%s,
+                    GambarMakanan=NULL,
                     MimeGambarMakanan=%s,
-                    SizeGambarMakanan=%s
+                    SizeGambarMakanan=%s,
+                    HashGambarMakanan=%s,
+                    LqipMakanan=%s
                 WHERE IdMakanan=%s
             """,
             (
@@ -293,12 +376,14 @@ class Makanan:
                 self._harga_makanan,
                 self._deskripsi_makanan,
                 self._stok_makanan,
-                self._gambar_makanan,
                 self._mime_gambar,
                 self._size_gambar,
+                self._hash_gambar,
+                self._lqip_gambar,
                 self._id_makanan
             ))
             conn.commit()
+            self._setelah_commit_gambar(conn)
             return cur.rowcount
         finally:
             cur.close()
@@ -315,6 +400,7 @@ class Makanan:
         try:
             cur.execute("DELETE FROM Makanan WHERE IdMakanan=%s", (self._id_makanan,))
             conn.commit()
+            self._setelah_commit_gambar(conn)
             return cur.rowcount
         finally:
             cur.close()
@@ -323,28 +409,31 @@ class Makanan:
     # -------------------------
     # IMAGE HANDLING
     # -------------------------
-    def set_gambar_from_upload(self, file_bytes, save_to_db=True, max_w=800, max_h=800, quality=80, fmt="WEBP"):
-        out_bytes, mime, size, w, h = process_image_bytes(
-            file_bytes, max_width=max_w, max_height=max_h, quality=quality, target_format=fmt
+    def set_gambar_from_upload(self, upload, save_to_db=True, max_w=800, max_h=800, quality=80, fmt="WEBP"):
+        """
+        `upload`: bytes atau file object (FileStorage.stream). File langsung masuk
+        image_store; dengan worker resize + encode menyusul di image_jobs.
+        """
+        if save_to_db and not self._id_makanan:
+            raise ValueError("IdMakanan belum ada. Gunakan save_new() dulu.")
+        digest, mime, size, w, h, lqip, olah = image_jobs.store_upload(
+            upload, max_w=max_w, max_h=max_h, quality=quality, fmt=fmt
         )
-
-        self._gambar_makanan = out_bytes
-        self._mime_gambar = mime
-        self._size_gambar = size
+        self._pakai_gambar_tersimpan(digest, mime, size, lqip)
+        self._olah_gambar = olah
 
         if save_to_db:
-            if not self._id_makanan:
-                raise ValueError("IdMakanan belum ada. Gunakan save_new() dulu.")
-
             conn = get_db_connection()
             cur = conn.cursor()
             try:
                 cur.execute("""
                     UPDATE Makanan
-                    SET GambarMakanan=%s, MimeGambarMakanan=%s, SizeGambarMakanan=%s
+                    SET GambarMakanan=NULL, MimeGambarMakanan=%s, SizeGambarMakanan=%s, HashGambarMakanan=%s,
+                        LqipMakanan=%s
                     WHERE IdMakanan=%s
-                """, (out_bytes, mime, size, self._id_makanan))
+                """, (mime, size, self._hash_gambar, lqip, self._id_makanan))
                 conn.commit()
+                self._setelah_commit_gambar(conn)
             finally:
                 cur.close()
                 conn.close()
@@ -359,11 +448,13 @@ class Makanan:
         try:
             cur.execute("""
                 UPDATE Makanan
-                SET GambarMakanan=NULL, MimeGambarMakanan=NULL, SizeGambarMakanan=NULL
+                SET GambarMakanan=NULL, MimeGambarMakanan=NULL, SizeGambarMakanan=NULL,
+                    HashGambarMakanan=NULL, LqipMakanan=NULL
                 WHERE IdMakanan=%s
             """, (self._id_makanan,))
             conn.commit()
-            self._gambar_makanan = None
+            self._setelah_commit_gambar(conn)
+            self.set_gambar_makanan(None)
             self._mime_gambar = None
             self._size_gambar = None
             return cur.rowcount
@@ -372,11 +463,12 @@ class Makanan:
             conn.close()
 
     def gambar_data_uri(self):
-        if not self._gambar_makanan:
+        gambar = self.get_gambar_makanan()
+        if not gambar:
             return None
         try:
             mime = self._mime_gambar or "image/webp"
-            b64 = base64.b64encode(self._gambar_makanan).decode("ascii")
+            b64 = base64.b64encode(gambar).decode("ascii")
             return f"data:{mime};base64,{b64}"
         except:
             return None
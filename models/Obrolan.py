@@ -24,7 +24,7 @@ class Obrolan:
     def get_or_create_room(id_pengguna: int, id_warung: int) -> str:
         """Cek atau buat Room ID baru"""
         conn = get_db_connection()
-        cur = conn.cursor()
+        cur = conn.cursor(prepared=True)
         try:
             query = "SELECT IdRuang FROM Obrolan WHERE IdPengguna = %s AND IdWarung = %s LIMIT 1"
             cur.execute(query, (id_pengguna, id_warung))
@@ -63,8 +63,8 @@ class Obrolan:
     @staticmethod
     def get_chat_history(id_ruang: str) -> List['Obrolan']:
         """Mengambil semua chat dalam satu room"""
-        conn = get_db_connection()
-        cur = conn.cursor(dictionary=True)
+        conn = get_db_connection(readonly=True)
+        cur = conn.cursor(prepared=True, dictionary=True)
         try:
             cur.execute("SELECT * FROM Obrolan WHERE IdRuang = %s ORDER BY Waktu ASC", (id_ruang,))
             rows = cur.fetchall()
@@ -158,7 +158,7 @@ class Obrolan:
         try:
             # Query complex untuk mengambil pesan TERAKHIR dari setiap warung
             query = """
-                SELECT W.IdWarung, W.NamaWarung, W.GambarWarung, 
+                SELECT W.IdWarung, W.NamaWarung, W.HashGambarWarung IS NOT NULL AS AdaGambar, W.HashGambarWarung AS HashGambar,
                        O.IdRuang, O.Isi AS PesanTerakhir, O.Waktu
                 FROM Obrolan O
                 JOIN Warung W ON O.IdWarung = W.IdWarung
@@ -182,7 +182,7 @@ class Obrolan:
         cur = conn.cursor(dictionary=True)
         try:
             query = """
-                SELECT P.IdPengguna, P.NamaPengguna, P.GambarPengguna,
+                SELECT P.IdPengguna, P.NamaPengguna, P.HashGambarPengguna IS NOT NULL AS AdaGambar, P.HashGambarPengguna AS HashGambar,
                        O.IdRuang, O.Isi AS PesanTerakhir, O.Waktu
                 FROM Obrolan O
                 JOIN Pengguna P ON O.IdPengguna = P.IdPengguna
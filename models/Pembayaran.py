@@ -2,6 +2,8 @@
 from dataclasses import dataclass, asdict
 from typing import Optional, Dict, Any, List
 from .db import get_db_connection
+from .retry import transactional_retry
+from .terjual import ganti_status
 from datetime import datetime
 
 # Allowed methods (extendable)
@@ -59,7 +61,7 @@ def create_payment_record(id_pesanan: int, metode: str, jumlah: float, rincian:
     conn = get_db_connection()
     cur = conn.cursor()
     try:
-        cur.execute("BEGIN")
+        conn.start_transaction()
         pid = _insert_payment_record(conn, cur, id_pesanan, metode, jumlah, rincian)
         conn.commit()
         return pid
@@ -71,6 +73,7 @@ def create_payment_record(id_pesanan: int, metode: str, jumlah: float, rincian:
         conn.close()
 
 
+@transactional_retry
 def confirm_payment_and_mark_paid(id_pembayaran: int, expected_amount: Optional[float] = None) -> bool:
     """
     Confirm a pending payment (set Pembayaran.Status='Berhasil') and atomically mark the related
@@ -119,7 +122,7 @@ def confirm_payment_and_mark_paid(id_pembayaran: int, expected_amount: Optional[
 
         # update pesanan status -> Dibayar (only if not already paid)
         if status_pesanan != "Dibayar":
-            cur.execute("UPDATE PesananWarung SET Status=%s WHERE IdPesananWarung=%s", ("Dibayar", id_pesanan))
+            ganti_status(cur, id_pesanan, status_pesanan, "Dibayar")
 
         conn.commit()
         return True
@@ -134,8 +137,10 @@ def confirm_payment_and_mark_paid(id_pembayaran: int, expected_amount: Optional[
 def mark_payment_failed(id_pembayaran: int, reason: Optional[str] = None) -> bool:
     """
     Set payment status to 'Gagal' and optionally store reason in rincian.
+    Commits on its own connection so the failure is recorded even when the
+    surrounding request rolls back.
     """
-    conn = get_db_connection()
+    conn = get_db_connection(autonomous=True)
     cur = conn.cursor()
     try:
         conn.start_transaction()
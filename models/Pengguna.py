@@ -1,4 +1,7 @@
-from .db import get_db_connection
+import functools
+
+from .db import after_commit, get_db_connection
+from . import image_jobs, image_store
 
 class Pengguna:
     def __init__(self, idPengguna: int, nama: str, email: str, password: str, peran: str, nomor_telepon: str = None, kordinat: str = None, patokan: str = None):
@@ -35,6 +38,16 @@ class Pengguna:
         conn.close()
 
     def update_profil(self, gambar_blob=None, mime_type=None) -> None:
+        # foto (bytes atau file object upload) lewat pipeline yang sama dengan
+        # Makanan/Warung; mime_type dari browser diabaikan, MIME dideteksi dari isi
+        # file (ValueError jika bukan gambar)
+        olah = None
+        if gambar_blob:
+            # isi foto ke image_store, tabel cukup menyimpan hash-nya
+            hash_gambar, mime_type, _, _, _, _, olah = image_jobs.store_upload(
+                gambar_blob, **image_jobs.UPLOAD_OPTIONS["pengguna"]
+            )
+
         conn = get_db_connection()
         cur = conn.cursor()
 
@@ -42,10 +55,10 @@ class Pengguna:
             query = """
                 UPDATE Pengguna 
                 SET NamaPengguna=%s, Email=%s, nomorTeleponPengguna=%s, 
-                    GambarPengguna=%s, MimeGambarPengguna=%s 
+                    GambarPengguna=NULL, MimeGambarPengguna=%s, HashGambarPengguna=%s 
                 WHERE IdPengguna=%s
             """
-            cur.execute(query, (self.NamaPengguna, self.Email, self.NomorTelepon, gambar_blob, mime_type, self.IdPengguna))
+            cur.execute(query, (self.NamaPengguna, self.Email, self.NomorTelepon, mime_type, hash_gambar, self.IdPengguna))
         else:
             query = """
                 UPDATE Pengguna 
@@ -55,6 +68,13 @@ class Pengguna:
             cur.execute(query, (self.NamaPengguna, self.Email, self.NomorTelepon, self.IdPengguna))
 
         conn.commit()
+        # cache & job gambar baru disentuh setelah hash baru benar-benar tersimpan
+        if gambar_blob:
+            after_commit(conn, functools.partial(image_store.forget, "pengguna", self.IdPengguna))
+        if olah:
+            after_commit(conn, lambda: image_jobs.remember_job(
+                image_jobs.submit("pengguna", self.IdPengguna, hash_gambar, **olah)
+            ))
         cur.close()
         conn.close()
 
@@ -85,20 +105,8 @@ class Pengguna:
     # Kita pakai staticmethod agar bisa dipanggil tanpa perlu membuat objek Pengguna(...) dulu
     @staticmethod
     def ambil_foto_profil(id_pengguna):
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        query = "SELECT GambarPengguna, MimeGambarPengguna FROM Pengguna WHERE IdPengguna = %s"
-        cur.execute(query, (id_pengguna,))
-        data = cur.fetchone()
-        
-        cur.close()
-        conn.close()
-        
-        # Mengembalikan tuple (gambar, mime) atau (None, None) jika tidak ada
-        if data:
-            return data[0], data[1]
-        return None, None
+        # Mengembalikan tuple (gambar, mime) dari image_store atau (None, None) jika tidak ada
+        return image_store.load_image("pengguna", id_pengguna)
         
     def update_lokasi(self, alamat, patokan, kordinat) -> None:
         conn = get_db_connection()
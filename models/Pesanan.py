@@ -3,6 +3,9 @@ from typing import List, Dict, Set, Any, Optional
 from datetime import datetime
 from flask import current_app
 from .db import get_db_connection
+from .retry import transactional_retry
+from .terjual import ganti_status, kunci_status
+from .read_models import PesananPembeliItem, PesananPenjualItem, fetch_all
 from models.Warung import Warung
 
 @dataclass
@@ -33,6 +36,7 @@ class Pesanan:
     def clear_details(self):
         self.details = []
 
+    @transactional_retry
     def create_with_items(self, items: List[Dict], id_pembeli: int, id_warung: int, catatan: str = "") -> int:
         if not items:
             raise ValueError("Tidak ada item untuk dipesan")
@@ -133,9 +137,10 @@ class Pesanan:
         cur = conn.cursor()
         try:
             if self.id_pesanan and self.id_pesanan > 0:
-                cur.execute(
-                    "UPDATE PesananWarung SET TotalHarga=%s, DeskripsiPesanan=%s, Status=%s WHERE IdPesananWarung=%s",
-                    (self.total_harga, self.catatan, self.status, self.id_pesanan)
+                conn.start_transaction()
+                ganti_status(
+                    cur, self.id_pesanan, kunci_status(cur, self.id_pesanan), self.status,
+                    TotalHarga=self.total_harga, DeskripsiPesanan=self.catatan,
                 )
                 res = self.id_pesanan
             else:
@@ -151,7 +156,12 @@ class Pesanan:
             cur.close()
             conn.close()
 
+    @transactional_retry
     def update_status(self, new_status: str) -> int:
+        """
+        Ubah status pesanan. Makanan.Terjual ikut diubah di transaksi yang sama saat
+        pesanan menjadi 'Selesai' (atau berhenti 'Selesai'), lihat terjual.ganti_status.
+        """
         if not self.id_pesanan or self.id_pesanan == 0:
             raise ValueError("Id pesanan belum diset")
         
@@ -160,16 +170,33 @@ class Pesanan:
             raise ValueError(f"Status tidak valid: {new_status}")
             
         conn = get_db_connection()
-        cur = conn.cursor()
         try:
-            cur.execute("UPDATE PesananWarung SET Status=%s WHERE IdPesananWarung=%s", (new_status, self.id_pesanan))
+            conn.start_transaction()
+        except Exception:
+            pass
+
+        cur = conn.cursor(prepared=True)
+        try:
+            old_status = kunci_status(cur, self.id_pesanan)
+            if old_status is None:
+                conn.rollback()
+                return 0
+
+            updated = ganti_status(cur, self.id_pesanan, old_status, new_status)
             conn.commit()
             self.status = new_status
-            return int(cur.rowcount)
+            return updated
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
         finally:
             cur.close()
             conn.close()
 
+    @transactional_retry
     def cancel(self, restock: bool = True) -> int:
         if not self.id_pesanan or self.id_pesanan == 0:
             raise ValueError("Id pesanan belum diset")
@@ -185,15 +212,13 @@ class Pesanan:
             pass
         # =========================
 
-        cur = conn.cursor(dictionary=True)
+        cur = conn.cursor(prepared=True, dictionary=True)
         try:
             # Query SELECT dijalankan setelah transaksi dimulai
-            cur.execute("SELECT Status FROM PesananWarung WHERE IdPesananWarung=%s", (self.id_pesanan,))
-            row = cur.fetchone()
-            if not row:
+            current_status = kunci_status(cur, self.id_pesanan)
+            if current_status is None:
                 raise ValueError("Pesanan tidak ditemukan")
-            
-            current_status = row.get("Status") if isinstance(row, dict) else row[0]
+
             if current_status in ("Dibatalkan", "Selesai", "Ditolak"):
                 return 0
 
@@ -210,7 +235,7 @@ class Pesanan:
                     
                     cur.execute("UPDATE Makanan SET Stok = COALESCE(Stok,0) + %s WHERE IdMakanan=%s", (jumlah, mid))
             
-            cur.execute("UPDATE PesananWarung SET Status=%s WHERE IdPesananWarung=%s", ("Dibatalkan", self.id_pesanan))
+            ganti_status(cur, self.id_pesanan, current_status, "Dibatalkan")
             conn.commit()
             
             self.status = "Dibatalkan"
@@ -224,6 +249,7 @@ class Pesanan:
         finally:
             cur.close()
             conn.close()
+    @transactional_retry
     def batalkan_pesanan(self, alasan: str) -> bool:
         
         if not self.id_pesanan or self.id_pesanan == 0:
@@ -238,16 +264,13 @@ class Pesanan:
         except Exception:
             pass
 
-        cur = conn.cursor(dictionary=True)
+        cur = conn.cursor(prepared=True, dictionary=True)
         try:
-            cur.execute("SELECT Status FROM PesananWarung WHERE IdPesananWarung=%s FOR UPDATE", (self.id_pesanan,))
-            row = cur.fetchone()
-            
-            if not row:
+            current_status = kunci_status(cur, self.id_pesanan)
+
+            if current_status is None:
                 raise ValueError("Pesanan tidak ditemukan")
             
-            current_status = row.get("Status") if isinstance(row, dict) else row[0]
-            
             status_terlarang = ("Diproses", "Diantar", "Selesai", "Ditolak", "Dibatalkan")
             
             if current_status in status_terlarang:
@@ -266,12 +289,7 @@ class Pesanan:
                 
                 cur.execute(update_stok_sql, (jumlah, mid))
             
-            update_sql = """
-                UPDATE PesananWarung 
-                SET Status=%s, DeskripsiPesanan=%s 
-                WHERE IdPesananWarung=%s
-            """
-            cur.execute(update_sql, ("Dibatalkan", alasan, self.id_pesanan))
+            ganti_status(cur, self.id_pesanan, current_status, "Dibatalkan", DeskripsiPesanan=alasan)
             
             conn.commit()
             
@@ -289,6 +307,7 @@ class Pesanan:
             cur.close()
             conn.close()
 
+    @transactional_retry
     def tolak_pesanan(self, alasan: str) -> bool:
         """
         Menolak pesanan: Mengembalikan stok, mengubah status ke 'Ditolak',
@@ -305,17 +324,14 @@ class Pesanan:
         except Exception:
             pass # Ignore if transaction started automatically
 
-        cur = conn.cursor(dictionary=True)
+        cur = conn.cursor(prepared=True, dictionary=True)
         try:
             # 1. Cek Status Terkini (Lock row)
-            cur.execute("SELECT Status FROM PesananWarung WHERE IdPesananWarung=%s FOR UPDATE", (self.id_pesanan,))
-            row = cur.fetchone()
-            
-            if not row:
+            current_status = kunci_status(cur, self.id_pesanan)
+
+            if current_status is None:
                 raise ValueError("Pesanan tidak ditemukan")
             
-            current_status = row.get("Status") if isinstance(row, dict) else row[0]
-            
             # Jika pesanan sudah selesai/batal/tolak, hentikan
             if current_status in ("Dibatalkan", "Selesai", "Ditolak"):
                 return False
@@ -337,12 +353,7 @@ class Pesanan:
                 cur.execute(update_stok_sql, (jumlah, mid))
             
             # 3. Update Status dan Deskripsi
-            update_sql = """
-                UPDATE PesananWarung 
-                SET Status=%s, DeskripsiPesanan=%s 
-                WHERE IdPesananWarung=%s
-            """
-            cur.execute(update_sql, ("Ditolak", alasan, self.id_pesanan))
+            ganti_status(cur, self.id_pesanan, current_status, "Ditolak", DeskripsiPesanan=alasan)
             
             conn.commit()
             
@@ -371,17 +382,16 @@ class Pesanan:
             updated = 0
             now = datetime.now()
             
+            conn.start_transaction()
+            old_status = kunci_status(cur, int(self.id_pesanan))
             try:
-                cur.execute(
-                    "UPDATE PesananWarung SET Status=%s, MetodePembayaran=%s, TanggalPembayaran=%s WHERE IdPesananWarung=%s",
-                    ("Menunggu", str(payment_method), now, int(self.id_pesanan))
+                updated = ganti_status(
+                    cur, int(self.id_pesanan), old_status, "Menunggu",
+                    MetodePembayaran=str(payment_method), TanggalPembayaran=now,
                 )
-                updated = cur.rowcount
             except Exception:
                 try:
-                    cur.execute("UPDATE PesananWarung SET Status=%s WHERE IdPesananWarung=%s",
-                                ("Menunggu", int(self.id_pesanan)))
-                    updated = cur.rowcount
+                    updated = ganti_status(cur, int(self.id_pesanan), old_status, "Menunggu")
                 except Exception:
                     raise
 
@@ -406,9 +416,9 @@ def fetch_allowed_statuses() -> Set[str]:
         "Dibayar"
     }
 
-def get_pesanan_by_user(id_pembeli: int, limit: int = 50, offset: int = 0) -> List[Pesanan]:
-    conn = get_db_connection()
-    cur = conn.cursor(dictionary=True)
+def get_pesanan_by_user(id_pembeli: int, limit: int = 50, offset: int = 0) -> List[PesananPembeliItem]:
+    conn = get_db_connection(readonly=True)
+    cur = conn.cursor()
     try:
         sql = """
             SELECT pw.IdPesananWarung, pw.IdPembeli, pw.IdWarung, pw.TotalHarga, 
@@ -420,38 +430,14 @@ def get_pesanan_by_user(id_pembeli: int, limit: int = 50, offset: int = 0) -> Li
             ORDER BY pw.IdPesananWarung DESC LIMIT %s OFFSET %s
         """
         cur.execute(sql, (id_pembeli, limit, offset))
-        
-        rows = cur.fetchall() or []
-        hasil: List[Pesanan] = []
-        for r in rows:
-            waktu = r.get("DibuatPada")
-            waktu_str = (waktu.isoformat() if hasattr(waktu, "isoformat") else str(waktu))
-            
-            warung_obj = Warung(
-                id_warung=int(r["IdWarung"]),
-                nama_warung=str(r.get("NamaWarung") or "Warung")
-            )
-
-            p = Pesanan(
-                id_pesanan=int(r["IdPesananWarung"]),
-                id_pembeli=int(r["IdPembeli"]),
-                id_warung=int(r["IdWarung"]),
-                total_harga=float(r.get("TotalHarga") or 0.0),
-                status=str(r.get("Status") or ""),
-                catatan=str(r.get("DeskripsiPesanan") or ""),
-                waktu_dibuat=waktu_str,
-                details=[],
-                warung=warung_obj 
-            )
-            hasil.append(p)
-        return hasil
+        return fetch_all(PesananPembeliItem, cur)
     finally:
         cur.close()
         conn.close()
 
-def get_pesanan_for_seller(id_warung: int, status_filter: str = None) -> List[Pesanan]:
+def get_pesanan_for_seller(id_warung: int, status_filter: str = None) -> List[PesananPenjualItem]:
     conn = get_db_connection()
-    cur = conn.cursor(dictionary=True)
+    cur = conn.cursor()
     try:
         query = """
             SELECT pw.IdPesananWarung, pw.IdPembeli, pw.IdWarung, pw.TotalHarga, 
@@ -470,27 +456,7 @@ def get_pesanan_for_seller(id_warung: int, status_filter: str = None) -> List[Pe
         query += " ORDER BY pw.DibuatPada DESC"
 
         cur.execute(query, tuple(params))
-        rows = cur.fetchall() or []
-
-        hasil: List[Pesanan] = []
-        for r in rows:
-            waktu = r.get("DibuatPada")
-            waktu_str = (waktu.isoformat() if hasattr(waktu, "isoformat") else str(waktu))
-
-            pesanan_obj = Pesanan(
-                id_pesanan=int(r["IdPesananWarung"]),
-                id_pembeli=int(r["IdPembeli"]),
-                id_warung=int(r["IdWarung"]),
-                total_harga=float(r.get("TotalHarga") or 0.0),
-                status=str(r.get("Status") or ""),
-                catatan=str(r.get("DeskripsiPesanan") or ""),
-                waktu_dibuat=waktu_str,
-                details=[]
-            )
-            pesanan_obj.nama_pembeli = r.get("NamaPembeli") or "Pelanggan"
-            hasil.append(pesanan_obj)
-            
-        return hasil
+        return fetch_all(PesananPenjualItem, cur)
     except Exception:
         return []
     finally:
@@ -513,7 +479,7 @@ def get_pesanan_detail(id_pesanan: int) -> Dict[str, Any]:
         
         cur.execute("""
             SELECT p.IdPesanan, p.IdMakanan, p.BanyakPesanan, p.Subtotal,
-                   m.NamaMakanan, m.HargaMakanan, m.GambarMakanan
+                   m.NamaMakanan, m.HargaMakanan, m.HashGambarMakanan IS NOT NULL AS AdaGambar
             FROM Pesanan p
             LEFT JOIN Makanan m ON m.IdMakanan = p.IdMakanan
             WHERE p.IdPesananWarung=%s
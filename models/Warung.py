@@ -1,5 +1,17 @@
-from .db import get_db_connection
+from .db import after_commit, get_db_connection
+from .Makanan import hitung_hash_gambar
+from .read_models import WarungItem, fetch_all
+from . import image_jobs, image_store
 import base64
+import functools
+
+# Kolom untuk finder/listing: tanpa isi gambar (lihat Makanan.KOLOM_RINGKAS)
+KOLOM_RINGKAS = """
+    IdWarung, IdPenjual, NamaWarung, AlamatWarung, NomorTeleponWarung,
+    Rating, KordinatWarung, JamBuka, JamTutup,
+    MimeGambarWarung, SizeGambarWarung, HashGambarWarung, LqipWarung,
+    HashGambarWarung IS NOT NULL AS AdaGambar
+"""
 
 class Warung:
     _id_warung: int
@@ -24,7 +36,10 @@ class Warung:
         mime_gambar=None,
         jam_buka=None,
         jam_tutup=None,
-        size_gambar=None
+        size_gambar=None,
+        hash_gambar=None,
+        ada_gambar=None,
+        lqip_gambar=None
     ):
         self._id_warung = id_warung
         self._id_penjual = id_penjual
@@ -36,6 +51,17 @@ class Warung:
         self._kordinat_warung = kordinat_warung
         self._mime_gambar = mime_gambar
         self._size_gambar = size_gambar
+        self._hash_gambar = hash_gambar or (hitung_hash_gambar(gambar_warung) if gambar_warung else None)
+        # placeholder LQIP (data URI kecil) untuk banner/daftar warung
+        self._lqip_gambar = lqip_gambar
+        # Objek dari finder ringkas tidak membawa BLOB; bytes dimuat saat diminta.
+        self._gambar_dimuat = gambar_warung is not None or ada_gambar is None
+        self._ada_gambar = bool(gambar_warung) if ada_gambar is None else bool(ada_gambar)
+        # upload yang sudah masuk image_store tapi belum ditulis ke baris ini
+        self._gambar_baru = False
+        # opsi yang menunggu dikirim ke image_jobs setelah baris tersimpan
+        self._olah_gambar = None
+        self._job_gambar = None
     
         self._jam_buka = jam_buka
         self._jam_tutup = jam_tutup
@@ -73,8 +99,35 @@ class Warung:
         self._nomor_telepon_warung = new_nomor
 
     def get_gambar_warung(self):
+        if not self._gambar_dimuat:
+            if self._gambar_baru:
+                self._gambar_warung = image_store.get_store().read(self._hash_gambar)
+            else:
+                self._gambar_warung, mime = Warung.ambil_foto_warung(self._id_warung)
+                self._mime_gambar = self._mime_gambar or mime
+            self._gambar_dimuat = True
         return self._gambar_warung
 
+    def has_gambar_warung(self):
+        """Cek ada gambar tanpa memuat BLOB."""
+        return self._ada_gambar
+
+    def get_hash_gambar(self):
+        return self._hash_gambar
+
+    def get_lqip_gambar(self):
+        return self._lqip_gambar
+
+    def get_job_gambar(self):
+        """IdJob AntreanGambar upload terakhir (None jika diproses inline)."""
+        return self._job_gambar
+
+    def get_jam_buka(self):
+        return self._jam_buka
+
+    def get_jam_tutup(self):
+        return self._jam_tutup
+
     def get_mime_gambar(self):
         return getattr(self, "_mime_gambar", None)
 
@@ -83,6 +136,11 @@ class Warung:
 
     def set_gambar_warung(self, new_gambar):
         self._gambar_warung = new_gambar
+        self._gambar_dimuat = True
+        self._ada_gambar = bool(new_gambar)
+        self._hash_gambar = hitung_hash_gambar(new_gambar) if new_gambar else None
+        self._lqip_gambar = None
+        self._olah_gambar = None
 
     def get_rating_warung(self):
         return self._rating_warung
@@ -140,30 +198,67 @@ class Warung:
     def tambah_makanan(self, makanan_obj):
         self._makanan.append(makanan_obj)
 
+    def _simpan_gambar_ke_store(self):
+        """Tulis isi gambar ke image_store; kolom BLOB tidak diisi lagi."""
+        if self._gambar_warung:
+            self._hash_gambar = image_store.put(self._gambar_warung)
+            self._lqip_gambar = image_store.placeholder(self._gambar_warung)
+
+    def _pakai_gambar_tersimpan(self, digest, mime, size, lqip=None):
+        """Upload sudah ada di image_store; bytes hanya dimuat jika diminta."""
+        self._gambar_warung = None
+        self._gambar_dimuat = False
+        self._gambar_baru = True
+        self._ada_gambar = True
+        self._hash_gambar = digest
+        self._mime_gambar = mime
+        self._size_gambar = size
+        self._lqip_gambar = lqip
+
+    def _setelah_commit_gambar(self, conn):
+        """
+        Buang info gambar lama dari cache dan antrekan olah gambar baru, setelah
+        baris ini di-commit (lewat after_commit: di request, setelah unit of work).
+        """
+        after_commit(conn, functools.partial(image_store.forget, "warung", self._id_warung))
+        if self._olah_gambar and self._id_warung is not None:
+            key, digest, olah = self._id_warung, self._hash_gambar, self._olah_gambar
+            self._olah_gambar = None
+
+            def antrekan():
+                # resize/encode di background (image_jobs)
+                self._job_gambar = image_jobs.submit("warung", key, digest, **olah)
+                image_jobs.remember_job(self._job_gambar)
+
+            after_commit(conn, antrekan)
+
     def save_new(self):
+        self._simpan_gambar_ke_store()
         conn = get_db_connection()
         cur = conn.cursor()
         try:
             cur.execute("""
                 INSERT INTO Warung
-                (IdPenjual, NamaWarung, AlamatWarung, NomorTeleponWarung, GambarWarung, Rating, KordinatWarung, MimeGambarWarung, SizeGambarWarung, DibuatPada)
-                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,CURRENT_TIMESTAMP)
+                (IdPenjual, NamaWarung, AlamatWarung, NomorTeleponWarung, Rating, KordinatWarung, MimeGambarWarung, SizeGambarWarung, HashGambarWarung, LqipWarung, DibuatPada)
+                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,CURRENT_TIMESTAMP)
             """, (
                 self._id_penjual,
                 self._nama_warung,
                 self._alamat_warung,
                 self._nomor_telepon_warung,
-                self._gambar_warung,
                 self._rating_warung,
                 self._kordinat_warung,
                 self._mime_gambar,
-                self._size_gambar
+                self._size_gambar,
+                self._hash_gambar,
+                self._lqip_gambar
             ))
             conn.commit()
             try:
                 self._id_warung = cur.lastrowid
             except:
                 pass
+            self._setelah_commit_gambar(conn)
             return self._id_warung
         finally:
             cur.close()
@@ -176,31 +271,59 @@ class Warung:
         conn = get_db_connection()
         cur = conn.cursor()
         try:
+            if not self._gambar_dimuat and not self._gambar_baru:
+                # BLOB tidak pernah dimuat -> jangan timpa gambar di DB
+                cur.execute("""
+                    UPDATE Warung SET
+                        IdPenjual=%s,
+                        NamaWarung=%s,
+                        AlamatWarung=%s,
+                        NomorTeleponWarung=%s,
+                        Rating=%s,
+                        KordinatWarung=%s
+                    WHERE IdWarung=%s
+                """, (
+                    self._id_penjual,
+                    self._nama_warung,
+                    self._alamat_warung,
+                    self._nomor_telepon_warung,
+                    self._rating_warung,
+                    self._kordinat_warung,
+                    self._id_warung
+                ))
+                conn.commit()
+                return cur.rowcount
+
+            self._simpan_gambar_ke_store()
             cur.execute("""
                 UPDATE Warung SET
                     IdPenjual=%s,
                     NamaWarung=%s,
                     AlamatWarung=%s,
                     NomorTeleponWarung=%s,
-                    GambarWarung=%s,
+                    GambarWarung=NULL,
                     Rating=%s,
                     KordinatWarung=%s,
                     MimeGambarWarung=%s,
-                    SizeGambarWarung=%s
+                    SizeGambarWarung=%s,
+                    HashGambarWarung=%s,
+                    LqipWarung=%s
                 WHERE IdWarung=%s
             """, (
                 self._id_penjual,
                 self._nama_warung,
                 self._alamat_warung,
                 self._nomor_telepon_warung,
-                self._gambar_warung,
                 self._rating_warung,
                 self._kordinat_warung,
                 self._mime_gambar,
                 self._size_gambar,
+                self._hash_gambar,
+                self._lqip_gambar,
                 self._id_warung
             ))
             conn.commit()
+            self._setelah_commit_gambar(conn)
             return cur.rowcount
         finally:
             cur.close()
@@ -215,6 +338,7 @@ class Warung:
         try:
             cur.execute("DELETE FROM Warung WHERE IdWarung=%s", (self._id_warung,))
             conn.commit()
+            self._setelah_commit_gambar(conn)
             return cur.rowcount
         finally:
             cur.close()
@@ -223,14 +347,30 @@ class Warung:
     # -------------------------
     # Finders (with optional pagination)
     # -------------------------
+    @staticmethod
+    def _dari_row(row):
+        return Warung(
+            id_warung=row.get("IdWarung"),
+            id_penjual=row.get("IdPenjual"),
+            nama_warung=row.get("NamaWarung"),
+            alamat_warung=row.get("AlamatWarung"),
+            nomor_telepon_warung=row.get("NomorTeleponWarung"),
+            rating_warung=row.get("Rating") or 0.0,
+            kordinat_warung=row.get("KordinatWarung"),
+            mime_gambar=row.get("MimeGambarWarung"),
+            jam_buka=row.get("JamBuka"),
+            jam_tutup=row.get("JamTutup"),
+            size_gambar=row.get("SizeGambarWarung"),
+            hash_gambar=row.get("HashGambarWarung"),
+            ada_gambar=row.get("AdaGambar"),
+            lqip_gambar=row.get("LqipWarung")
+        )
+
     def get_all(self, limit=None, offset=None, sort_by_rating=None):
-        conn = get_db_connection()
+        conn = get_db_connection(readonly=True)
         cur = conn.cursor(dictionary=True)
         try:
-            sql = """SELECT IdWarung, IdPenjual, NamaWarung, AlamatWarung,
-                            NomorTeleponWarung, GambarWarung, Rating, KordinatWarung,
-                            MimeGambarWarung, SizeGambarWarung
-                    FROM Warung"""
+            sql = f"SELECT {KOLOM_RINGKAS} FROM Warung"
             if sort_by_rating == "highest":
                 sql += " ORDER BY Rating DESC, NamaWarung ASC"
             elif sort_by_rating == "lowest":
@@ -252,54 +392,53 @@ class Warung:
                 cur.execute(sql)
 
             rows = cur.fetchall()
-            result = []
-            for row in rows:
-                w = Warung(
-                    id_warung=row.get("IdWarung"),
-                    id_penjual=row.get("IdPenjual"),
-                    nama_warung=row.get("NamaWarung"),
-                    alamat_warung=row.get("AlamatWarung"),
-                    nomor_telepon_warung=row.get("NomorTeleponWarung"),
-                    gambar_warung=row.get("GambarWarung"),
-                    rating_warung=row.get("Rating") or 0.0,
-                    kordinat_warung=row.get("KordinatWarung"),
-                    mime_gambar=row.get("MimeGambarWarung"),
-                    size_gambar=row.get("SizeGambarWarung")
-                )
-                result.append(w)
-            return result
+            return [Warung._dari_row(row) for row in rows]
         finally:
             cur.close()
             conn.close()
 
 
 
+    @staticmethod
+    def get_daftar(limit=None, offset=None, sort_by_rating=None, keyword=None):
+        """Seperti get_all()/search_by_name(), tapi hasilnya list WarungItem untuk halaman daftar."""
+        conn = get_db_connection(readonly=True)
+        cur = conn.cursor()
+        try:
+            sql = f"SELECT {WarungItem.SELECT} FROM Warung"
+            params = []
+            if keyword:
+                sql += " WHERE NamaWarung LIKE %s"
+                params.append(f"%{keyword}%")
+            if sort_by_rating == "highest":
+                sql += " ORDER BY Rating DESC, NamaWarung ASC"
+            elif sort_by_rating == "lowest":
+                sql += " ORDER BY Rating ASC, NamaWarung ASC"
+            else:
+                sql += " ORDER BY NamaWarung ASC"
+
+            if limit is not None:
+                sql += " LIMIT %s"
+                params.append(limit)
+                if offset is not None:
+                    sql += " OFFSET %s"
+                    params.append(offset)
+
+            cur.execute(sql, tuple(params))
+            return fetch_all(WarungItem, cur)
+        finally:
+            cur.close()
+            conn.close()
+
     def get_by_id(self, id_warung):
         conn = get_db_connection()
-        cur = conn.cursor(dictionary=True)
+        cur = conn.cursor(prepared=True, dictionary=True)
         try:
-            cur.execute("""
-                SELECT IdWarung, IdPenjual, NamaWarung, AlamatWarung,
-                       NomorTeleponWarung, GambarWarung, Rating, KordinatWarung,
-                       MimeGambarWarung, SizeGambarWarung
-                FROM Warung
-                WHERE IdWarung=%s
-            """, (id_warung,))
+            cur.execute(f"SELECT {KOLOM_RINGKAS} FROM Warung WHERE IdWarung=%s", (id_warung,))
             row = cur.fetchone()
             if not row:
                 return None
-            return Warung(
-                id_warung=row.get("IdWarung"),
-                id_penjual=row.get("IdPenjual"),
-                nama_warung=row.get("NamaWarung"),
-                alamat_warung=row.get("AlamatWarung"),
-                nomor_telepon_warung=row.get("NomorTeleponWarung"),
-                gambar_warung=row.get("GambarWarung"),
-                rating_warung=row.get("Rating") or 0.0,
-                kordinat_warung=row.get("KordinatWarung"),
-                mime_gambar=row.get("MimeGambarWarung"),
-                size_gambar=row.get("SizeGambarWarung")
-            )
+            return Warung._dari_row(row)
         finally:
             cur.close()
             conn.close()
@@ -322,37 +461,43 @@ class Warung:
             cur.close()
             conn.close()
 
-    def set_gambar_from_upload(self, file_bytes, save_to_db=True):
+    def set_gambar_from_upload(self, upload, save_to_db=True):
         """
-        Versi sederhana: langsung simpan bytes tanpa library processing tambahan.
+        Resize + encode lewat pipeline upload yang sama dengan Makanan (image_jobs);
+        `upload` bytes atau file object, MIME dideteksi dari isi file. ValueError
+        jika bukan gambar.
         """
-        self._gambar_warung = file_bytes
-        self._size_gambar = len(file_bytes)
-        # Default mime type (bisa dikembangkan deteksinya jika perlu)
-        self._mime_gambar = "image/jpeg" 
+        if save_to_db and self._id_warung is None:
+            raise ValueError("Id Warung belum diset. Simpan warung dulu sebelum upload gambar.")
+        digest, mime, size, _, _, lqip, olah = image_jobs.store_upload(
+            upload, **image_jobs.UPLOAD_OPTIONS["warung"]
+        )
+        self._pakai_gambar_tersimpan(digest, mime, size, lqip)
+        self._olah_gambar = olah
 
         if save_to_db:
-            if self._id_warung is None:
-                raise ValueError("Id Warung belum diset. Simpan warung dulu sebelum upload gambar.")
             conn = get_db_connection()
             cur = conn.cursor()
             try:
                 cur.execute("""
                     UPDATE Warung
-                    SET GambarWarung=%s, MimeGambarWarung=%s, SizeGambarWarung=%s
+                    SET GambarWarung=NULL, MimeGambarWarung=%s, SizeGambarWarung=%s, HashGambarWarung=%s,
+                        LqipWarung=%s
                     WHERE IdWarung=%s
-                """, (self._gambar_warung, self._mime_gambar, self._size_gambar, self._id_warung))
+                """, (self._mime_gambar, self._size_gambar, self._hash_gambar, self._lqip_gambar, self._id_warung))
                 conn.commit()
+                self._setelah_commit_gambar(conn)
             finally:
                 cur.close()
                 conn.close()
 
     def get_gambar_data_uri(self):
-        if not self._gambar_warung:
+        gambar = self.get_gambar_warung()
+        if not gambar:
             return None
         try:
             mime = self._mime_gambar or "image/jpeg"
-            b64 = base64.b64encode(self._gambar_warung).decode("ascii")
+            b64 = base64.b64encode(gambar).decode("ascii")
             return f"data:{mime};base64,{b64}"
         except:
             return None
@@ -374,25 +519,14 @@ class Warung:
 
     @staticmethod
     def ambil_foto_warung(id_warung):
-        conn = get_db_connection()
-        cur = conn.cursor()
-        try:
-            # FIX: Menggunakan id_warung bukan id_pengguna
-            query = "SELECT GambarWarung, MimeGambarWarung FROM Warung WHERE IdWarung = %s"
-            cur.execute(query, (id_warung,))
-            data = cur.fetchone()
-            if data:
-                return data[0], data[1]
-            return None, None
-        finally:
-            cur.close()
-            conn.close()
+        """Ambil (bytes, mime) foto warung dari image_store; (None, None) jika tidak ada."""
+        return image_store.load_image("warung", id_warung)
     
     def search_by_name(self, keyword, limit=20, offset=0):
-        conn = get_db_connection()
+        conn = get_db_connection(readonly=True)
         cur = conn.cursor(dictionary=True)
         try:
-            sql = "SELECT * FROM Warung WHERE NamaWarung LIKE %s LIMIT %s OFFSET %s"
+            sql = f"SELECT {KOLOM_RINGKAS} FROM Warung WHERE NamaWarung LIKE %s LIMIT %s OFFSET %s"
             search_pattern = f"%{keyword}%"
             val = (search_pattern, limit, offset)
             
@@ -404,21 +538,7 @@ class Warung:
                 # PERBAIKAN DI SINI:
                 # Gunakan constructor (parameter) agar internal variable terisi
                 # sehingga w.get_id_warung() nanti tidak return None.
-                w = Warung(
-                    id_warung=row.get('IdWarung'),
-                    id_penjual=row.get('IdPenjual'),
-                    nama_warung=row.get('NamaWarung'),
-                    alamat_warung=row.get('AlamatWarung'),
-                    rating_warung=row.get('Rating'),
-                    gambar_warung=row.get('GambarWarung'), 
-                    # Jika ada kolom lain seperti kordinat, tambahkan juga:
-                    kordinat_warung=row.get('KordinatWarung') 
-                )
-                
-                # Jika Anda punya logika manual untuk atribut publik, bisa dihapus 
-                # karena sudah ditangani class Warung via init di atas.
-                
-                results.append(w)
+                results.append(Warung._dari_row(row))
                 
             return results
             
@@ -1,13 +1,667 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
 import mysql.connector
-from flask import current_app
+from mysql.connector import errors as mysql_errors
+from flask import current_app, g, has_app_context, has_request_context, request, session
 from flask_socketio import SocketIO
 
+from .query_stats import instrument_cursor, record_statement, request_problems
+
+logger = logging.getLogger(__name__)
+
 socketio = SocketIO()
-def get_db_connection():
-    return mysql.connector.connect(
-        host=current_app.config['MYSQL_HOST'],
-        user=current_app.config['MYSQL_USER'],
-        password=current_app.config['MYSQL_PASSWORD'],
-        database=current_app.config['MYSQL_DB']
+
+# Default pool; semua bisa dioverride lewat app.config (lihat app.py)
+POOL_DEFAULTS = {
+    "MYSQL_POOL_SIZE": 5,            # koneksi idle yang dipertahankan
+    "MYSQL_POOL_MAX_OVERFLOW": 10,   # koneksi tambahan saat ramai, ditutup setelah dipakai
+    "MYSQL_POOL_RECYCLE": 1800,      # detik; koneksi lebih tua dari ini dibuat ulang
+    "MYSQL_POOL_PRE_PING": True,     # ping koneksi idle sebelum dipinjamkan
+    "MYSQL_POOL_TIMEOUT": 10,        # detik menunggu koneksi bebas sebelum error
+    "MYSQL_PREPARED_STATEMENTS": False,  # cursor(prepared=True) memakai server-side prepared statement
+    "MYSQL_PREPARED_CACHE_SIZE": 32,     # statement prepared yang disimpan per koneksi (LRU)
+    "MYSQL_STICKY_PRIMARY_SECONDS": 5,   # setelah session menulis, bacaan readonly tetap ke primary
+}
+
+# Method request yang tidak menulis; request lain selalu membaca dari primary
+SAFE_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+STICKY_SESSION_KEY = "_db_primary_until"
+
+# Satu koneksi + satu transaksi per request HTTP (lihat RequestConnection)
+DB_REQUEST_SCOPED_DEFAULT = True
+
+
+class PoolTimeoutError(mysql_errors.PoolError):
+    """Semua koneksi (termasuk overflow) sedang dipakai dan waktu tunggu habis."""
+
+
+class StatementCache:
+    """
+    Cache statement prepared milik satu koneksi fisik, kunci = teks SQL.
+
+    Satu cursor prepared per SQL: cursor yang menjalankan SQL yang sama lagi
+    memakai ulang statement yang sudah di-parse server (COM_STMT_EXECUTE saja).
+    Cache ikut koneksi saat kembali ke pool; yang paling lama tidak dipakai
+    ditutup (DEALLOCATE) jika melebihi `size`.
+    """
+
+    def __init__(self, pool, raw, size):
+        self._pool = pool
+        self._raw = raw
+        self.size = max(1, int(size))
+        self._cursors = OrderedDict()
+
+    def get(self, sql):
+        cur = self._cursors.get(sql)
+        if cur is not None:
+            self._cursors.move_to_end(sql)
+            self._pool._count("stmt_reused")
+            return cur
+        self._pool._count("stmt_prepared")
+        cur = self._raw.cursor(prepared=True)
+        self._cursors[sql] = cur
+        if len(self._cursors) > self.size:
+            _, old = self._cursors.popitem(last=False)
+            try:
+                old.close()
+            except Exception:
+                pass
+        return cur
+
+
+class PreparedCursor:
+    """
+    Cursor untuk statement dari StatementCache. Hasil dibaca habis saat execute()
+    supaya statement langsung bebas dipakai lagi; dictionary=True memetakan baris
+    ke dict seperti cursor biasa.
+    """
+
+    def __init__(self, cache, dictionary=False):
+        self._cache = cache
+        self._dictionary = dictionary
+        self._rows = []
+        self._pos = 0
+        self.rowcount = -1
+        self.lastrowid = None
+        self.description = None
+        self.column_names = ()
+
+    def execute(self, operation, params=None):
+        cur = self._cache.get(operation)
+        cur.execute(operation, tuple(params or ()))
+        self.description = cur.description
+        self.column_names = tuple(cur.column_names or ()) if cur.description else ()
+        rows = cur.fetchall() if cur.description else []
+        if self._dictionary:
+            names = self.column_names
+            rows = [dict(zip(names, row)) for row in rows]
+        self._rows, self._pos = rows, 0
+        self.rowcount = len(rows) if cur.description else cur.rowcount
+        self.lastrowid = cur.lastrowid
+
+    @property
+    def with_rows(self):
+        return self.description is not None
+
+    def fetchone(self):
+        if self._pos >= len(self._rows):
+            return None
+        row = self._rows[self._pos]
+        self._pos += 1
+        return row
+
+    def fetchmany(self, size=1):
+        rows = self._rows[self._pos:self._pos + size]
+        self._pos += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._rows[self._pos:]
+        self._pos = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        # cursor prepared tetap di cache koneksi
+        self._rows = []
+
+
+class PooledConnection:
+    """
+    Pembungkus koneksi MySQL milik pool. Semua atribut diteruskan ke koneksi asli,
+    kecuali close() yang mengembalikan koneksi ke pool, jadi pola lama
+    `conn = get_db_connection() ... conn.close()` tetap berlaku.
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+
+    def close(self):
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool.release(raw, self._created_at)
+
+    def cursor(self, *args, prepared=False, **kwargs):
+        """
+        prepared=True: pakai statement prepared dari cache koneksi ini jika
+        MYSQL_PREPARED_STATEMENTS aktif; jika tidak, cursor biasa. Parameter
+        harus positional (%s).
+        """
+        if prepared and self._pool.prepared:
+            cache = getattr(self._raw, "_statement_cache", None)
+            if cache is None:
+                cache = StatementCache(self._pool, self._raw, self._pool.statement_cache_size)
+                self._raw._statement_cache = cache
+            return instrument_cursor(PreparedCursor(cache, dictionary=kwargs.get("dictionary", False)))
+        return instrument_cursor(self._raw.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get("_raw")
+        if raw is None:
+            raise mysql_errors.OperationalError("Koneksi sudah dikembalikan ke pool")
+        return getattr(raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class RequestConnection:
+    """
+    Koneksi bersama untuk satu request HTTP (unit of work).
+
+    Semua pemanggilan get_db_connection() di dalam request yang sama mendapat
+    objek ini. commit() dan close() dari model ditunda: transaksi di-commit sekali
+    di after_request dan koneksi dikembalikan ke pool di teardown_request. Jika
+    request gagal (exception atau status 5xx) seluruh pekerjaan di-rollback.
+
+    Transaksi model menjadi SAVEPOINT di dalam transaksi request: start_transaction()
+    membuat savepoint, commit() melepasnya, rollback() kembali ke savepoint itu
+    sehingga yang dibatalkan hanya pekerjaan blok tersebut. rollback() tanpa
+    savepoint me-rollback seluruh unit dan menandainya gagal (failed): pekerjaan
+    request ini tidak di-commit sama sekali, bukan di-commit sebagian.
+
+    Tidak ada commit di tengah request: transactional_retry memakai SAVEPOINT per
+    percobaan (savepoint()/rollback_to()), jadi lock FOR UPDATE ditahan sampai
+    response selesai. Jika server membuang seluruh transaksi (deadlock) unit
+    ditandai gagal (failed) dan tidak akan di-commit.
+
+    Efek di luar database (cache gambar, antrean job) didaftarkan dengan
+    after_commit() dan baru dijalankan setelah COMMIT berhasil; callback yang
+    didaftarkan di savepoint yang di-rollback ikut dibuang.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._savepoints = []
+        self._model_savepoints = set()  # dibuat start_transaction() model
+        self._savepoint_seq = 0
+        self.wrote = False   # ada INSERT/UPDATE/DELETE di transaksi ini
+        self.failed = False  # transaksi sudah di-rollback seluruhnya
+        self._after_commit = []  # (jumlah savepoint saat didaftarkan, callback)
+
+    def cursor(self, *args, **kwargs):
+        cur = self._conn.cursor(*args, **kwargs)
+        cur.on_write = self._mark_write
+        return cur
+
+    def _mark_write(self):
+        self.wrote = True
+
+    def _execute(self, sql):
+        cur = self._conn.cursor()
+        try:
+            cur.execute(sql)
+        finally:
+            cur.close()
+
+    def close(self):
+        pass
+
+    def start_transaction(self, *args, **kwargs):
+        self._model_savepoints.add(self.savepoint())
+
+    def commit(self):
+        if self._savepoints and self._savepoints[-1] in self._model_savepoints:
+            self.release_savepoint(self._savepoints[-1])
+
+    def rollback(self):
+        if self._savepoints:
+            self.rollback_to(self._savepoints[-1])
+        else:
+            self.abort()
+
+    def after_commit(self, callback):
+        """Jalankan `callback` setelah unit ini di-commit (dibuang jika di-rollback)."""
+        self._after_commit.append((len(self._savepoints), callback))
+
+    def _drop_savepoints(self, name):
+        depth = self._savepoints.index(name)
+        del self._savepoints[depth:]
+        return depth
+
+    def savepoint(self):
+        """Buat SAVEPOINT baru (memulai transaksi jika perlu) dan kembalikan namanya."""
+        if not self._conn.in_transaction:
+            self._conn.start_transaction()
+        self._savepoint_seq += 1
+        name = f"uow_{self._savepoint_seq}"
+        self._execute(f"SAVEPOINT {name}")
+        self._savepoints.append(name)
+        return name
+
+    def release_savepoint(self, name):
+        if name not in self._savepoints:
+            return
+        depth = self._drop_savepoints(name)
+        # callback blok ini sekarang milik savepoint di luarnya
+        self._after_commit = [(min(d, depth), cb) for d, cb in self._after_commit]
+        self._execute(f"RELEASE SAVEPOINT {name}")
+
+    def rollback_to(self, name):
+        """
+        Batalkan pekerjaan sejak savepoint `name`. Savepoint yang sudah hilang di
+        server (transaksi di-rollback server, mis. deadlock) -> abort().
+        """
+        if name not in self._savepoints:
+            return
+        depth = self._drop_savepoints(name)
+        self._after_commit = [(d, cb) for d, cb in self._after_commit if d <= depth]
+        try:
+            self._execute(f"ROLLBACK TO SAVEPOINT {name}")
+        except mysql_errors.Error:
+            self.abort()
+
+    def abort(self):
+        """Rollback seluruh transaksi request; unit tidak akan di-commit."""
+        self._savepoints = []
+        self._after_commit = []
+        self.failed = True
+        try:
+            self._conn.rollback()
+        except mysql_errors.Error:
+            pass
+
+    def reset(self):
+        """Pakai lagi unit yang di-abort sebelum menulis apa pun (tidak ada yang hilang)."""
+        self._savepoints = []
+        self.wrote = False
+        self.failed = False
+
+    def finish(self, commit):
+        """
+        Akhiri unit; True jika ada tulisan yang benar-benar di-commit. Callback
+        after_commit() dijalankan setelah COMMIT berhasil dan koneksi kembali ke pool.
+        """
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return False
+        callbacks, self._after_commit = self._after_commit, []
+        committed = False
+        try:
+            if commit and not self.failed:
+                start = time.perf_counter()
+                conn.commit()
+                record_statement("COMMIT", time.perf_counter() - start)
+                committed = self.wrote
+            else:
+                callbacks = []
+                conn.rollback()
+        finally:
+            conn.close()
+        for _, callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                # data sudah tersimpan; efek susulan yang gagal tidak membatalkan response
+                logger.exception("Callback after_commit gagal")
+        return committed
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get("_conn")
+        if conn is None:
+            raise mysql_errors.OperationalError("Unit of work request sudah selesai")
+        return getattr(conn, name)
+
+
+class ConnectionPool:
+    def __init__(self, connect_kwargs, size=5, max_overflow=10, recycle=1800, pre_ping=True, timeout=10,
+                 prepared=False, statement_cache_size=32):
+        self._connect_kwargs = dict(connect_kwargs)
+        self.size = max(1, int(size))
+        self.max_overflow = max(0, int(max_overflow))
+        self.recycle = int(recycle or 0)
+        self.pre_ping = bool(pre_ping)
+        self.timeout = float(timeout)
+        self.prepared = bool(prepared)
+        self.statement_cache_size = int(statement_cache_size)
+
+        self._idle = deque()  # (raw, created_at)
+        self._cond = threading.Condition()
+        self._open = 0
+
+        self._counters = {
+            "checkouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "ping_failures": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "timeouts": 0,
+            "stmt_prepared": 0,
+            "stmt_reused": 0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._cond:
+            self._counters[name] += amount
+
+    def _connect(self):
+        raw = mysql.connector.connect(**self._connect_kwargs)
+        with self._cond:
+            self._counters["created"] += 1
+        return raw, time.monotonic()
+
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _is_usable(self, raw, created_at):
+        if self.recycle and time.monotonic() - created_at > self.recycle:
+            with self._cond:
+                self._counters["recycled"] += 1
+            return False
+        if self.pre_ping:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                with self._cond:
+                    self._counters["ping_failures"] += 1
+                return False
+        return True
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        waited_since = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, created_at = self._idle.pop()
+                    break
+                if self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    raw, created_at = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"Pool MySQL penuh ({self._open} koneksi), tidak ada koneksi bebas dalam {self.timeout:g} detik"
+                    )
+                if waited_since is None:
+                    waited_since = time.monotonic()
+                    self._counters["waits"] += 1
+                self._cond.wait(remaining)
+            if waited_since is not None:
+                self._counters["wait_time"] += time.monotonic() - waited_since
+            self._counters["checkouts"] += 1
+
+        try:
+            if raw is not None and not self._is_usable(raw, created_at):
+                self._discard(raw)
+                raw = None
+            if raw is None:
+                raw, created_at = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, raw, created_at)
+
+    def release(self, raw, created_at):
+        keep = True
+        try:
+            if getattr(raw, "in_transaction", False):
+                # transaksi yang tidak di-commit tidak boleh bocor ke peminjam berikutnya
+                raw.rollback()
+        except Exception:
+            keep = False
+
+        with self._cond:
+            if keep and len(self._idle) < self.size:
+                self._idle.append((raw, created_at))
+                raw = None
+            else:
+                self._open -= 1
+            self._cond.notify()
+        if raw is not None:
+            self._discard(raw)
+
+    def dispose(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+        for raw, _ in idle:
+            self._discard(raw)
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            data = {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "open": self._open,
+                "idle": idle,
+                "in_use": self._open - idle,
+                "overflow": max(0, self._open - self.size),
+            }
+            data.update(self._counters)
+        data["wait_time"] = round(data["wait_time"], 6)
+        return data
+
+
+_pool_lock = threading.Lock()
+
+
+def _pool_config(app, key):
+    return app.config.get(key, POOL_DEFAULTS[key])
+
+
+def _build_pool(app, prefix):
+    """Pool untuk server dengan konfigurasi {prefix}_HOST/USER/...; nilai kosong ikut primary."""
+    def conf(name):
+        value = app.config.get(f"{prefix}_{name}")
+        return value if value not in (None, "") else app.config[f"MYSQL_{name}"]
+
+    connect_kwargs = {
+        "host": conf("HOST"),
+        "user": conf("USER"),
+        "password": conf("PASSWORD"),
+        "database": conf("DB"),
+        # koneksi dipakai bergantian oleh banyak model dalam satu request;
+        # hasil query yang belum dibaca habis dibuang otomatis
+        "consume_results": True,
+    }
+    port = app.config.get(f"{prefix}_PORT")
+    if port:
+        connect_kwargs["port"] = int(port)
+    return ConnectionPool(
+        connect_kwargs=connect_kwargs,
+        size=_pool_config(app, "MYSQL_POOL_SIZE"),
+        max_overflow=_pool_config(app, "MYSQL_POOL_MAX_OVERFLOW"),
+        recycle=_pool_config(app, "MYSQL_POOL_RECYCLE"),
+        pre_ping=_pool_config(app, "MYSQL_POOL_PRE_PING"),
+        timeout=_pool_config(app, "MYSQL_POOL_TIMEOUT"),
+        prepared=_pool_config(app, "MYSQL_PREPARED_STATEMENTS"),
+        statement_cache_size=_pool_config(app, "MYSQL_PREPARED_CACHE_SIZE"),
     )
 
+
+def _get_pool(app=None):
+    app = app or current_app._get_current_object()
+    pool = app.extensions.get("mysql_pool")
+    if pool is not None:
+        return pool
+    with _pool_lock:
+        pool = app.extensions.get("mysql_pool")
+        if pool is None:
+            pool = _build_pool(app, "MYSQL")
+            app.extensions["mysql_pool"] = pool
+    return pool
+
+
+def _get_replica_pool(app=None):
+    """Pool replica baca, atau None jika MYSQL_REPLICA_HOST tidak diset."""
+    app = app or current_app._get_current_object()
+    pool = app.extensions.get("mysql_replica_pool")
+    if pool is not None:
+        return pool or None
+    with _pool_lock:
+        pool = app.extensions.get("mysql_replica_pool")
+        if pool is None:
+            pool = _build_pool(app, "MYSQL_REPLICA") if app.config.get("MYSQL_REPLICA_HOST") else False
+            app.extensions["mysql_replica_pool"] = pool
+    return pool or None
+
+
+def _request_scoped():
+    return has_request_context() and current_app.config.get("DB_REQUEST_SCOPED", DB_REQUEST_SCOPED_DEFAULT)
+
+
+def _primary_sticky():
+    """Request tulis, atau session yang baru menulis, membaca dari primary."""
+    if not has_request_context():
+        # worker fan_out membawa keputusan request pemanggilnya
+        return has_app_context() and bool(g.get("_db_read_primary"))
+    if request.method not in SAFE_METHODS:
+        return True
+    until = session.get(STICKY_SESSION_KEY)
+    return bool(until) and until > time.time()
+
+
+def mark_primary_sticky(seconds=None):
+    """Arahkan bacaan session ini ke primary selama `seconds` (default MYSQL_STICKY_PRIMARY_SECONDS)."""
+    if not has_request_context():
+        return
+    if seconds is None:
+        seconds = _pool_config(current_app, "MYSQL_STICKY_PRIMARY_SECONDS")
+    session[STICKY_SESSION_KEY] = time.time() + float(seconds)
+
+
+def _replica_connection():
+    """Koneksi replica untuk bacaan, atau None jika harus / terpaksa ke primary."""
+    pool = _get_replica_pool()
+    if pool is None or _primary_sticky():
+        return None
+    if not _request_scoped():
+        try:
+            return pool.acquire()
+        except mysql_errors.Error:
+            current_app.logger.warning("Replica tidak tersedia, baca dari primary", exc_info=True)
+            return None
+    unit = g.get("_db_replica_unit")
+    if unit is None:
+        try:
+            unit = RequestConnection(pool.acquire())
+        except mysql_errors.Error:
+            current_app.logger.warning("Replica tidak tersedia, baca dari primary", exc_info=True)
+            return None
+        g._db_replica_unit = unit
+    return unit
+
+
+def get_db_connection(autonomous=False, readonly=False):
+    """
+    Di dalam request: kembalikan koneksi unit of work milik request ini.
+    autonomous=True (atau di luar request) meminjam koneksi sendiri dari pool;
+    pemanggil wajib commit sendiri, seperti perilaku lama.
+
+    readonly=True untuk finder yang hanya SELECT: diarahkan ke replica jika
+    MYSQL_REPLICA_HOST diset, kecuali request tulis (POST dll.) atau session yang
+    menulis dalam MYSQL_STICKY_PRIMARY_SECONDS terakhir (read-your-writes).
+    """
+    if readonly and not autonomous:
+        conn = _replica_connection()
+        if conn is not None:
+            return conn
+    if autonomous or not _request_scoped():
+        return _get_pool().acquire()
+    unit = g.get("_db_unit")
+    if unit is None:
+        unit = RequestConnection(_get_pool().acquire())
+        g._db_unit = unit
+    return unit
+
+
+def after_commit(conn, callback):
+    """
+    Jalankan `callback` setelah tulisan di `conn` tersimpan. Di dalam request ditunda
+    sampai unit of work di-commit di after_request (tidak dijalankan jika request
+    di-rollback); koneksi biasa sudah di-commit pemanggil, jadi langsung dijalankan.
+    """
+    if isinstance(conn, RequestConnection):
+        conn.after_commit(callback)
+    else:
+        callback()
+
+
+def _commit_request_unit(response):
+    """
+    Commit unit of work request (status < 500) sekali di akhir. Ini satu-satunya
+    COMMIT di dalam request: transactional_retry hanya memakai SAVEPOINT.
+    """
+    unit = g.pop("_db_unit", None)
+    if unit is not None:
+        # error dilempar ke Flask -> 500, dan teardown tidak menemukan unit lagi
+        commit = response.status_code < 500
+        if commit and request_problems():
+            # SQL_REPEAT_DETECTION="raise": _emit_request_stats (setelah hook ini)
+            # melempar RepeatedQueryError -> 500, jadi tulisannya jangan di-commit
+            commit = False
+        elif commit and unit.failed:
+            current_app.logger.warning(
+                "Unit of work %s di-rollback oleh model, tidak di-commit", request.endpoint or request.path
+            )
+        # read-your-writes hanya jika unit ini benar-benar meng-commit tulisan
+        if unit.finish(commit=commit) and _get_replica_pool() is not None:
+            mark_primary_sticky()
+    replica = g.pop("_db_replica_unit", None)
+    if replica is not None:
+        replica.finish(commit=False)
+    return response
+
+
+def _release_request_unit(exc=None):
+    for key in ("_db_unit", "_db_replica_unit"):
+        unit = g.pop(key, None)
+        if unit is not None:
+            try:
+                unit.finish(commit=False)
+            except Exception:
+                current_app.logger.exception("Gagal rollback unit of work request")
+
+
+def init_app(app):
+    app.after_request(_commit_request_unit)
+    app.teardown_request(_release_request_unit)
+
+
+def get_pool_stats(app=None):
+    """Statistik pool saat ini (koneksi terbuka, idle, dipakai, overflow, counter)."""
+    data = _get_pool(app).stats()
+    replica = _get_replica_pool(app)
+    if replica is not None:
+        data["replica"] = replica.stats()
+    return data
@@ -0,0 +1,337 @@
+"""
+Harness regresi rencana query (EXPLAIN).
+
+Mengisi database scratch dengan data representatif, menjalankan halaman-halaman
+utama lewat Flask test client sambil merekam setiap statement (capture_statements),
+lalu menjalankan EXPLAIN untuk tiap bentuk statement dengan parameter aslinya.
+Gagal jika ada:
+
+  - full table scan (type ALL) atau full index scan (type index) di tabel besar,
+  - "Using filesort" di tabel besar,
+  - DEPENDENT SUBQUERY (subquery berkorelasi yang dijalankan per baris).
+
+    flask --app app db explain --seed     # isi data dulu (hanya DB scratch)
+    flask --app app db explain --rows 500 # ambang "tabel besar" (estimasi baris)
+
+Seed hanya mau berjalan jika nama database mengandung "test", "explain" atau
+"scratch", supaya data palsu tidak pernah masuk ke database produksi.
+"""
+import random
+import sys
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, url_for
+
+from .db import get_db_connection
+from .migrations import db_cli
+from .query_stats import capture_statements, normalize_sql
+
+LARGE_ROWS_DEFAULT = 1000
+
+SEED_SIZES = {
+    "pembeli": 300,
+    "warung": 60,
+    "makanan_per_warung": 50,
+    "pesanan_warung": 6000,
+    "item_per_pesanan": 3,
+    "ruang_chat": 2000,
+    "pesan_per_ruang": 10,
+}
+
+SCRATCH_DB_MARKERS = ("test", "explain", "scratch")
+
+# (peran, endpoint, argumen url_for); nilai "{...}" diisi dari konteks seed
+SCENARIOS = [
+    ("pembeli", "home.home", {}),
+    ("pembeli", "home.home", {"type": "makanan", "sort": "sold_high"}),
+    ("pembeli", "home.home", {"type": "makanan", "sort": "highest"}),
+    ("pembeli", "home.home", {"type": "warung", "sort": "highest"}),
+    ("pembeli", "home.home", {"q": "nasi"}),
+    ("pembeli", "warung.warung_detail", {"id_warung": "{warung}"}),
+    ("pembeli", "warung.makanan_detail", {"id_m": "{makanan}"}),
+    ("pembeli", "warung.warung_search", {"sort": "sold_high"}),
+    ("pembeli", "warung.warung_search", {"q": "warung"}),
+    ("pembeli", "obrolan.inbox", {}),
+    ("pembeli", "obrolan.room_chat", {"id_ruang": "{ruang}"}),
+    ("pembeli", "obrolan.api_get_history", {"id_ruang": "{ruang}"}),
+    ("pembeli", "pesanan.pesanan_list", {}),
+    ("pembeli", "pesanan.pesanan_detail", {"id_pesanan": "{pesanan}"}),
+    ("pembeli", "keranjang.get_server_cart", {}),
+    ("penjual", "warung.home_warung", {}),
+    ("penjual", "warung.profil_warung", {}),
+    ("penjual", "warung.makanan_tambah", {"id_warung": "{warung}"}),
+    ("penjual", "pesanan.list_pesanan_penjual", {}),
+    ("penjual", "pesanan.detail_pesanan_warung", {"id_pesanan": "{pesanan_warung}"}),
+    ("penjual", "obrolan.inbox", {}),
+]
+
+# Temuan yang sudah diterima: (potongan SQL ternormalisasi, alasan)
+EXPLAIN_ALLOW = [
+    ("NamaWarung LIKE ?", "pencarian substring '%q%' memang scan; perlu FULLTEXT untuk memperbaiki"),
+    ("NamaMakanan LIKE ?", "pencarian substring '%q%' memang scan; perlu FULLTEXT untuk memperbaiki"),
+    ("SUM(p.BanyakPesanan) AS total_sold FROM Pesanan p", "urutan terlaris /warung/search masih SUM seluruh Pesanan; counter hanya per makanan"),
+]
+
+_SEED_TABLES = ("Pengguna", "Warung", "Makanan", "PesananWarung", "Pesanan", "Obrolan")
+_STATUS_PESANAN = ("Menunggu", "Diproses", "Diantar", "Selesai", "Dibatalkan", "Keranjang")
+_NAMA_MAKANAN = ("Nasi Goreng", "Mie Ayam", "Sate", "Bakso", "Soto", "Ayam Geprek", "Es Teh", "Gado-gado")
+
+
+# -------------------------
+# Seed
+# -------------------------
+def _is_scratch_db(name):
+    return any(marker in (name or "").lower() for marker in SCRATCH_DB_MARKERS)
+
+
+def _insert_many(cur, sql, rows, batch=1000):
+    for i in range(0, len(rows), batch):
+        cur.executemany(sql, rows[i:i + batch])
+
+
+def seed(sizes=None, echo=print):
+    """Isi data representatif sekali (dilewati jika data seed sudah ada)."""
+    sizes = dict(SEED_SIZES, **(sizes or {}))
+    rnd = random.Random(7)
+    now = datetime.now()
+
+    conn = get_db_connection(autonomous=True)
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT DATABASE()")
+        db_name = cur.fetchone()[0]
+        if not _is_scratch_db(db_name):
+            raise click.ClickException(
+                f"Menolak seed ke database '{db_name}': nama harus mengandung {', '.join(SCRATCH_DB_MARKERS)}"
+            )
+        cur.execute("SELECT 1 FROM Pengguna WHERE Email=%s", ("explain+0@example.invalid",))
+        if cur.fetchone():
+            echo("Data seed sudah ada, dilewati.")
+            return
+
+        total_pengguna = sizes["pembeli"] + sizes["warung"]
+        _insert_many(cur, "INSERT INTO Pengguna (NamaPengguna, Email, Password, Peran) VALUES (%s, %s, %s, %s)", [
+            (f"explain_{i}", f"explain+{i}@example.invalid", "-", "pembeli" if i < sizes["pembeli"] else "penjual")
+            for i in range(total_pengguna)
+        ])
+        cur.execute("SELECT IdPengguna, Peran FROM Pengguna WHERE Email LIKE %s ORDER BY IdPengguna", ("explain+%",))
+        pengguna = cur.fetchall()
+        pembeli = [r[0] for r in pengguna if r[1] == "pembeli"]
+        penjual = [r[0] for r in pengguna if r[1] == "penjual"]
+
+        _insert_many(cur, """
+            INSERT INTO Warung (IdPenjual, NamaWarung, AlamatWarung, NomorTeleponWarung, Rating, KordinatWarung, JamBuka, JamTutup, DibuatPada)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, [
+            (id_penjual, f"Warung Explain {i}", f"Jl. Contoh {i}", "0800000000",
+             round(rnd.uniform(3, 5), 1), f"-6.{rnd.randint(100000, 999999)},106.{rnd.randint(100000, 999999)}",
+             "08:00", "21:00", now)
+            for i, id_penjual in enumerate(penjual)
+        ])
+        cur.execute("SELECT IdWarung FROM Warung WHERE IdPenjual IN (%s)" % ",".join(["%s"] * len(penjual)), tuple(penjual))
+        warung = [r[0] for r in cur.fetchall()]
+
+        _insert_many(cur, """
+            INSERT INTO Makanan (IdWarung, NamaMakanan, DetailMakanan, HargaMakanan, Stok, Tersedia, Rating)
+            VALUES (%s, %s, %s, %s, %s, 1, %s)
+        """, [
+            (id_warung, f"{rnd.choice(_NAMA_MAKANAN)} {j}", "Seed explain", rnd.randint(5, 50) * 1000,
+             rnd.randint(0, 100), round(rnd.uniform(0, 5), 1))
+            for id_warung in warung for j in range(sizes["makanan_per_warung"])
+        ])
+        cur.execute("SELECT IdMakanan, IdWarung FROM Makanan WHERE IdWarung IN (%s)" % ",".join(["%s"] * len(warung)), tuple(warung))
+        menu = {}
+        for id_makanan, id_warung in cur.fetchall():
+            menu.setdefault(id_warung, []).append(id_makanan)
+
+        _insert_many(cur, """
+            INSERT INTO PesananWarung (IdPembeli, IdWarung, TotalHarga, DeskripsiPesanan, Status, DibuatPada)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, [
+            (rnd.choice(pembeli), rnd.choice(warung), rnd.randint(10, 200) * 1000, "Seed explain",
+             rnd.choice(_STATUS_PESANAN), now - timedelta(minutes=rnd.randint(0, 90 * 24 * 60)))
+            for _ in range(sizes["pesanan_warung"])
+        ])
+        cur.execute("SELECT IdPesananWarung, IdWarung FROM PesananWarung WHERE IdPembeli IN (%s)" % ",".join(["%s"] * len(pembeli)), tuple(pembeli))
+        items = []
+        for id_pw, id_warung in cur.fetchall():
+            for id_makanan in rnd.sample(menu[id_warung], sizes["item_per_pesanan"]):
+                qty = rnd.randint(1, 4)
+                items.append((id_pw, id_makanan, qty, qty * 10000))
+        _insert_many(cur, "INSERT INTO Pesanan (IdPesananWarung, IdMakanan, BanyakPesanan, Subtotal) VALUES (%s, %s, %s, %s)", items)
+
+        pesan = []
+        for r in range(sizes["ruang_chat"]):
+            id_pembeli, id_warung = rnd.choice(pembeli), rnd.choice(warung)
+            id_ruang = f"explain-{r}"
+            for k in range(sizes["pesan_per_ruang"]):
+                pesan.append((
+                    f"explain-{r}-{k}", id_pembeli, id_warung, "Halo, pesanan saya?",
+                    rnd.choice(("pembeli", "penjual")), id_ruang, None,
+                    now - timedelta(minutes=rnd.randint(0, 90 * 24 * 60)), "sent",
+                ))
+        _insert_many(cur, """
+            INSERT INTO Obrolan (IdObrolan, IdPengguna, IdWarung, Isi, Pengirim, IdRuang, ReplyToPesananWarung, Waktu, Status)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, pesan)
+        conn.commit()
+
+        for table in _SEED_TABLES:
+            cur.execute(f"ANALYZE TABLE {table}")
+            cur.fetchall()
+        echo(f"Seed selesai: {len(pembeli)} pembeli, {len(warung)} warung, {len(items)} item pesanan, {len(pesan)} pesan chat.")
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _context():
+    """Id contoh dari data seed untuk mengisi argumen SCENARIOS."""
+    conn = get_db_connection(autonomous=True)
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute("""
+            SELECT IdPembeli, COUNT(*) AS n FROM PesananWarung
+            GROUP BY IdPembeli ORDER BY n DESC LIMIT 1
+        """)
+        row = cur.fetchone()
+        if not row:
+            raise click.ClickException("Database kosong; jalankan dengan --seed di database scratch.")
+        pembeli = row["IdPembeli"]
+        cur.execute("""
+            SELECT w.IdWarung, w.IdPenjual FROM Warung w
+            JOIN PesananWarung pw ON pw.IdWarung = w.IdWarung
+            GROUP BY w.IdWarung, w.IdPenjual ORDER BY COUNT(*) DESC LIMIT 1
+        """)
+        warung = cur.fetchone()
+        cur.execute("SELECT IdMakanan FROM Makanan WHERE IdWarung=%s LIMIT 1", (warung["IdWarung"],))
+        makanan = cur.fetchone()
+        cur.execute("SELECT IdRuang FROM Obrolan WHERE IdPengguna=%s LIMIT 1", (pembeli,))
+        ruang = cur.fetchone()
+        cur.execute("SELECT IdPesananWarung FROM PesananWarung WHERE IdPembeli=%s AND Status <> 'Keranjang' LIMIT 1", (pembeli,))
+        pesanan = cur.fetchone()
+        cur.execute("SELECT IdPesananWarung FROM PesananWarung WHERE IdWarung=%s AND Status <> 'Keranjang' LIMIT 1", (warung["IdWarung"],))
+        pesanan_warung = cur.fetchone()
+        conn.commit()
+        return {
+            "pembeli": pembeli,
+            "penjual": warung["IdPenjual"],
+            "warung": warung["IdWarung"],
+            "makanan": makanan["IdMakanan"] if makanan else 0,
+            "ruang": ruang["IdRuang"] if ruang else "0",
+            "pesanan": pesanan["IdPesananWarung"] if pesanan else 0,
+            "pesanan_warung": pesanan_warung["IdPesananWarung"] if pesanan_warung else 0,
+        }
+    finally:
+        cur.close()
+        conn.close()
+
+
+# -------------------------
+# Rekam & EXPLAIN
+# -------------------------
+def capture(app, ctx, echo=print):
+    """Jalankan SCENARIOS; kembalikan {sql ternormalisasi: {"sql", "params", "sources"}}."""
+    statements = {}
+    for role, endpoint, args in SCENARIOS:
+        args = {k: v.format(**ctx) if isinstance(v, str) else v for k, v in args.items()}
+        with app.test_request_context():
+            url = url_for(endpoint, **args)
+        with app.test_client() as client:
+            with client.session_transaction() as sess:
+                sess["user"] = {"IdPengguna": ctx[role], "NamaPengguna": f"explain_{role}", "Peran": role}
+            with capture_statements() as captured:
+                resp = client.get(url)
+        if resp.status_code >= 400:
+            echo(f"   peringatan: {role} GET {url} -> {resp.status_code}")
+        for sql, params in captured:
+            key = normalize_sql(sql)
+            entry = statements.setdefault(key, {"sql": sql, "params": params, "sources": []})
+            if url not in entry["sources"]:
+                entry["sources"].append(url)
+    return statements
+
+
+def _explainable(sql):
+    return normalize_sql(sql)[:6].upper() in ("SELECT", "UPDATE", "DELETE")
+
+
+def plan_problems(plan, large_rows):
+    """Masalah pada hasil EXPLAIN (list of dict, format tabel tradisional)."""
+    problems = []
+    for row in plan:
+        rows = int(row.get("rows") or 0)
+        extra = row.get("Extra") or ""
+        table = row.get("table")
+        select_type = (row.get("select_type") or "").upper()
+        if select_type.startswith("DEPENDENT"):
+            problems.append(f"{select_type} pada {table}")
+        if row.get("type") == "ALL" and rows >= large_rows:
+            problems.append(f"full table scan {table} (~{rows} baris)")
+        elif row.get("type") == "index" and rows >= large_rows:
+            problems.append(f"full index scan {table} via {row.get('key')} (~{rows} baris)")
+        if "Using filesort" in extra and rows >= large_rows:
+            problems.append(f"filesort {table} (~{rows} baris)")
+    return problems
+
+
+def _allowed(key):
+    for fragment, reason in EXPLAIN_ALLOW:
+        if fragment in key:
+            return reason
+    return None
+
+
+def explain_all(statements, large_rows=LARGE_ROWS_DEFAULT):
+    """EXPLAIN setiap statement; kembalikan (temuan, jumlah statement yang dicek)."""
+    findings = []
+    checked = 0
+    conn = get_db_connection(autonomous=True)
+    cur = conn.cursor(dictionary=True)
+    try:
+        for key, entry in sorted(statements.items()):
+            if not _explainable(entry["sql"]):
+                continue
+            checked += 1
+            cur.execute(f"EXPLAIN {entry['sql']}", entry["params"])
+            problems = plan_problems(cur.fetchall(), large_rows)
+            if problems:
+                findings.append(dict(entry, key=key, problems=problems, allowed=_allowed(key)))
+        conn.rollback()
+    finally:
+        cur.close()
+        conn.close()
+    return findings, checked
+
+
+def run(app, do_seed=False, large_rows=LARGE_ROWS_DEFAULT, echo=print):
+    if do_seed:
+        seed(echo=echo)
+    ctx = _context()
+    statements = capture(app, ctx, echo=echo)
+    return explain_all(statements, large_rows=large_rows)
+
+
+@click.command("explain")
+@click.option("--seed", "do_seed", is_flag=True, help="Isi data representatif dulu (hanya DB scratch).")
+@click.option("--rows", "large_rows", type=int, default=LARGE_ROWS_DEFAULT, show_default=True,
+              help="Estimasi baris minimal agar scan/filesort dianggap masalah.")
+def explain_command(do_seed, large_rows):
+    findings, checked = run(current_app._get_current_object(), do_seed=do_seed,
+                            large_rows=large_rows, echo=click.echo)
+    failed = [f for f in findings if not f["allowed"]]
+    for f in findings:
+        label = f"DITERIMA ({f['allowed']})" if f["allowed"] else "GAGAL"
+        click.echo(f"{label}: {f['key'][:200]}")
+        for problem in f["problems"]:
+            click.echo(f"    - {problem}")
+        click.echo(f"    dari: {', '.join(f['sources'][:3])}")
+    click.echo(f"{checked} statement dicek, {len(failed)} rencana query bermasalah.")
+    if failed:
+        sys.exit(1)
+
+
+def init_app(app):
+    # subperintah `flask db explain`
+    db_cli.add_command(explain_command)
@@ -0,0 +1,101 @@
+"""
+Menjalankan query-query independen dalam satu request secara paralel.
+
+    warung_list, makanan_rows = fan_out(
+        lambda: Warung.get_daftar(limit=20),
+        lambda: query("SELECT ... FROM Makanan ...", params),
+    )
+
+Setiap callable berjalan di thread pool (DB_FANOUT_WORKERS) dengan app context
+sendiri, jadi get_db_connection() di dalamnya meminjam koneksi pool sendiri, bukan
+unit of work request. Karena itu fan_out hanya paralel untuk request baca (GET);
+di request tulis, jika dimatikan (DB_FANOUT_WORKERS=0) atau hanya ada satu
+callable, semuanya dijalankan berurutan di thread pemanggil seperti biasa.
+
+Keputusan replica/primary (read-your-writes) ikut dari request pemanggil, dan
+statement yang dijalankan worker dicatat ulang ke statistik request pemanggil
+(Server-Timing, deteksi N+1, query_budget, capture_statements). Callable tidak
+boleh memakai request/session/url_for; bentuk URL setelah hasilnya kembali.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, g, has_app_context, has_request_context, request
+
+from .db import SAFE_METHODS, _primary_sticky, get_db_connection
+from .query_stats import record_statement, time_statements
+
+FANOUT_DEFAULTS = {
+    "DB_FANOUT_WORKERS": 4,  # 0 = selalu berurutan
+}
+
+_executor_lock = threading.Lock()
+
+
+def _executor(app):
+    executor = app.extensions.get("db_fanout")
+    if executor is None:
+        with _executor_lock:
+            executor = app.extensions.get("db_fanout")
+            if executor is None:
+                workers = int(app.config.get("DB_FANOUT_WORKERS", FANOUT_DEFAULTS["DB_FANOUT_WORKERS"]))
+                executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="db-fanout")
+                app.extensions["db_fanout"] = executor
+    return executor
+
+
+def _parallel_allowed(app, calls):
+    if len(calls) < 2 or int(app.config.get("DB_FANOUT_WORKERS", FANOUT_DEFAULTS["DB_FANOUT_WORKERS"])) <= 0:
+        return False
+    # request tulis: bacaan harus melihat perubahan di transaksi request sendiri
+    return not has_request_context() or request.method in SAFE_METHODS
+
+
+def _run(app, call, read_primary):
+    with app.app_context():
+        g._db_read_primary = read_primary
+        with time_statements() as timed:
+            try:
+                result = call()
+            except Exception as exc:
+                return False, exc, timed
+        return True, result, timed
+
+
+def fan_out(*calls):
+    """Jalankan callable tanpa argumen secara paralel; kembalikan hasilnya berurutan."""
+    if not has_app_context():
+        return [call() for call in calls]
+    app = current_app._get_current_object()
+    if not _parallel_allowed(app, calls):
+        return [call() for call in calls]
+
+    read_primary = _primary_sticky()
+    executor = _executor(app)
+    futures = [executor.submit(_run, app, call, read_primary) for call in calls]
+    outcomes = [f.result() for f in futures]
+
+    results = []
+    error = None
+    for ok, value, timed in outcomes:
+        for sql, duration, params in timed:
+            record_statement(sql, duration, params)
+        if ok:
+            results.append(value)
+        elif error is None:
+            error = value
+    if error is not None:
+        raise error
+    return results
+
+
+def query(sql, params=(), one=False, readonly=False):
+    """SELECT sederhana (baris dict) untuk dikirim ke fan_out dari route."""
+    conn = get_db_connection(readonly=readonly)
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute(sql, params)
+        return cur.fetchone() if one else cur.fetchall()
+    finally:
+        cur.close()
+        conn.close()
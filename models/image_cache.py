@@ -0,0 +1,153 @@
+"""
+Cache LRU in-process untuk gambar panas, dibatasi total byte per proses worker
+(IMAGE_LRU_BYTES, default 64 MB).
+
+Dua jenis entri, satu anggaran byte:
+
+- info  (jenis, id) -> (hash, mime): menggantikan lookup DB per hit. Dihapus saat
+  gambar diganti/dihapus (image_store.forget) di proses ini; proses worker lain
+  melihat perubahan paling lambat IMAGE_LRU_INFO_TTL detik kemudian. Gambar yang
+  tidak ada juga dicatat (None, None) selama IMAGE_LRU_MISS_TTL detik, jadi <img>
+  rusak yang terus di-retry tidak menembak DB.
+- isi   (jenis, id, hash, lebar, format) -> bytes: kunci memuat versi (hash), jadi tidak
+  pernah basi. Hanya dipakai saat Python sendiri yang mengirim file
+  (IMAGE_SENDFILE kosong) dan file <= IMAGE_LRU_ITEM_MAX.
+
+get_cache_stats() mengembalikan counter hits/misses/evictions per proses.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+LRU_DEFAULTS = {
+    "IMAGE_LRU_BYTES": 64 * 1024 * 1024,    # 0 = cache mati
+    "IMAGE_LRU_ITEM_MAX": 2 * 1024 * 1024,  # file lebih besar tidak di-cache
+    "IMAGE_LRU_INFO_TTL": 60,
+    "IMAGE_LRU_MISS_TTL": 30,               # cache negatif (gambar tidak ada)
+}
+
+# perkiraan memori satu entri info (tuple + string hash/mime)
+INFO_ENTRY_SIZE = 256
+
+
+class ByteLRU:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (value, size, expires)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[2] is not None and item[2] < time.monotonic():
+                self._remove(key)
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value, size, ttl=None):
+        if size > self.max_bytes:
+            return
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, size, expires)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                old_key = next(iter(self._data))
+                self._remove(old_key)
+                self.evictions += 1
+
+    def discard(self, match):
+        """Hapus semua entri yang kuncinya memenuhi match(key)."""
+        with self._lock:
+            for key in [k for k in self._data if match(k)]:
+                self._remove(key)
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def _config(app, key):
+    return app.config.get(key, LRU_DEFAULTS[key])
+
+
+def get_cache(app=None):
+    """ByteLRU milik app ini, atau None jika IMAGE_LRU_BYTES=0."""
+    app = app or current_app._get_current_object()
+    if "image_cache" not in app.extensions:
+        max_bytes = int(_config(app, "IMAGE_LRU_BYTES"))
+        app.extensions["image_cache"] = ByteLRU(max_bytes) if max_bytes > 0 else None
+    return app.extensions["image_cache"]
+
+
+def get_info(kind, key):
+    cache = get_cache()
+    return cache.get(("info", kind, key)) if cache else None
+
+
+def put_info(kind, key, digest, mime):
+    cache = get_cache()
+    if cache:
+        ttl = float(_config(current_app, "IMAGE_LRU_INFO_TTL"))
+        cache.put(("info", kind, key), (digest, mime), INFO_ENTRY_SIZE, ttl=ttl)
+
+
+def put_miss(kind, key):
+    """Catat bahwa (jenis, id) tidak punya gambar; dihapus invalidate() saat upload."""
+    cache = get_cache()
+    if cache:
+        cache.put(("info", kind, key), (None, None), INFO_ENTRY_SIZE, ttl=miss_ttl())
+
+
+def miss_ttl():
+    return float(_config(current_app, "IMAGE_LRU_MISS_TTL"))
+
+
+def get_bytes(kind, key, digest, width, fmt=None):
+    cache = get_cache()
+    return cache.get(("isi", kind, key, digest, width, fmt)) if cache else None
+
+
+def put_bytes(kind, key, digest, width, data, fmt=None):
+    cache = get_cache()
+    if cache and len(data) <= int(_config(current_app, "IMAGE_LRU_ITEM_MAX")):
+        cache.put(("isi", kind, key, digest, width, fmt), data, len(data))
+
+
+def item_max():
+    return int(_config(current_app, "IMAGE_LRU_ITEM_MAX"))
+
+
+def invalidate(kind, key):
+    """Buang info dan isi gambar (jenis, id) dari cache proses ini."""
+    cache = get_cache()
+    if cache:
+        cache.discard(lambda k: k[1] == kind and k[2] == key)
+
+
+def get_cache_stats(app=None):
+    """Counter cache gambar proses ini (kosong jika cache mati)."""
+    cache = get_cache(app)
+    return cache.stats() if cache else {}
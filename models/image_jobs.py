@@ -0,0 +1,497 @@
+"""
+Antrean pemrosesan gambar upload di process pool.
+
+Semua upload gambar (Makanan, Warung, foto profil Pengguna) lewat pipeline yang
+sama: store_upload() memvalidasi file (MIME dari isinya, anggaran piksel
+IMAGE_MAX_PIXELS) lalu menyimpannya, dengan opsi resize/encode per jenis di
+UPLOAD_OPTIONS. Upload diterima sebagai file object (FileStorage.stream, yang
+di-spool ke disk oleh werkzeug) dan disalin per potongan, tidak dibaca utuh.
+Placeholder LQIP (image_store.placeholder) ikut dihitung di langkah ini, jadi
+sudah ada sejak baris pertama kali disimpan.
+
+Upload menyimpan file asli ke image_store seketika (image_store.put_pending) dan
+kolom HashGambar* langsung menunjuknya, jadi gambar sudah tampil dan request
+selesai tanpa menunggu encoder. Resize LANCZOS + encode (WEBP method=6) dan
+pembuatan varian ukuran berjalan di ProcessPoolExecutor (IMAGE_WORKERS proses).
+Setelah selesai, HashGambar* diganti ke hasil optimasi, tapi hanya jika kolom itu
+masih menunjuk file asli, jadi upload yang lebih baru tidak ikut tertimpa.
+
+Status job ada di tabel AntreanGambar (antri -> selesai / usang / gagal) dan bisa
+di-poll lewat job_status() / GET /warung/gambar/job/<id> (hanya oleh pemilik baris,
+job_owner()). Job dari upload dicatat di session (remember_job); halaman berikutnya
+meng-include templates/gambarJob.html yang mem-poll job itu dan mengganti versi
+gambar (?v=) di halaman begitu hasil optimasi siap.
+
+IMAGE_WORKERS=0, atau di luar app context (CLI), memproses gambar inline seperti
+sebelumnya.
+
+    flask --app app images optimize           # proses ulang gambar lama yang belum optimal
+    flask --app app images optimize --force   # semua gambar (setelah opsi encode diubah)
+
+optimize berjalan per batch id dan mencatat id terakhir tiap jenis di
+<IMAGE_STORE_DIR>/optimize-checkpoint.json; jika terhenti, jalankan ulang dan ia
+melanjutkan dari sana (--restart untuk mulai dari awal).
+"""
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import click
+from flask import current_app, has_app_context, has_request_context, session
+from PIL import Image
+
+from .db import get_db_connection
+from .image_store import (
+    SOURCES, ImageStore, _ensure_file, alt_formats, forget, get_store, images_cli, make_variants, placeholder,
+    probe, process_image_bytes, put, put_pending, variant_widths,
+)
+
+JOB_DEFAULTS = {
+    "IMAGE_WORKERS": 2,  # 0 = proses inline di request
+}
+
+# IdPengguna pemilik baris yang gambarnya diproses, per jenis
+_OWNER_SQL = {
+    "makanan": "SELECT w.IdPenjual FROM Makanan m JOIN Warung w ON w.IdWarung = m.IdWarung WHERE m.IdMakanan=%s",
+    "warung": "SELECT IdPenjual FROM Warung WHERE IdWarung=%s",
+    "pengguna": "SELECT IdPengguna FROM Pengguna WHERE IdPengguna=%s",
+}
+
+JOB_SESSION_KEY = "gambar_jobs"
+JOB_SESSION_MAX = 5
+
+# resize (sisi terpanjang) + format hasil per jenis gambar
+UPLOAD_OPTIONS = {
+    "makanan": dict(max_w=800, max_h=800, quality=80, fmt="WEBP"),
+    "warung": dict(max_w=1200, max_h=1200, quality=80, fmt="WEBP"),
+    "pengguna": dict(max_w=400, max_h=400, quality=80, fmt="WEBP"),
+}
+
+# kolom ukuran file per jenis gambar (Pengguna tidak punya)
+SIZE_COLUMNS = {
+    "makanan": "SizeGambarMakanan",
+    "warung": "SizeGambarWarung",
+}
+
+_executor_lock = threading.Lock()
+
+# hash gambar lama yang variannya sedang dibuat (submit_variants), per proses
+_variants_lock = threading.Lock()
+_variants_in_flight = set()
+
+
+def _workers(app):
+    return int(app.config.get("IMAGE_WORKERS", JOB_DEFAULTS["IMAGE_WORKERS"]))
+
+
+def enabled():
+    """True jika upload boleh diproses di background (ada app dan IMAGE_WORKERS > 0)."""
+    return has_app_context() and _workers(current_app) > 0
+
+
+def _process_pool(app, workers=None):
+    # spawn, bukan fork: proses web punya thread (pool koneksi, fan_out) yang
+    # tidak aman di-fork
+    return ProcessPoolExecutor(
+        max_workers=workers or _workers(app), mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def _executors(app):
+    executors = app.extensions.get("image_jobs")
+    if executors is None:
+        with _executor_lock:
+            executors = app.extensions.get("image_jobs")
+            if executors is None:
+                pool = _process_pool(app)
+                # menulis hasil ke DB di thread sendiri, bukan di thread pengelola pool
+                finisher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-jobs")
+                executors = app.extensions["image_jobs"] = (pool, finisher)
+    return executors
+
+
+def store_upload(upload, max_w=800, max_h=800, quality=80, fmt="WEBP"):
+    """
+    Langkah upload yang sama untuk semua jenis gambar. `upload` bytes atau file
+    object. MIME diambil dari isi file (bukan dari browser); ValueError jika bukan
+    gambar atau resolusinya melebihi IMAGE_MAX_PIXELS (dicek dari header, sebelum
+    decode).
+
+    Kembalikan (hash, mime, size, lebar, tinggi, lqip, olah); file sudah ada di
+    image_store, lqip = data URI placeholder (None jika gagal dibuat).
+    Dengan worker, file asli disimpan apa adanya dan `olah` berisi opsi untuk
+    submit() setelah baris tersimpan. Tanpa worker, gambar langsung di-resize dan
+    di-encode di sini dan `olah` None.
+    """
+    mime, width, height = probe(upload)
+    lqip = placeholder(upload)
+    if enabled():
+        digest, size = put_pending(upload)
+        return digest, mime, size, width, height, lqip, dict(max_w=max_w, max_h=max_h, quality=quality, fmt=fmt)
+    out, mime, size, width, height = process_image_bytes(
+        upload, max_width=max_w, max_height=max_h, quality=quality, target_format=fmt
+    )
+    return put(out), mime, size, width, height, lqip, None
+
+
+def encode_job(root, digest, widths, variant_quality, max_w=800, max_h=800, quality=80, fmt="WEBP", formats=()):
+    """
+    Dijalankan di proses worker (tanpa Flask/DB): resize + encode file asli, buat
+    semua varian (plus encoding alternatif `formats`), lalu kembalikan (hash, mime,
+    size) hasilnya.
+    """
+    store = ImageStore(root)
+    try:
+        data = store.read(digest)
+        out, mime, size, _, _ = process_image_bytes(
+            data, max_width=max_w, max_height=max_h, quality=quality, target_format=fmt
+        )
+        new_digest = store.put(out)
+        store.make_variants(new_digest, widths, variant_quality, data=out, formats=formats)
+        return new_digest, mime, size
+    finally:
+        store.clear_pending(digest)
+
+
+def variants_job(root, digest, widths, variant_quality, formats=()):
+    """Dijalankan di proses worker: buat varian ukuran / encoding yang belum ada."""
+    ImageStore(root).make_variants(digest, widths, variant_quality, formats=formats)
+
+
+def submit_variants(digest):
+    """
+    Antrekan pembuatan varian untuk gambar lama yang belum punya (tanpa baris
+    AntreanGambar: hash dan kolom tabel tidak berubah). True jika varian sedang
+    dibuat di background, pemanggil mengirim file asli dulu. Tanpa worker varian
+    dibuat langsung dan mengembalikan False.
+    """
+    if not enabled():
+        make_variants(digest)
+        return False
+    app = current_app._get_current_object()
+    with _variants_lock:
+        if digest in _variants_in_flight:
+            return True
+        _variants_in_flight.add(digest)
+
+    def done(future):
+        with _variants_lock:
+            _variants_in_flight.discard(digest)
+        if future.exception() is not None:
+            app.logger.warning("Varian gambar %s gagal: %s", digest, future.exception())
+
+    pool, _ = _executors(app)
+    try:
+        future = pool.submit(
+            variants_job, get_store(app).root, digest, variant_widths(),
+            int(app.config.get("IMAGE_VARIANT_QUALITY", 80)), formats=alt_formats(),
+        )
+    except Exception:
+        with _variants_lock:
+            _variants_in_flight.discard(digest)
+        raise
+    future.add_done_callback(done)
+    return True
+
+
+def _run_inline(kind, key, digest, options):
+    app = current_app
+    result = encode_job(
+        get_store().root, digest, variant_widths(),
+        int(app.config.get("IMAGE_VARIANT_QUALITY", 80)), formats=alt_formats(), **options
+    )
+    _apply(kind, key, digest, result)
+    return None
+
+
+def submit(kind, key, digest, **options):
+    """
+    Antrekan optimasi gambar `digest` milik baris (kind, key); kembalikan IdJob.
+    Tanpa worker, diproses langsung dan mengembalikan None.
+    """
+    if not enabled():
+        return _run_inline(kind, key, digest, options)
+    app = current_app._get_current_object()
+
+    # baris job di-commit sendiri supaya langsung terlihat oleh polling
+    conn = get_db_connection(autonomous=True)
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "INSERT INTO AntreanGambar (Jenis, IdObjek, HashAsli, Status) VALUES (%s, %s, %s, 'antri')",
+            (kind, key, digest),
+        )
+        conn.commit()
+        job_id = cur.lastrowid
+    finally:
+        cur.close()
+        conn.close()
+
+    pool, finisher = _executors(app)
+    future = pool.submit(
+        encode_job, get_store(app).root, digest, variant_widths(),
+        int(app.config.get("IMAGE_VARIANT_QUALITY", 80)), formats=alt_formats(), **options
+    )
+    future.add_done_callback(
+        lambda f: finisher.submit(_finish, app, job_id, kind, key, digest, f)
+    )
+    return job_id
+
+
+def _apply(kind, key, old_digest, result, cur=None):
+    """Ganti HashGambar* ke hasil job jika masih menunjuk file asli; kembalikan status job."""
+    new_digest, mime, size = result
+    if new_digest == old_digest:
+        return "selesai"
+    table, id_col, _, mime_col, hash_col = SOURCES[kind]
+    sets, params = [f"{hash_col}=%s", f"{mime_col}=%s"], [new_digest, mime]
+    if kind in SIZE_COLUMNS:
+        sets.append(f"{SIZE_COLUMNS[kind]}=%s")
+        params.append(size)
+    sql = f"UPDATE {table} SET {', '.join(sets)} WHERE {id_col}=%s AND {hash_col}=%s"
+    params += [key, old_digest]
+
+    if cur is not None:
+        cur.execute(sql, tuple(params))
+        swapped = cur.rowcount
+    else:
+        # dipanggil setelah commit request (submit tanpa worker): koneksi sendiri
+        conn = get_db_connection(autonomous=True)
+        cur = conn.cursor()
+        try:
+            cur.execute(sql, tuple(params))
+            conn.commit()
+            swapped = cur.rowcount
+        finally:
+            cur.close()
+            conn.close()
+    if not swapped:
+        return "usang"
+    forget(kind, key)
+    return "selesai"
+
+
+def _finish(app, job_id, kind, key, digest, future):
+    with app.app_context():
+        conn = get_db_connection(autonomous=True)
+        cur = conn.cursor()
+        try:
+            try:
+                result = future.result()
+            except Exception as exc:
+                app.logger.warning("Job gambar %s gagal: %s", job_id, exc)
+                status, new_digest, pesan = "gagal", None, str(exc)[:255]
+            else:
+                status = _apply(kind, key, digest, result, cur=cur)
+                new_digest, pesan = result[0], None
+            cur.execute(
+                "UPDATE AntreanGambar SET Status=%s, HashHasil=%s, Pesan=%s, SelesaiPada=CURRENT_TIMESTAMP "
+                "WHERE IdJob=%s",
+                (status, new_digest, pesan, job_id),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            app.logger.exception("Gagal menyimpan hasil job gambar %s", job_id)
+        finally:
+            cur.close()
+            conn.close()
+
+
+def job_status(job_id):
+    """Dict status job (IdJob, Jenis, IdObjek, Status, HashHasil, Pesan) atau None."""
+    conn = get_db_connection()
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute(
+            "SELECT IdJob, Jenis, IdObjek, Status, HashAsli, HashHasil, Pesan, DibuatPada, SelesaiPada "
+            "FROM AntreanGambar WHERE IdJob=%s",
+            (job_id,),
+        )
+        return cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def job_owner(job):
+    """IdPengguna pemilik baris yang gambarnya diproses job ini, atau None."""
+    sql = _OWNER_SQL.get(job["Jenis"])
+    if sql is None:
+        return None
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, (job["IdObjek"],))
+        row = cur.fetchone()
+        return row[0] if row else None
+    finally:
+        cur.close()
+        conn.close()
+
+
+def remember_job(job_id):
+    """Catat job upload di session supaya halaman berikutnya mem-poll statusnya."""
+    if job_id and has_request_context():
+        jobs = session.get(JOB_SESSION_KEY, [])
+        session[JOB_SESSION_KEY] = (jobs + [int(job_id)])[-JOB_SESSION_MAX:]
+
+
+def take_jobs():
+    """Job yang dicatat remember_job(), sekali ambil (dipakai templates/gambarJob.html)."""
+    if not has_request_context():
+        return []
+    return session.pop(JOB_SESSION_KEY, [])
+
+
+# -------------------------
+# Backfill gambar lama
+# -------------------------
+def _needs_optimize(path, options):
+    """Gambar lebih besar dari batas atau belum berformat hasil pipeline?"""
+    try:
+        with Image.open(path) as img:
+            return img.format != options["fmt"] or max(img.size) > max(options["max_w"], options["max_h"])
+    except Exception:
+        # bukan gambar yang dikenali PIL: tidak bisa diproses
+        return False
+
+
+CHECKPOINT_FILE = "optimize-checkpoint.json"
+
+
+def _load_checkpoint(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_checkpoint(path, checkpoint):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump(checkpoint, fh)
+    os.replace(tmp, path)
+
+
+def optimize_existing(kinds=None, batch=100, workers=None, force=False, restart=False, pause=0.0, echo=print):
+    """
+    Proses ulang gambar yang sudah tersimpan per batch keyset (urut id), encode di
+    process pool sendiri, dan tulis hasil satu batch dalam satu transaksi.
+
+    Tanpa force hanya gambar yang formatnya lain atau lebih besar dari UPLOAD_OPTIONS
+    yang diproses; dengan force semua gambar di-encode ulang, tapi hasil hanya dipakai
+    jika lebih kecil. Id terakhir tiap jenis dicatat di checkpoint setelah batchnya
+    di-commit, jadi run yang terputus dilanjutkan dari situ (restart=True mengabaikan
+    checkpoint). pause = jeda (detik) antar batch agar DB dan disk tidak dibanjiri.
+
+    Kembalikan {jenis: (jumlah dioptimasi, byte dihemat)}.
+    """
+    app = current_app._get_current_object()
+    root = get_store(app).root
+    widths = variant_widths()
+    variant_quality = int(app.config.get("IMAGE_VARIANT_QUALITY", 80))
+    formats = alt_formats()
+    checkpoint_path = os.path.join(root, CHECKPOINT_FILE)
+    checkpoint = {} if restart else _load_checkpoint(checkpoint_path)
+    totals = {}
+    with _process_pool(app, workers or max(1, _workers(app))) as pool:
+        for kind in kinds or SOURCES:
+            table, id_col, _, _, hash_col = SOURCES[kind]
+            options = UPLOAD_OPTIONS[kind]
+            done = skipped = saved = 0
+            last_id = int(checkpoint.get(kind, 0))
+            if last_id:
+                echo(f"{table}: lanjut dari {id_col} > {last_id}")
+            while True:
+                conn = get_db_connection()
+                cur = conn.cursor()
+                try:
+                    cur.execute(
+                        f"SELECT {id_col}, {hash_col} FROM {table} "
+                        f"WHERE {hash_col} IS NOT NULL AND {id_col} > %s ORDER BY {id_col} LIMIT %s",
+                        (last_id, batch),
+                    )
+                    rows = cur.fetchall()
+                finally:
+                    cur.close()
+                    conn.close()
+                if not rows:
+                    break
+
+                jobs = []
+                for key, digest in rows:
+                    path = _ensure_file(kind, key, digest)
+                    needed = path is not None and _needs_optimize(path, options)
+                    if path is None or not (needed or force):
+                        skipped += 1
+                        continue
+                    future = pool.submit(encode_job, root, digest, widths, variant_quality, formats=formats, **options)
+                    jobs.append((key, digest, needed, os.path.getsize(path), future))
+
+                conn = get_db_connection(autonomous=True)
+                cur = conn.cursor()
+                try:
+                    for key, digest, needed, old_size, future in jobs:
+                        try:
+                            result = future.result()
+                        except Exception as exc:
+                            echo(f"{table} {key}: gagal ({exc})")
+                            continue
+                        if not needed and result[2] >= old_size:
+                            # encode ulang tidak lebih kecil: pertahankan file lama
+                            skipped += 1
+                            continue
+                        if _apply(kind, key, digest, result, cur=cur) == "selesai":
+                            done += 1
+                            saved += old_size - result[2]
+                    conn.commit()
+                finally:
+                    cur.close()
+                    conn.close()
+
+                last_id = rows[-1][0]
+                checkpoint[kind] = last_id
+                _save_checkpoint(checkpoint_path, checkpoint)
+                echo(
+                    f"{table} s/d {id_col} {last_id}: {done} dioptimasi, {skipped} dilewati, "
+                    f"hemat {saved / 1e6:.1f} MB"
+                )
+                if pause:
+                    time.sleep(pause)
+            totals[kind] = (done, saved)
+    # semua jenis yang diminta tuntas: run berikutnya mulai dari awal lagi
+    for kind in totals:
+        checkpoint.pop(kind, None)
+    if checkpoint:
+        _save_checkpoint(checkpoint_path, checkpoint)
+    elif os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return totals
+
+
+@click.command("optimize")
+@click.option("--kind", "kinds", multiple=True, type=click.Choice(sorted(SOURCES)), help="Hanya jenis ini.")
+@click.option("--batch", type=int, default=100, show_default=True)
+@click.option("--workers", type=int, default=None, help="Jumlah proses (default IMAGE_WORKERS).")
+@click.option("--force", is_flag=True, help="Encode ulang semua gambar, bukan hanya yang belum optimal.")
+@click.option("--restart", is_flag=True, help="Abaikan checkpoint, mulai dari id terkecil.")
+@click.option("--pause", type=float, default=0.0, show_default=True, help="Jeda antar batch (detik).")
+def optimize_command(kinds, batch, workers, force, restart, pause):
+    """Resize + encode ulang gambar lama lewat pipeline upload."""
+    totals = optimize_existing(
+        kinds=kinds or None, batch=batch, workers=workers, force=force, restart=restart,
+        pause=pause, echo=click.echo,
+    )
+    done = sum(n for n, _ in totals.values())
+    saved = sum(b for _, b in totals.values())
+    click.echo(f"Selesai: {done} gambar dioptimasi, hemat {saved / 1e6:.1f} MB")
+
+
+def init_app(app):
+    app.context_processor(lambda: {"gambar_jobs": take_jobs})
+    images_cli.add_command(optimize_command)
@@ -0,0 +1,783 @@
+"""
+Penyimpanan gambar content-addressed di disk lokal.
+
+Isi gambar disimpan sekali per sha256 di IMAGE_STORE_DIR/ab/cd/abcd...; kolom
+HashGambar* di tabel menunjuk ke file itu, BLOB Gambar* tidak dipakai lagi.
+Gambar yang sama (mis. foto menu yang diunggah ulang) hanya ada satu file.
+
+Route gambar memakai send_image(): satu query kecil (hash + mime, tanpa BLOB). Hash
+itu juga ETag kuat; If-None-Match yang cocok langsung dijawab 304 kosong tanpa
+menyentuh file. URL gambar memuat ?v=<hash> (image_url); permintaan yang v-nya
+sama dengan hash saat ini dijawab `immutable` setahun, karena isi di URL itu tidak
+akan pernah berubah. Parameter ?w=<lebar> memilih varian terkecil dari
+IMAGE_VARIANT_WIDTHS yang masih cukup (ab/cd/<hash>.w160 di sebelah aslinya); varian
+dibuat saat upload. Untuk gambar lama varian diantrekan ke image_jobs saat pertama
+diminta dan file asli dikirim (no-cache) sampai variannya siap. Hash+mime dan isi
+file kecil yang sering diminta disimpan di LRU per proses (image_cache), jadi hit
+panas tidak menyentuh MySQL maupun disk. Selain itu file dikirim lewat send_file (wsgi.file_wrapper / sendfile) atau diserahkan ke web
+server dengan IMAGE_SENDFILE = "x-sendfile" (Apache/lighttpd) atau
+"x-accel-redirect" (nginx, location internal IMAGE_ACCEL_PREFIX -> IMAGE_STORE_DIR).
+Baris yang BLOB-nya belum dipindah tetap terlayani: file ditulis saat pertama diminta.
+
+Gambar yang tidak ada dicache negatif sebentar (image_cache.put_miss); route
+mengalihkannya ke placeholder statis (placeholder_redirect) yang URL-nya ber-versi
+dan di-cache `immutable`, jadi <img> rusak tidak terus meminta ulang.
+
+Selain format hasil pipeline (WEBP), asli dan tiap varian juga disimpan dalam
+IMAGE_ALT_FORMATS (default AVIF + JPEG; <hash>.w400.avif). send_image() memilih
+encoding dari header Accept (AVIF > WEBP > JPEG), mengirim `Vary: Accept` dan
+menghitung format yang terkirim per proses (get_format_stats()). AVIF butuh
+Pillow dengan libavif (>= 11.3) atau plugin pillow-avif-plugin; tanpa itu AVIF
+dilewati.
+
+    flask --app app images migrate              # pindahkan BLOB lama ke disk
+    flask --app app images migrate --keep-blob  # salin saja, BLOB tetap
+    flask --app app images lqip                 # isi placeholder gambar lama
+
+Placeholder LQIP (placeholder()) dihitung saat upload: WEBP 16 px sebagai data URI
+(~100-300 byte) di kolom Lqip*, ikut terbaca finder ringkas dan dipasang template
+sebagai background <img>, jadi kartu sudah berwarna sebelum thumbnail datang.
+"""
+import base64
+import hashlib
+import os
+import tempfile
+import threading
+from collections import Counter
+from functools import lru_cache
+from io import BytesIO
+
+import click
+from flask import Response, current_app, redirect, request, send_file, url_for
+from flask.cli import AppGroup
+from PIL import Image
+
+from . import image_cache
+from .db import get_db_connection
+
+try:
+    import pillow_avif  # noqa: F401  (encoder AVIF untuk Pillow tanpa libavif)
+except ImportError:
+    pass
+
+IMAGE_DEFAULTS = {
+    "IMAGE_STORE_DIR": None,          # None -> <instance_path>/images
+    "IMAGE_SENDFILE": "",             # "", "x-sendfile" atau "x-accel-redirect"
+    "IMAGE_ACCEL_PREFIX": "/_gambar/",
+    "IMAGE_CACHE_MAX_AGE": 86400,
+    "IMAGE_IMMUTABLE_MAX_AGE": 31536000,  # untuk URL ber-versi hash (?v=)
+    "IMAGE_VARIANT_WIDTHS": (160, 400, 800),  # sisi terpanjang tiap varian (?w=)
+    "IMAGE_VARIANT_QUALITY": 80,
+    "IMAGE_MAX_PIXELS": 40_000_000,  # lebar x tinggi maksimum upload (anti decompression bomb)
+    "IMAGE_ALT_FORMATS": ("AVIF", "JPEG"),  # encoding tambahan per varian, dipilih dari Accept
+}
+
+# format yang di-resize ulang; format lain (GIF dsb.) variannya = file asli
+VARIANT_FORMATS = {"WEBP", "JPEG", "PNG"}
+
+FORMAT_MIME = {"AVIF": "image/avif", "WEBP": "image/webp", "JPEG": "image/jpeg", "PNG": "image/png"}
+FORMAT_EXT = {"AVIF": "avif", "WEBP": "webp", "JPEG": "jpg", "PNG": "png"}
+MIME_FORMAT = {mime: fmt for fmt, mime in FORMAT_MIME.items()}
+# bisa ditampilkan semua klien tanpa perlu disebut di Accept
+UNIVERSAL_FORMATS = {"JPEG", "PNG"}
+
+# jenis gambar -> (tabel, kolom id, kolom BLOB, kolom mime, kolom hash)
+SOURCES = {
+    "makanan": ("Makanan", "IdMakanan", "GambarMakanan", "MimeGambarMakanan", "HashGambarMakanan"),
+    "warung": ("Warung", "IdWarung", "GambarWarung", "MimeGambarWarung", "HashGambarWarung"),
+    "pengguna": ("Pengguna", "IdPengguna", "GambarPengguna", "MimeGambarPengguna", "HashGambarPengguna"),
+}
+
+# kolom placeholder per jenis gambar (foto profil tidak tampil di halaman daftar)
+LQIP_COLUMNS = {
+    "makanan": "LqipMakanan",
+    "warung": "LqipWarung",
+}
+LQIP_SIZE = 16      # sisi terpanjang placeholder (px)
+LQIP_MAX_LEN = 400  # panjang kolom Lqip*
+
+
+def _config(key):
+    return current_app.config.get(key, IMAGE_DEFAULTS[key])
+
+
+def digest_of(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _as_file(source):
+    """bytes -> BytesIO; file object (mis. upload yang di-spool ke disk) dipakai dari awal."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return BytesIO(source)
+    source.seek(0)
+    return source
+
+
+def process_image_bytes(input_bytes, max_width=800, max_height=800, quality=80, target_format="WEBP"):
+    """
+    Resize (maintain aspect ratio) if larger than max, then encode to target_format.
+    input_bytes boleh bytes atau file object.
+    Returns (out_bytes, mime_type, out_size, width, height).
+    """
+    img = Image.open(_as_file(input_bytes))
+    if img.format == "JPEG":
+        # JPEG di-decode langsung pada skala 1/2..1/8 yang masih >= target: foto
+        # 40 MP tidak pernah ada utuh di memori sebelum resize
+        img.draft("RGB", (max_width, max_height))
+    img = img.convert("RGBA") if img.mode in ("LA", "RGBA", "P") else img.convert("RGB")
+
+    orig_w, orig_h = img.size
+    ratio = min(max_width / orig_w, max_height / orig_h, 1.0)
+    if ratio < 1.0:
+        new_w = int(orig_w * ratio)
+        new_h = int(orig_h * ratio)
+        img = img.resize((new_w, new_h), Image.LANCZOS)
+    else:
+        new_w, new_h = orig_w, orig_h
+
+    out = BytesIO()
+    fmt = target_format.upper()
+    save_kwargs = {}
+    if fmt in ("JPEG", "JPG"):
+        save_kwargs["quality"] = quality
+        save_kwargs["optimize"] = True
+    elif fmt == "WEBP":
+        save_kwargs["quality"] = quality
+        save_kwargs["method"] = 6
+    elif fmt == "AVIF":
+        save_kwargs["quality"] = quality
+
+    if fmt in ("JPEG", "JPG") and img.mode == "RGBA":
+        background = Image.new("RGB", img.size, (255,255,255))
+        background.paste(img, mask=img.split()[3])
+        img = background
+
+    img.save(out, format=fmt, **save_kwargs)
+    out_bytes = out.getvalue()
+    mime = "image/webp" if fmt == "WEBP" else f"image/{fmt.lower()}"
+    return out_bytes, mime, len(out_bytes), new_w, new_h
+
+
+def placeholder(source):
+    """
+    Data URI WEBP mini (LQIP_SIZE px) dari gambar `source` (bytes atau file object);
+    None jika gagal atau hasilnya tidak muat di kolom Lqip*.
+    """
+    try:
+        with Image.open(_as_file(source)) as img:
+            # thumbnail() memakai draft() untuk JPEG: tidak pernah decode resolusi penuh
+            img.thumbnail((LQIP_SIZE, LQIP_SIZE))
+            img = img.convert("RGBA") if img.mode in ("LA", "RGBA", "P") else img.convert("RGB")
+            for quality in (40, 20):
+                out = BytesIO()
+                img.save(out, format="WEBP", quality=quality, method=6)
+                uri = "data:image/webp;base64," + base64.b64encode(out.getvalue()).decode("ascii")
+                if len(uri) <= LQIP_MAX_LEN:
+                    return uri
+    except Exception:
+        return None
+    return None
+
+
+def variant_widths():
+    return tuple(sorted(int(w) for w in _config("IMAGE_VARIANT_WIDTHS")))
+
+
+def can_encode(fmt):
+    Image.init()
+    return fmt in Image.SAVE
+
+
+def alt_formats():
+    """IMAGE_ALT_FORMATS yang encodernya tersedia di Pillow ini."""
+    return tuple(fmt for fmt in _config("IMAGE_ALT_FORMATS") if can_encode(fmt))
+
+
+def pick_width(requested):
+    """Varian terkecil yang lebarnya >= requested; None = pakai file asli."""
+    if not requested or requested <= 0:
+        return None
+    for width in variant_widths():
+        if width >= requested:
+            return width
+    return None
+
+
+class ImageStore:
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def relpath(self, digest):
+        return os.path.join(digest[:2], digest[2:4], digest)
+
+    def path(self, digest, width=None, fmt=None):
+        path = os.path.join(self.root, self.relpath(digest))
+        if width:
+            path = f"{path}.w{width}"
+        return f"{path}.{FORMAT_EXT[fmt]}" if fmt else path
+
+    def exists(self, digest, width=None, fmt=None):
+        return bool(digest) and os.path.exists(self.path(digest, width, fmt))
+
+    def put_stream(self, stream, chunk_size=1024 * 1024):
+        """Seperti put(), tapi menyalin file object per potongan; kembalikan (sha256, size)."""
+        hasher = hashlib.sha256()
+        size = 0
+        os.makedirs(self.root, exist_ok=True)
+        # file sementara di root (filesystem yang sama) supaya rename tetap atomik
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                for chunk in iter(lambda: stream.read(chunk_size), b""):
+                    hasher.update(chunk)
+                    fh.write(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            target = self.path(digest)
+            if os.path.exists(target):
+                os.unlink(tmp)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(tmp, target)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        return digest, size
+
+    def put(self, data):
+        """Simpan bytes; kembalikan sha256-nya. File yang sudah ada tidak ditulis ulang."""
+        digest = digest_of(data)
+        target = self.path(digest)
+        if not os.path.exists(target):
+            self._write(target, data)
+        return digest
+
+    def put_variant(self, digest, width, data=None, fmt=None):
+        """Simpan varian `width` (format alternatif `fmt`) dari gambar `digest`; data None = sama dengan aslinya."""
+        target = self.path(digest, width, fmt)
+        if data is None:
+            # gambar sudah lebih kecil dari varian: hard link, tanpa salinan kedua
+            try:
+                os.link(self.path(digest), target)
+                return
+            except FileExistsError:
+                return
+            except OSError:
+                data = self.read(digest)
+        self._write(target, data)
+
+    def _write(self, target, data):
+        folder = os.path.dirname(target)
+        os.makedirs(folder, exist_ok=True)
+        # tulis ke file sementara di folder yang sama lalu rename: pembaca tidak
+        # pernah melihat file setengah jadi
+        fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, target)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def read(self, digest, width=None, fmt=None):
+        with open(self.path(digest, width, fmt), "rb") as fh:
+            return fh.read()
+
+    def make_variants(self, digest, widths, quality, data=None, replace=False, formats=()):
+        """
+        Buat varian untuk gambar `digest` (yang sudah ada dilewati kecuali replace),
+        plus encoding `formats` (mis. AVIF, JPEG) untuk aslinya dan tiap varian.
+        """
+        missing = [w for w in widths if replace or not self.exists(digest, w)]
+        alt_missing = [
+            (w, alt) for w in (None, *widths) for alt in formats
+            if replace or not self.exists(digest, w, alt)
+        ]
+        if not missing and not alt_missing:
+            return
+        if data is None:
+            data = self.read(digest)
+        try:
+            with Image.open(BytesIO(data)) as img:
+                fmt, longest = img.format, max(img.size)
+        except Exception:
+            # bukan gambar yang dikenali PIL: semua varian menunjuk file asli
+            fmt, longest = None, 0
+        for width in missing:
+            if fmt not in VARIANT_FORMATS or longest <= width:
+                self.put_variant(digest, width)
+                continue
+            out, _, _, _, _ = process_image_bytes(data, width, width, quality=quality, target_format=fmt)
+            self.put_variant(digest, width, out)
+        for width, alt in alt_missing:
+            if fmt not in VARIANT_FORMATS or alt == fmt:
+                continue
+            source = data if width is None else self.read(digest, width)
+            size = width or longest
+            out, _, _, _, _ = process_image_bytes(source, size, size, quality=quality, target_format=alt)
+            self.put_variant(digest, width, out, fmt=alt)
+
+    # penanda "masih diproses image_jobs": varian belum ada, jangan dibuat inline
+    def mark_pending(self, digest):
+        open(self.path(digest) + ".antri", "a").close()
+
+    def is_pending(self, digest):
+        return os.path.exists(self.path(digest) + ".antri")
+
+    def clear_pending(self, digest):
+        try:
+            os.unlink(self.path(digest) + ".antri")
+        except FileNotFoundError:
+            pass
+
+
+def get_store(app=None):
+    app = app or current_app._get_current_object()
+    store = app.extensions.get("image_store")
+    if store is None:
+        root = app.config.get("IMAGE_STORE_DIR") or os.path.join(app.instance_path, "images")
+        store = ImageStore(root)
+        app.extensions["image_store"] = store
+    return store
+
+
+def put(data):
+    """
+    Simpan isi gambar (beserta semua varian ukuran) ke store aplikasi aktif;
+    kembalikan hash untuk kolom HashGambar*.
+    """
+    digest = get_store().put(data)
+    make_variants(digest, data)
+    return digest
+
+
+def put_pending(source):
+    """
+    Simpan file asli saja (tanpa varian, disalin per potongan) dan tandai sedang
+    diproses; image_jobs yang membuat versi optimal + variannya lalu menghapus
+    penandanya. Kembalikan (hash, size).
+    """
+    store = get_store()
+    digest, size = store.put_stream(_as_file(source))
+    store.mark_pending(digest)
+    return digest, size
+
+
+def make_variants(digest, data=None, widths=None):
+    """Buat varian yang belum ada untuk gambar `digest`."""
+    get_store().make_variants(
+        digest, widths or variant_widths(), int(_config("IMAGE_VARIANT_QUALITY")), data=data,
+        formats=alt_formats(),
+    )
+
+
+def probe(source, max_pixels=None):
+    """
+    (mime, lebar, tinggi) dari header gambar tanpa decode; ValueError jika bukan
+    gambar atau lebar x tinggi melebihi max_pixels (default IMAGE_MAX_PIXELS).
+    """
+    if max_pixels is None:
+        max_pixels = int(_config("IMAGE_MAX_PIXELS"))
+    try:
+        with Image.open(_as_file(source)) as img:
+            fmt, (width, height) = img.format, img.size
+    except Image.DecompressionBombError as exc:
+        raise ValueError("Resolusi gambar terlalu besar") from exc
+    except Exception as exc:
+        raise ValueError("File bukan gambar yang valid") from exc
+    if max_pixels and width * height > max_pixels:
+        raise ValueError("Resolusi gambar terlalu besar")
+    return Image.MIME.get(fmt, "application/octet-stream"), width, height
+
+
+# -------------------------
+# Baca
+# -------------------------
+def image_info(kind, key):
+    """(hash, mime) gambar tanpa BLOB; (None, None) jika tidak ada."""
+    cached = image_cache.get_info(kind, key)
+    if cached is not None:
+        return cached
+    table, id_col, _, mime_col, hash_col = SOURCES[kind]
+    # primary, bukan replica: hasilnya (juga miss) di-cache per proses, jadi hash
+    # lama dari replica yang tertinggal akan terus dikirim sampai entri kedaluwarsa
+    conn = get_db_connection()
+    cur = conn.cursor(prepared=True)
+    try:
+        cur.execute(f"SELECT {hash_col}, {mime_col} FROM {table} WHERE {id_col}=%s", (key,))
+        row = cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
+    if not row or not row[0]:
+        image_cache.put_miss(kind, key)
+        return None, None
+    image_cache.put_info(kind, key, row[0], row[1])
+    return row[0], row[1]
+
+
+def forget(kind, key):
+    """Panggil setelah gambar (jenis, id) diganti atau dihapus: buang dari cache proses ini."""
+    image_cache.invalidate(kind, key)
+
+
+def _legacy_blob(kind, key):
+    table, id_col, blob_col, _, _ = SOURCES[kind]
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT {blob_col} FROM {table} WHERE {id_col}=%s", (key,))
+        row = cur.fetchone()
+        return row[0] if row else None
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _ensure_file(kind, key, digest):
+    """Path file untuk `digest`; BLOB lama yang belum dipindah ditulis ke store dulu."""
+    store = get_store()
+    if store.exists(digest):
+        return store.path(digest)
+    data = _legacy_blob(kind, key)
+    if not data:
+        return None
+    return store.path(store.put(data))
+
+
+def load_image(kind, key):
+    """(bytes, mime) untuk kode yang butuh isi gambar (data URI dsb.)."""
+    digest, mime = image_info(kind, key)
+    if not digest:
+        return None, None
+    path = _ensure_file(kind, key, digest)
+    if path is None:
+        return None, None
+    with open(path, "rb") as fh:
+        return fh.read(), mime
+
+
+def image_url(endpoint, digest, **values):
+    """URL gambar ber-versi isi: berubah hanya jika gambarnya berubah."""
+    if digest:
+        values["v"] = digest
+    return url_for(endpoint, **values)
+
+
+def with_width(url, width):
+    """Filter template `lebar`: tambahkan ?w= ke URL gambar."""
+    if not url or not width:
+        return url
+    return f"{url}{'&' if '?' in url else '?'}w={int(width)}"
+
+
+def srcset(url):
+    """Filter template `srcset`: semua varian untuk atribut srcset (browser memilih)."""
+    if not url:
+        return ""
+    return ", ".join(f"{with_width(url, w)} {w}w" for w in variant_widths())
+
+
+def lqip_style(uri):
+    """Filter template `lqip`: deklarasi CSS background dari placeholder (kosong jika tidak ada)."""
+    if not uri:
+        return ""
+    return f"background:url({uri}) center/cover no-repeat;"
+
+
+def _versioned(version):
+    return bool(version) and request.args.get("v") == version
+
+
+def _cache_headers(resp, etag, version=None):
+    resp.set_etag(etag)
+    resp.cache_control.public = True
+    if alt_formats():
+        # isi URL yang sama bergantung pada Accept (negotiate)
+        resp.vary.add("Accept")
+    if _versioned(version or etag):
+        resp.cache_control.max_age = int(_config("IMAGE_IMMUTABLE_MAX_AGE"))
+        resp.cache_control.immutable = True
+    else:
+        resp.cache_control.max_age = int(_config("IMAGE_CACHE_MAX_AGE"))
+    return resp
+
+
+def not_modified(etag, version=None):
+    """Response 304 jika If-None-Match request cocok dengan `etag`, selain itu None."""
+    if etag and request.if_none_match.contains(etag):
+        return _cache_headers(Response(status=304), etag, version)
+    return None
+
+
+_format_counts = Counter()
+_format_lock = threading.Lock()
+
+
+def _count_format(mime):
+    with _format_lock:
+        _format_counts[mime] += 1
+
+
+def get_format_stats():
+    """Jumlah response gambar per MIME yang dikirim send_image() di proses ini."""
+    with _format_lock:
+        return dict(_format_counts)
+
+
+def negotiate(fmt):
+    """
+    Encoding alternatif terbaik untuk header Accept request ini (AVIF > WEBP >
+    format universal), atau None jika format asli `fmt` yang dikirim.
+    """
+    alts = alt_formats()
+    if fmt not in VARIANT_FORMATS or not alts:
+        return None
+    # hanya yang disebut eksplisit: */* dikirim juga oleh webview yang tidak bisa WEBP
+    accepted = {value for value, quality in request.accept_mimetypes if quality > 0}
+    choices = [f for f in ("AVIF", "WEBP") if FORMAT_MIME[f] in accepted]
+    choices.append(fmt if fmt in UNIVERSAL_FORMATS else "JPEG")
+    for choice in choices:
+        if choice == fmt:
+            return None
+        if choice in alts:
+            return choice
+    return None
+
+
+def send_image(kind, key, default_mime="application/octet-stream", width=None):
+    """
+    Response file gambar, atau None jika tidak ada (route memutuskan 404/placeholder).
+    `width` (default: ?w= dari request) memilih varian ukuran, header Accept memilih
+    encodingnya (negotiate).
+    """
+    digest, mime = image_info(kind, key)
+    if not digest:
+        return None
+    if width is None:
+        width = request.args.get("w", type=int)
+    width = pick_width(width)
+    alt = negotiate(MIME_FORMAT.get(mime))
+    out_mime = FORMAT_MIME[alt] if alt else (mime or default_mime)
+    etag = f"{digest}-w{width}" if width else digest
+    if alt:
+        etag = f"{etag}-{FORMAT_EXT[alt]}"
+    # revalidasi: cukup lookup hash, file/BLOB tidak dibuka
+    resp = not_modified(etag, digest)
+    if resp is not None:
+        _count_format(out_mime)
+        return resp
+    # X-Sendfile / X-Accel-Redirect: web server yang membaca file, isi tidak di-cache
+    in_memory = not _config("IMAGE_SENDFILE")
+    if in_memory:
+        data = image_cache.get_bytes(kind, key, digest, width, alt)
+        if data is not None:
+            _count_format(out_mime)
+            return send_bytes(data, out_mime, etag, digest)
+    path = _ensure_file(kind, key, digest)
+    if path is None:
+        return None
+    if width or alt:
+        store = get_store()
+        if not store.exists(digest, width, alt):
+            # impor di sini: image_jobs sendiri mengimpor image_store
+            from . import image_jobs
+
+            queued = store.is_pending(digest) or image_jobs.submit_variants(digest)
+            if queued or not store.exists(digest, width, alt):
+                # upload masih diproses, varian gambar lama sedang dibuat di image_jobs,
+                # atau gagal dibuat inline: kirim file asli, tanpa cache panjang
+                _count_format(mime or default_mime)
+                resp = send_path(path, mime or default_mime, etag=f"{digest}-antri")
+                resp.cache_control.max_age = 0
+                resp.cache_control.no_cache = True
+                return resp
+        path = store.path(digest, width, alt)
+    _count_format(out_mime)
+    if in_memory and os.path.getsize(path) <= image_cache.item_max():
+        with open(path, "rb") as fh:
+            data = fh.read()
+        image_cache.put_bytes(kind, key, digest, width, data, alt)
+        return send_bytes(data, out_mime, etag, digest)
+    return send_path(path, out_mime, etag=etag, version=digest)
+
+
+@lru_cache(maxsize=None)
+def _static_version(path):
+    with open(path, "rb") as fh:
+        return digest_of(fh.read())[:12]
+
+
+def placeholder_redirect(filename="img/placeholder-food.png"):
+    """
+    Redirect ke placeholder statis untuk gambar yang tidak ada. URL tujuan memuat
+    ?v=<hash file> sehingga di-cache `immutable` (_static_cache); redirect-nya sendiri
+    hanya di-cache selama IMAGE_LRU_MISS_TTL karena gambar bisa diupload kapan saja.
+    """
+    version = _static_version(os.path.join(current_app.static_folder, filename))
+    resp = redirect(url_for("static", filename=filename, v=version))
+    resp.cache_control.public = True
+    resp.cache_control.max_age = int(image_cache.miss_ttl())
+    return resp
+
+
+def _static_cache(resp):
+    """after_request: file statis yang diminta dengan ?v= tidak akan berubah isinya."""
+    if request.endpoint == "static" and request.args.get("v") and resp.status_code in (200, 304):
+        resp.cache_control.public = True
+        resp.cache_control.max_age = int(_config("IMAGE_IMMUTABLE_MAX_AGE"))
+        resp.cache_control.immutable = True
+    return resp
+
+
+def send_bytes(data, mimetype, etag, version=None):
+    """Response dari bytes di memori (hit image_cache), dengan header cache yang sama."""
+    resp = _cache_headers(Response(data, mimetype=mimetype), etag, version)
+    return resp.make_conditional(request)
+
+
+def send_path(path, mimetype, etag=None, version=None):
+    if _config("IMAGE_SENDFILE") == "x-accel-redirect":
+        # nginx membaca file dari location internal; Python tidak menyentuh isinya
+        rel = os.path.relpath(path, get_store().root).replace(os.sep, "/")
+        resp = Response(mimetype=mimetype)
+        resp.headers["X-Accel-Redirect"] = _config("IMAGE_ACCEL_PREFIX").rstrip("/") + "/" + rel
+        return _cache_headers(resp, etag or os.path.basename(path), version)
+    # USE_X_SENDFILE (diset init_app untuk "x-sendfile") membuat send_file hanya
+    # mengirim header X-Sendfile; selain itu file dialirkan lewat wsgi.file_wrapper.
+    # Nama file = sha256 isinya, jadi ETag kuat sama dengan hash di DB.
+    etag = etag or os.path.basename(path)
+    resp = send_file(path, mimetype=mimetype, conditional=True, etag=etag)
+    return _cache_headers(resp, etag, version)
+
+
+# -------------------------
+# Migrasi BLOB -> disk
+# -------------------------
+def migrate_blobs(kinds=None, batch=100, keep_blob=False, echo=print):
+    """
+    Pindahkan BLOB lama ke store per batch (keyset by id) beserta variannya, isi ulang
+    kolom hash dari isi sebenarnya, lalu kosongkan BLOB kecuali keep_blob. Aman diulang.
+    """
+    totals = {}
+    for kind in kinds or SOURCES:
+        table, id_col, blob_col, _, hash_col = SOURCES[kind]
+        moved = size = 0
+        last_id = 0
+        conn = get_db_connection(autonomous=True)
+        cur = conn.cursor()
+        try:
+            while True:
+                cur.execute(
+                    f"SELECT {id_col}, {blob_col} FROM {table} "
+                    f"WHERE {blob_col} IS NOT NULL AND {id_col} > %s ORDER BY {id_col} LIMIT %s",
+                    (last_id, batch),
+                )
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                for key, data in rows:
+                    digest = put(bytes(data))
+                    if keep_blob:
+                        cur.execute(f"UPDATE {table} SET {hash_col}=%s WHERE {id_col}=%s", (digest, key))
+                    else:
+                        cur.execute(
+                            f"UPDATE {table} SET {hash_col}=%s, {blob_col}=NULL WHERE {id_col}=%s",
+                            (digest, key),
+                        )
+                    moved += 1
+                    size += len(data)
+                    last_id = key
+                conn.commit()
+                echo(f"{table}: {moved} gambar ({size / 1e6:.1f} MB)")
+        finally:
+            cur.close()
+            conn.close()
+        totals[kind] = moved
+    return totals
+
+
+def fill_placeholders(kinds=None, batch=100, echo=print):
+    """
+    Isi kolom Lqip* yang masih kosong (gambar dari sebelum placeholder ada), dihitung
+    dari varian terkecil jika sudah ada. Aman diulang.
+    """
+    store = get_store()
+    smallest = variant_widths()[0] if variant_widths() else None
+    totals = {}
+    for kind in kinds or LQIP_COLUMNS:
+        table, id_col, _, _, hash_col = SOURCES[kind]
+        lqip_col = LQIP_COLUMNS[kind]
+        filled = 0
+        last_id = 0
+        conn = get_db_connection(autonomous=True)
+        cur = conn.cursor()
+        try:
+            while True:
+                cur.execute(
+                    f"SELECT {id_col}, {hash_col} FROM {table} "
+                    f"WHERE {hash_col} IS NOT NULL AND {lqip_col} IS NULL AND {id_col} > %s "
+                    f"ORDER BY {id_col} LIMIT %s",
+                    (last_id, batch),
+                )
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                for key, digest in rows:
+                    last_id = key
+                    path = store.path(digest, smallest) if smallest and store.exists(digest, smallest) else None
+                    path = path or _ensure_file(kind, key, digest)
+                    if path is None:
+                        continue
+                    with open(path, "rb") as fh:
+                        uri = placeholder(fh)
+                    if uri:
+                        cur.execute(
+                            f"UPDATE {table} SET {lqip_col}=%s WHERE {id_col}=%s AND {hash_col}=%s",
+                            (uri, key, digest),
+                        )
+                        filled += cur.rowcount
+                conn.commit()
+                echo(f"{table}: {filled} placeholder")
+        finally:
+            cur.close()
+            conn.close()
+        totals[kind] = filled
+    return totals
+
+
+images_cli = AppGroup("images", help="Penyimpanan gambar di disk.")
+
+
+@images_cli.command("migrate")
+@click.option("--kind", "kinds", multiple=True, type=click.Choice(sorted(SOURCES)), help="Hanya jenis ini.")
+@click.option("--batch", type=int, default=100, show_default=True)
+@click.option("--keep-blob", is_flag=True, help="Salin ke disk tanpa mengosongkan BLOB.")
+def migrate_command(kinds, batch, keep_blob):
+    totals = migrate_blobs(kinds=kinds or None, batch=batch, keep_blob=keep_blob, echo=click.echo)
+    click.echo(f"Selesai: {sum(totals.values())} gambar di {get_store().root}")
+
+
+@images_cli.command("lqip")
+@click.option("--kind", "kinds", multiple=True, type=click.Choice(sorted(LQIP_COLUMNS)), help="Hanya jenis ini.")
+@click.option("--batch", type=int, default=100, show_default=True)
+def lqip_command(kinds, batch):
+    """Hitung placeholder untuk gambar yang belum punya."""
+    totals = fill_placeholders(kinds=kinds or None, batch=batch, echo=click.echo)
+    click.echo(f"Selesai: {sum(totals.values())} placeholder")
+
+
+def init_app(app):
+    # batas PIL sendiri (error di 2x nilai ini) mengikuti anggaran piksel upload
+    Image.MAX_IMAGE_PIXELS = int(app.config.get("IMAGE_MAX_PIXELS", IMAGE_DEFAULTS["IMAGE_MAX_PIXELS"]))
+    if app.config.get("IMAGE_SENDFILE") == "x-sendfile":
+        app.config["USE_X_SENDFILE"] = True
+    app.cli.add_command(images_cli)
+    app.add_template_filter(with_width, "lebar")
+    app.add_template_filter(srcset, "srcset")
+    app.add_template_filter(lqip_style, "lqip")
+    app.add_template_global(image_url, "image_url")
+    app.after_request(_static_cache)
@@ -0,0 +1,408 @@
+"""
+Migrasi skema berversi.
+
+File SQL ada di folder migrations/ dengan nama NNNN_keterangan.sql dan dijalankan
+berurutan menurut nomornya. Versi yang sudah diterapkan dicatat di tabel
+MigrasiSkema (beserta checksum file), jadi setiap file hanya jalan sekali.
+
+CLI (lewat Flask):
+
+    flask --app app db status          # daftar migrasi + yang belum diterapkan
+    flask --app app db upgrade         # terapkan semua yang tertunda
+    flask --app app db check-indexes   # cek predikat query punya index
+
+CREATE INDEX di file migrasi dilewati jika index dengan nama sama sudah ada, atau
+jika sudah ada index lain yang kolom depannya sama (mis. index bawaan foreign key),
+sehingga paket index aman dijalankan pada database yang skemanya tidak diketahui.
+Begitu juga ALTER TABLE ... ADD COLUMN untuk kolom yang sudah ada; migrasinya
+sendiri yang menyamakan definisi kolom itu (MODIFY COLUMN) jika perlu.
+"""
+import ast
+import hashlib
+import os
+import re
+import sys
+
+import click
+from flask.cli import AppGroup
+
+from .db import get_db_connection
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATIONS_DIR = os.path.join(BASE_DIR, "migrations")
+SOURCE_DIRS = ("models", "routes")
+
+_FILE_RE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+_CREATE_INDEX_RE = re.compile(
+    r"^\s*CREATE\s+(?:UNIQUE\s+)?INDEX\s+`?(\w+)`?\s+ON\s+`?(\w+)`?\s*\(([^)]*)\)",
+    re.IGNORECASE,
+)
+_ADD_COLUMN_RE = re.compile(
+    r"^\s*ALTER\s+TABLE\s+`?(\w+)`?\s+ADD\s+(?:COLUMN\s+)?"
+    r"(?!(?:INDEX|KEY|UNIQUE|PRIMARY|FOREIGN|CONSTRAINT|FULLTEXT|SPATIAL)\b)`?(\w+)`?\s+(?:[^,(]|\([^)]*\))*$",
+    re.IGNORECASE,
+)
+
+# Predikat jalur panas yang wajib dilayani index (tabel, kolom berurutan)
+HOT_PREDICATES = [
+    ("Obrolan", ("IdRuang", "Waktu")),
+    ("Obrolan", ("IdPengguna", "IdWarung", "Waktu")),
+    ("PesananWarung", ("IdWarung", "DibuatPada")),
+    ("PesananWarung", ("IdPembeli", "Status")),
+    ("Pesanan", ("IdMakanan",)),
+    ("Pesanan", ("IdPesananWarung",)),
+    ("Makanan", ("IdWarung", "NamaMakanan")),
+    ("Warung", ("IdPenjual",)),
+]
+
+
+class MigrationError(RuntimeError):
+    """File migrasi tidak valid atau gagal diterapkan."""
+
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+
+    def read(self):
+        with open(self.path, encoding="utf-8") as f:
+            return f.read()
+
+    def checksum(self):
+        return hashlib.sha256(self.read().encode("utf-8")).hexdigest()
+
+    def statements(self):
+        return split_statements(self.read())
+
+
+def discover(directory=MIGRATIONS_DIR):
+    migrations = []
+    seen = {}
+    for filename in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        match = _FILE_RE.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in seen:
+            raise MigrationError(f"Versi {version} ganda: {seen[version]} dan {filename}")
+        seen[version] = filename
+        migrations.append(Migration(version, match.group(2), os.path.join(directory, filename)))
+    return migrations
+
+
+def split_statements(sql):
+    """Pecah isi file per ';' di akhir baris; baris komentar '--' dibuang."""
+    statements, buf = [], []
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("--"):
+            continue
+        buf.append(line)
+        if stripped.endswith(";"):
+            statements.append("\n".join(buf).rstrip().rstrip(";").strip())
+            buf = []
+    if buf:
+        statements.append("\n".join(buf).strip())
+    return [s for s in statements if s]
+
+
+def _ensure_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS MigrasiSkema (
+            Versi INT PRIMARY KEY,
+            Nama VARCHAR(255) NOT NULL,
+            Checksum CHAR(64) NOT NULL,
+            DiterapkanPada TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _applied(cur):
+    _ensure_table(cur)
+    cur.execute("SELECT Versi, Nama, Checksum, DiterapkanPada FROM MigrasiSkema ORDER BY Versi")
+    return {row["Versi"]: row for row in cur.fetchall()}
+
+
+def _index_columns(cur, table):
+    """{nama_index: [kolom berurutan]} untuk tabel di database aktif."""
+    cur.execute("""
+        SELECT INDEX_NAME, COLUMN_NAME
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    """, (table,))
+    indexes = {}
+    for row in cur.fetchall():
+        indexes.setdefault(row["INDEX_NAME"], []).append(row["COLUMN_NAME"])
+    return indexes
+
+
+def _covering_index(indexes, columns):
+    """Nama index yang kolom depannya sama dengan `columns`, atau None."""
+    wanted = [c.lower() for c in columns]
+    for name, cols in indexes.items():
+        if [c.lower() for c in cols[:len(wanted)]] == wanted:
+            return name
+    return None
+
+
+def _column_exists(cur, table, column):
+    cur.execute("""
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    return cur.fetchone() is not None
+
+
+def _should_skip(cur, statement):
+    match = _ADD_COLUMN_RE.match(statement)
+    if match:
+        table, column = match.groups()
+        if _column_exists(cur, table, column):
+            return f"kolom {table}.{column} sudah ada"
+        return None
+    match = _CREATE_INDEX_RE.match(statement)
+    if not match:
+        return None
+    name, table, cols = match.groups()
+    columns = [c.strip().strip("`").split("(")[0].split()[0] for c in cols.split(",") if c.strip()]
+    indexes = _index_columns(cur, table)
+    if name in indexes:
+        return f"index {name} sudah ada"
+    existing = _covering_index(indexes, columns)
+    if existing:
+        return f"{table}({', '.join(columns)}) sudah dilayani index {existing}"
+    return None
+
+
+def status():
+    conn = get_db_connection(autonomous=True)
+    cur = conn.cursor(dictionary=True)
+    try:
+        applied = _applied(cur)
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+    result = []
+    for m in discover():
+        row = applied.pop(m.version, None)
+        result.append({
+            "version": m.version,
+            "name": m.name,
+            "applied": row is not None,
+            "applied_at": row["DiterapkanPada"] if row else None,
+            "changed": row is not None and row["Checksum"] != m.checksum(),
+        })
+    for version, row in applied.items():
+        # tercatat di database tapi filenya sudah tidak ada
+        result.append({"version": version, "name": row["Nama"], "applied": True,
+                       "applied_at": row["DiterapkanPada"], "changed": False, "missing": True})
+    return sorted(result, key=lambda r: r["version"])
+
+
+def upgrade(target=None, echo=print):
+    """Terapkan migrasi tertunda sampai versi `target` (default: semua). Kembalikan versi yang diterapkan."""
+    conn = get_db_connection(autonomous=True)
+    cur = conn.cursor(dictionary=True)
+    done = []
+    try:
+        applied = _applied(cur)
+        conn.commit()
+        for m in discover():
+            if m.version in applied or (target is not None and m.version > target):
+                continue
+            echo(f"-> {m.version:04d} {m.name}")
+            for statement in m.statements():
+                reason = _should_skip(cur, statement)
+                if reason:
+                    echo(f"   lewati: {reason}")
+                    continue
+                try:
+                    cur.execute(statement)
+                except Exception as e:
+                    conn.rollback()
+                    # DDL MySQL auto-commit; statement sebelumnya di file ini sudah berlaku
+                    raise MigrationError(f"Migrasi {m.version:04d} gagal pada:\n{statement}\n{e}") from e
+            cur.execute(
+                "INSERT INTO MigrasiSkema (Versi, Nama, Checksum) VALUES (%s, %s, %s)",
+                (m.version, m.name, m.checksum()),
+            )
+            conn.commit()
+            done.append(m.version)
+        return done
+    finally:
+        cur.close()
+        conn.close()
+
+
+# -------------------------
+# Cek index
+# -------------------------
+_STATEMENT_RE = re.compile(r"^\s*(SELECT|UPDATE|DELETE)\b", re.IGNORECASE)
+_TABLE_RE = re.compile(
+    r"\b(?:FROM|JOIN|UPDATE)\s+`?(\w+)`?(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE
+)
+_PREDICATE_RE = re.compile(
+    r"(?:\b(\w+)\.)?\b(\w+)\s*(?:=\s*(?:%s|%\(\w+\)s|\?|'[^']*'|\d+\b|\w+\.\w+)|IN\s*\()",
+    re.IGNORECASE,
+)
+_SQL_KEYWORDS = {
+    "where", "join", "left", "right", "inner", "outer", "on", "set", "order", "group",
+    "limit", "for", "as", "and", "or", "not", "having", "union", "using", "cross",
+}
+
+
+def _sql_literals(path):
+    """(lineno, sql) untuk setiap string di file yang terlihat seperti query."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            text = node.value
+        elif isinstance(node, ast.JoinedStr):
+            text = "".join(
+                v.value if isinstance(v, ast.Constant) else "?" for v in node.values
+            )
+        else:
+            continue
+        if _STATEMENT_RE.match(text) and re.search(r"\bWHERE\b", text, re.IGNORECASE):
+            yield node.lineno, text
+
+
+def _where_parts(sql):
+    """Potongan teks setelah setiap WHERE sampai ORDER/GROUP/LIMIT berikutnya."""
+    parts = re.split(r"\bWHERE\b", sql, flags=re.IGNORECASE)[1:]
+    return [re.split(r"\b(?:ORDER|GROUP)\s+BY\b|\bLIMIT\b", p, flags=re.IGNORECASE)[0] for p in parts]
+
+
+def statement_predicates(sql, table_columns):
+    """
+    {tabel: set(kolom)} dari predikat WHERE yang membandingkan kolom dengan parameter,
+    literal, atau kolom tabel lain (subquery berkorelasi). LIKE sengaja tidak dihitung.
+    """
+    aliases = {}
+    tables = []
+    for table, alias in _TABLE_RE.findall(sql):
+        if table not in table_columns:
+            continue
+        tables.append(table)
+        aliases[table.lower()] = table
+        if alias and alias.lower() not in _SQL_KEYWORDS:
+            aliases[alias.lower()] = table
+
+    found = {}
+    for part in _where_parts(sql):
+        for qualifier, column in _PREDICATE_RE.findall(part):
+            if column.lower() in _SQL_KEYWORDS:
+                continue
+            if qualifier:
+                table = aliases.get(qualifier.lower())
+            else:
+                owners = [t for t in tables if column.lower() in table_columns[t]]
+                table = owners[0] if owners else None
+            if table and column.lower() in table_columns[table]:
+                found.setdefault(table, set()).add(column.lower())
+    return found
+
+
+def _schema(cur):
+    cur.execute("""
+        SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE()
+    """)
+    table_columns = {}
+    for row in cur.fetchall():
+        table_columns.setdefault(row["TABLE_NAME"], set()).add(row["COLUMN_NAME"].lower())
+    indexes = {table: _index_columns(cur, table) for table in table_columns}
+    return table_columns, indexes
+
+
+def check_indexes(source_dirs=SOURCE_DIRS):
+    """
+    Kembalikan daftar temuan:
+      - predikat di HOT_PREDICATES yang tidak punya index dengan kolom depan yang sama;
+      - query di models/ dan routes/ yang predikat WHERE-nya tidak mengenai kolom
+        pertama index mana pun pada tabel tersebut (aturan leftmost prefix MySQL).
+    """
+    conn = get_db_connection(autonomous=True)
+    cur = conn.cursor(dictionary=True)
+    try:
+        table_columns, indexes = _schema(cur)
+    finally:
+        cur.close()
+        conn.close()
+
+    problems = []
+    for table, columns in HOT_PREDICATES:
+        if not _covering_index(indexes.get(table, {}), columns):
+            problems.append({"where": "HOT_PREDICATES", "table": table,
+                             "columns": list(columns), "sql": None})
+
+    for directory in source_dirs:
+        root = os.path.join(BASE_DIR, directory)
+        for filename in sorted(os.listdir(root)):
+            if not filename.endswith(".py"):
+                continue
+            path = os.path.join(root, filename)
+            for lineno, sql in _sql_literals(path):
+                for table, columns in statement_predicates(sql, table_columns).items():
+                    leading = {cols[0].lower() for cols in indexes.get(table, {}).values()}
+                    if not leading & columns:
+                        problems.append({
+                            "where": f"{directory}/{filename}:{lineno}",
+                            "table": table,
+                            "columns": sorted(columns),
+                            "sql": " ".join(sql.split())[:200],
+                        })
+    return problems
+
+
+# -------------------------
+# CLI
+# -------------------------
+db_cli = AppGroup("db", help="Migrasi skema dan cek index.")
+
+
+@db_cli.command("status")
+def status_command():
+    for row in status():
+        if row.get("missing"):
+            state = "FILE HILANG"
+        elif row["changed"]:
+            state = "DIUBAH setelah diterapkan"
+        elif row["applied"]:
+            state = f"diterapkan {row['applied_at']}"
+        else:
+            state = "tertunda"
+        click.echo(f"{row['version']:04d} {row['name']:<40} {state}")
+
+
+@db_cli.command("upgrade")
+@click.option("--target", type=int, default=None, help="Berhenti di versi ini.")
+def upgrade_command(target):
+    try:
+        done = upgrade(target=target, echo=click.echo)
+    except MigrationError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"{len(done)} migrasi diterapkan." if done else "Skema sudah terbaru.")
+
+
+@db_cli.command("check-indexes")
+def check_indexes_command():
+    problems = check_indexes()
+    for p in problems:
+        click.echo(f"{p['where']}: {p['table']}({', '.join(p['columns'])}) tanpa index")
+        if p["sql"]:
+            click.echo(f"    {p['sql']}")
+    if problems:
+        click.echo(f"{len(problems)} predikat tanpa index.", err=True)
+        sys.exit(1)
+    click.echo("Semua predikat dilayani index.")
+
+
+def init_app(app):
+    app.cli.add_command(db_cli)
@@ -0,0 +1,328 @@
+"""
+Instrumentasi SQL per request.
+
+Setiap cursor dari get_db_connection() dibungkus InstrumentedCursor yang mencatat
+jumlah statement, total waktu DB, dan statement paling lambat (dinormalisasi,
+literal diganti '?') ke flask.g. Di akhir request ringkasannya ditulis ke log dan
+ke header Server-Timing sehingga terlihat di DevTools browser.
+
+Mode deteksi (SQL_REPEAT_DETECTION = "warn" / "raise") menandai SELECT dengan
+bentuk sama yang dijalankan berulang dalam satu request (pola N+1) dan SELECT
+yang persis sama (SQL + parameter) lebih dari sekali. Pada mode "raise" error juga
+dilempar ulang di after_request, jadi tetap terlihat walaupun model menelan
+exception-nya dengan `except Exception`; unit of work request itu tidak di-commit
+(lihat request_problems()). query_budget() membatasi
+jumlah query di dalam sebuah blok, untuk dipakai di test; capture_statements()
+mengumpulkan statement beserta parameternya (dipakai harness EXPLAIN); time_statements()
+menambahkan durasinya (dipakai fan_out untuk statement dari thread worker).
+Pengulangan transaksi karena deadlock (models/retry.py) muncul sebagai entri
+"lock" di Server-Timing.
+"""
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+STATS_DEFAULTS = {
+    "SQL_STATS_ENABLED": True,
+    "SQL_STATS_TOP_N": 5,               # statement terlambat yang dilaporkan
+    "SQL_STATS_LOG_THRESHOLD_MS": 50,   # di atas ini ringkasan dicatat level INFO
+    "SQL_REPEAT_DETECTION": "off",      # "off", "warn" atau "raise"
+    "SQL_REPEAT_THRESHOLD": 3,          # SELECT berbentuk sama sebanyak ini -> N+1
+    "SQL_DUPLICATE_THRESHOLD": 2,       # SELECT identik (SQL + parameter) sebanyak ini
+}
+
+
+class RepeatedQueryError(RuntimeError):
+    """Dilempar pada mode SQL_REPEAT_DETECTION="raise" saat pola N+1/duplikat terdeteksi."""
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Jumlah query di dalam query_budget() melebihi batas."""
+
+
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_PLACEHOLDER_RE = re.compile(r"%\(\w+\)s|%s")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+_WRITE_RE = re.compile(r"\s*(INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+# statement kontrol transaksi; tidak dihitung query_budget() kecuali include_commit
+TRANSACTION_CONTROL = ("COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE SAVEPOINT")
+
+
+def normalize_sql(sql):
+    """Bentuk statement tanpa nilai: literal dan placeholder jadi '?', IN (...) diringkas."""
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode("utf-8", "replace")
+    sql = _STRING_RE.sub("?", str(sql))
+    sql = _PLACEHOLDER_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _IN_LIST_RE.sub("IN (...)", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+
+def _config(key):
+    return current_app.config.get(key, STATS_DEFAULTS[key])
+
+
+def _is_select(sql):
+    return sql[:6].upper() == "SELECT"
+
+
+def is_write(sql):
+    """True untuk INSERT/UPDATE/DELETE/REPLACE."""
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode("utf-8", "replace")
+    return _WRITE_RE.match(str(sql)) is not None
+
+
+class RequestStats:
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.by_statement = {}  # sql normal -> [jumlah, total detik, maks detik]
+        self.exact = {}         # (sql, parameter) -> jumlah, hanya SELECT
+        self.flagged = set()
+        self.problems = []      # pesan RepeatedQueryError yang sudah dilempar
+        self.lock_retries = 0   # transaksi diulang karena deadlock / lock wait timeout
+        self.lock_wait = 0.0    # detik yang habis di percobaan gagal + backoff
+
+    def record(self, sql, duration, params=None):
+        self.count += 1
+        self.total_time += duration
+        key = normalize_sql(sql)
+        entry = self.by_statement.get(key)
+        if entry is None:
+            self.by_statement[key] = [1, duration, duration]
+        else:
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] = max(entry[2], duration)
+        if _is_select(key):
+            exact_key = (key, repr(params))
+            self.exact[exact_key] = self.exact.get(exact_key, 0) + 1
+            self._check_repeats(key, exact_key)
+
+    def _check_repeats(self, key, exact_key):
+        mode = _config("SQL_REPEAT_DETECTION")
+        if mode not in ("warn", "raise"):
+            return
+        problem = None
+        if self.exact[exact_key] >= int(_config("SQL_DUPLICATE_THRESHOLD")) and exact_key not in self.flagged:
+            self.flagged.add(exact_key)
+            problem = f"query duplikat x{self.exact[exact_key]} (parameter sama {exact_key[1]})"
+        elif self.by_statement[key][0] >= int(_config("SQL_REPEAT_THRESHOLD")) and key not in self.flagged:
+            self.flagged.add(key)
+            problem = f"kemungkinan N+1: bentuk query sama x{self.by_statement[key][0]}"
+        if problem is None:
+            return
+        message = f"{problem} di {request.endpoint or request.path}: {key[:300]}"
+        if mode == "raise":
+            self.problems.append(message)
+            raise RepeatedQueryError(message)
+        logger.warning(message)
+
+    def slowest(self, n):
+        items = sorted(self.by_statement.items(), key=lambda kv: kv[1][1], reverse=True)
+        return [
+            {"sql": sql, "count": e[0], "total_ms": round(e[1] * 1000, 2), "max_ms": round(e[2] * 1000, 2)}
+            for sql, e in items[:n]
+        ]
+
+
+def request_problems():
+    """Pesan RepeatedQueryError request aktif (mode "raise"); kosong jika tidak ada."""
+    stats = g.get("_sql_stats") if has_request_context() else None
+    return list(stats.problems) if stats is not None else []
+
+
+def current_stats():
+    """RequestStats milik request aktif, atau None di luar request / jika dimatikan."""
+    if not has_request_context() or not _config("SQL_STATS_ENABLED"):
+        return None
+    stats = g.get("_sql_stats")
+    if stats is None:
+        stats = RequestStats()
+        g._sql_stats = stats
+    return stats
+
+
+_local = threading.local()
+
+
+def _active(name):
+    stack = getattr(_local, name, None)
+    if stack is None:
+        stack = []
+        setattr(_local, name, stack)
+    return stack
+
+
+def _active_budgets():
+    return _active("budgets")
+
+
+def record_lock_retry(wait):
+    """Catat satu pengulangan transactional_retry ke statistik request aktif."""
+    stats = current_stats()
+    if stats is not None:
+        stats.lock_retries += 1
+        stats.lock_wait += wait
+
+
+def record_statement(sql, duration, params=None):
+    for budget in _active_budgets():
+        budget.append(normalize_sql(sql))
+    for captured in _active("captures"):
+        captured.append((sql, params))
+    for timed in _active("timings"):
+        timed.append((sql, duration, params))
+    stats = current_stats()
+    if stats is not None:
+        stats.record(sql, duration, params)
+
+
+@contextmanager
+def query_budget(max_queries, include_commit=False):
+    """
+    Gagal (QueryBudgetExceeded) jika blok menjalankan lebih dari max_queries statement.
+    Menghitung semua query di thread ini, termasuk yang dijalankan lewat test client;
+    COMMIT/ROLLBACK/SAVEPOINT hanya dihitung dengan include_commit=True:
+
+        with query_budget(4):
+            client.get("/warung/1")
+    """
+    executed = []
+    stack = _active_budgets()
+    stack.append(executed)
+    try:
+        yield executed
+    finally:
+        stack.remove(executed)
+    counted = executed if include_commit else [
+        q for q in executed if not q.upper().startswith(TRANSACTION_CONTROL)
+    ]
+    if len(counted) > max_queries:
+        listing = "\n".join(f"  {i + 1}. {q[:200]}" for i, q in enumerate(counted))
+        raise QueryBudgetExceeded(f"{len(counted)} query dijalankan, batas {max_queries}:\n{listing}")
+
+
+@contextmanager
+def capture_statements():
+    """Kumpulkan (sql, parameter) setiap statement yang dijalankan thread ini di dalam blok."""
+    captured = []
+    stack = _active("captures")
+    stack.append(captured)
+    try:
+        yield captured
+    finally:
+        stack.remove(captured)
+
+
+@contextmanager
+def time_statements():
+    """Seperti capture_statements(), dengan durasi: (sql, detik, parameter)."""
+    timed = []
+    stack = _active("timings")
+    stack.append(timed)
+    try:
+        yield timed
+    finally:
+        stack.remove(timed)
+
+
+class InstrumentedCursor:
+    """
+    Cursor MySQL yang mengukur setiap execute(); atribut lain diteruskan apa adanya.
+    on_write (jika diset) dipanggil setelah INSERT/UPDATE/DELETE berhasil dijalankan.
+    """
+
+    on_write = None
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def _wrote(self, operation):
+        if self.on_write is not None and is_write(operation):
+            self.on_write()
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            record_statement(operation, time.perf_counter() - start, params)
+        self._wrote(operation)
+        return result
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            record_statement(operation, time.perf_counter() - start)
+        self._wrote(operation)
+        return result
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cursor.close()
+
+
+def instrument_cursor(cursor):
+    return InstrumentedCursor(cursor)
+
+
+def _mark_request_start():
+    g._request_started = time.perf_counter()
+
+
+def _emit_request_stats(response):
+    stats = g.get("_sql_stats")
+    if stats is None:
+        return response
+
+    db_ms = stats.total_time * 1000
+    timing = [f'db;dur={db_ms:.2f};desc="{stats.count} queries"']
+    if stats.lock_retries:
+        timing.append(f'lock;dur={stats.lock_wait * 1000:.2f};desc="{stats.lock_retries} retries"')
+    started = g.get("_request_started")
+    if started is not None:
+        timing.append(f"app;dur={(time.perf_counter() - started) * 1000:.2f}")
+    response.headers.add("Server-Timing", ", ".join(timing))
+
+    if stats.problems:
+        # bisa saja sudah ditelan `except Exception` di model; laporkan sekali lagi di sini.
+        # _commit_request_unit sudah me-rollback unit of work-nya, jadi 500 ini tidak
+        # menutupi tulisan yang terlanjur tersimpan
+        raise RepeatedQueryError("\n".join(stats.problems))
+
+    slowest = stats.slowest(int(_config("SQL_STATS_TOP_N")))
+    level = logging.INFO if db_ms >= float(_config("SQL_STATS_LOG_THRESHOLD_MS")) else logging.DEBUG
+    if logger.isEnabledFor(level):
+        lines = [f"  {s['total_ms']:>8.2f}ms x{s['count']} {s['sql'][:200]}" for s in slowest]
+        logger.log(
+            level, "SQL %s %s -> %d queries, %.2fms\n%s",
+            request.method, request.endpoint or request.path, stats.count, db_ms, "\n".join(lines),
+        )
+    return response
+
+
+def init_app(app):
+    app.before_request(_mark_request_start)
+    app.after_request(_emit_request_stats)
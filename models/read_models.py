@@ -0,0 +1,124 @@
+"""
+Read model ringkas untuk halaman daftar (menu warung, daftar warung, daftar pesanan).
+
+Setiap read model adalah namedtuple (tanpa __dict__ per objek) dengan field sama
+dengan nama kolom hasil SELECT-nya, jadi baris cursor tuple bisa langsung dipetakan
+lewat map_rows() tanpa dict per baris, tanpa constructor panjang dan tanpa disalin
+lagi ke dict untuk template. Template membaca fieldnya langsung (m.NamaMakanan);
+URL gambar dihitung lewat property saat dirender, placeholder LQIP (Lqip*) ikut
+terbaca sebagai data URI.
+
+Objek penuh (Makanan, Warung, Pesanan) tetap dipakai untuk alur tulis.
+"""
+from collections import namedtuple
+from operator import itemgetter
+
+from flask import url_for
+
+
+def map_rows(cls, rows, column_names=None):
+    """Petakan banyak baris tuple ke read model `cls` sekaligus."""
+    if column_names is not None and tuple(column_names) != cls._fields:
+        names = list(column_names)
+        getter = itemgetter(*(names.index(field) for field in cls._fields))
+        rows = map(getter, rows)
+    return list(map(cls._make, rows))
+
+
+def fetch_all(cls, cur):
+    """fetchall() dari cursor non-dictionary langsung jadi list read model."""
+    return map_rows(cls, cur.fetchall(), cur.column_names)
+
+
+class MakananItem(namedtuple("MakananItem", (
+    "IdMakanan", "IdWarung", "NamaMakanan", "HargaMakanan", "DetailMakanan",
+    "Stok", "Rating", "AdaGambar", "HashGambarMakanan", "LqipMakanan",
+))):
+    __slots__ = ()
+
+    SELECT = """
+        IdMakanan, IdWarung, NamaMakanan, HargaMakanan, DetailMakanan,
+        Stok, Rating, HashGambarMakanan IS NOT NULL AS AdaGambar, HashGambarMakanan, LqipMakanan
+    """
+
+    @property
+    def GambarMakanan(self):
+        if not self.AdaGambar:
+            return None
+        return url_for("warung.makanan_image", id_m=self.IdMakanan, v=self.HashGambarMakanan)
+
+
+class WarungItem(namedtuple("WarungItem", (
+    "IdWarung", "IdPenjual", "NamaWarung", "AlamatWarung", "Rating",
+    "AdaGambar", "HashGambarWarung", "LqipWarung",
+))):
+    __slots__ = ()
+
+    SELECT = """
+        IdWarung, IdPenjual, NamaWarung, AlamatWarung, Rating,
+        HashGambarWarung IS NOT NULL AS AdaGambar, HashGambarWarung, LqipWarung
+    """
+
+    @property
+    def GambarToko(self):
+        if not self.AdaGambar:
+            return None
+        return url_for("home.warung_gambar", id_warung=self.IdWarung, v=self.HashGambarWarung)
+
+
+class _PesananFields:
+    """Nama atribut lama (objek Pesanan) yang dipakai template daftar pesanan."""
+    __slots__ = ()
+
+    @property
+    def id_pesanan(self):
+        return self.IdPesananWarung
+
+    @property
+    def id_pembeli(self):
+        return self.IdPembeli
+
+    @property
+    def id_warung(self):
+        return self.IdWarung
+
+    @property
+    def total_harga(self):
+        return self.TotalHarga or 0
+
+    @property
+    def status(self):
+        return self.Status or ""
+
+    @property
+    def catatan(self):
+        return self.DeskripsiPesanan or ""
+
+    @property
+    def waktu_dibuat(self):
+        waktu = self.DibuatPada
+        return waktu.isoformat() if hasattr(waktu, "isoformat") else str(waktu)
+
+
+_PESANAN_FIELDS = (
+    "IdPesananWarung", "IdPembeli", "IdWarung", "TotalHarga",
+    "DeskripsiPesanan", "Status", "DibuatPada",
+)
+
+
+class PesananPembeliItem(_PesananFields, namedtuple("PesananPembeliItem", _PESANAN_FIELDS + ("NamaWarung",))):
+    """Baris daftar pesanan milik pembeli (dengan nama warung)."""
+    __slots__ = ()
+
+    @property
+    def nama_warung(self):
+        return self.NamaWarung or "Warung"
+
+
+class PesananPenjualItem(_PesananFields, namedtuple("PesananPenjualItem", _PESANAN_FIELDS + ("NamaPembeli",))):
+    """Baris daftar pesanan masuk untuk penjual (dengan nama pembeli)."""
+    __slots__ = ()
+
+    @property
+    def nama_pembeli(self):
+        return self.NamaPembeli or "Pelanggan"
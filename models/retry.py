@@ -0,0 +1,174 @@
+"""
+Pengulangan otomatis transaksi yang gagal karena deadlock / lock wait timeout.
+
+Jalur pesanan (checkout, batal, tolak, konfirmasi bayar) mengunci baris Makanan /
+PesananWarung dengan SELECT ... FOR UPDATE. Saat banyak pembeli memesan menu yang
+sama, InnoDB bisa memilih salah satu transaksi sebagai korban deadlock (1213) atau
+menghentikannya karena menunggu lock terlalu lama (1205). @transactional_retry
+menjalankan ulang seluruh fungsi dengan backoff eksponensial + jitter penuh.
+
+Di dalam request setiap percobaan dibungkus SAVEPOINT di transaksi unit of work:
+yang di-rollback dan diulang hanya pekerjaan fungsi itu, dan tidak ada commit di
+tengah request (semua tetap di-commit sekali di after_request, lock ditahan sampai
+saat itu). Deadlock membuat server me-rollback seluruh transaksi; percobaan hanya
+diulang jika request belum menulis apa pun sebelumnya, jika sudah, error dilempar
+dan unit tidak di-commit. Di luar request fungsi memakai koneksi pool sendiri.
+"""
+import functools
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from flask import current_app, has_app_context
+from mysql.connector import errorcode
+from mysql.connector import errors as mysql_errors
+
+from .db import RequestConnection, _request_scoped, get_db_connection
+from .query_stats import record_lock_retry
+
+logger = logging.getLogger(__name__)
+
+RETRY_DEFAULTS = {
+    "DB_RETRY_ATTEMPTS": 4,        # total percobaan, termasuk yang pertama
+    "DB_RETRY_BASE_DELAY": 0.05,   # detik; backoff = acak(0, base * 2^(n-1))
+    "DB_RETRY_MAX_DELAY": 1.0,     # batas atas satu backoff
+}
+
+RETRYABLE_ERRNOS = {errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT}
+
+# fungsi transactional_retry yang sedang berjalan di konteks ini (nested -> tidak diulang sendiri)
+_active = ContextVar("transactional_retry_active", default=False)
+
+_stats_lock = threading.Lock()
+_stats = {
+    "calls": 0,
+    "retries": 0,
+    "deadlocks": 0,
+    "lock_timeouts": 0,
+    "exhausted": 0,
+    "lock_wait_time": 0.0,  # detik di percobaan yang gagal karena lock
+    "backoff_time": 0.0,    # detik tidur di antara percobaan
+}
+
+
+def _count(**amounts):
+    with _stats_lock:
+        for name, amount in amounts.items():
+            _stats[name] += amount
+
+
+def get_retry_stats():
+    """Counter pengulangan sejak proses berjalan."""
+    with _stats_lock:
+        data = dict(_stats)
+    data["lock_wait_time"] = round(data["lock_wait_time"], 6)
+    data["backoff_time"] = round(data["backoff_time"], 6)
+    return data
+
+
+def _config(key, override):
+    if override is not None:
+        return override
+    if has_app_context():
+        return current_app.config.get(key, RETRY_DEFAULTS[key])
+    return RETRY_DEFAULTS[key]
+
+
+def is_retryable(exc):
+    return isinstance(exc, mysql_errors.Error) and exc.errno in RETRYABLE_ERRNOS
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    """Jitter penuh: acak di antara 0 dan base * 2^(attempt-1), dibatasi max_delay."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+
+
+def _request_unit():
+    if not _request_scoped():
+        return None
+    conn = get_db_connection()
+    return conn if isinstance(conn, RequestConnection) else None
+
+
+def transactional_retry(func=None, *, attempts=None, base_delay=None, max_delay=None):
+    """
+    Dekorator: ulangi seluruh unit of work `func` jika gagal karena deadlock atau
+    lock wait timeout. Error lain (dan percobaan terakhir) dilempar apa adanya.
+
+        @transactional_retry
+        def create_with_items(self, ...): ...
+
+    `func` harus aman diulang: semua efeknya ada di database dan ikut di-rollback.
+    """
+    if func is None:
+        return lambda f: transactional_retry(f, attempts=attempts, base_delay=base_delay, max_delay=max_delay)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _active.get():
+            # sudah di dalam transactional_retry lain: yang luar yang mengulang
+            return func(*args, **kwargs)
+
+        max_attempts = max(1, int(_config("DB_RETRY_ATTEMPTS", attempts)))
+        base = float(_config("DB_RETRY_BASE_DELAY", base_delay))
+        cap = float(_config("DB_RETRY_MAX_DELAY", max_delay))
+
+        unit = _request_unit()
+
+        _count(calls=1)
+        token = _active.set(True)
+        try:
+            attempt = 0
+            while True:
+                attempt += 1
+                started = time.perf_counter()
+                # belum ada tulisan: rollback penuh oleh server tidak membuang apa pun
+                fresh = unit is not None and not unit.wrote and not unit.failed
+                savepoint = unit.savepoint() if unit is not None else None
+                try:
+                    result = func(*args, **kwargs)
+                    if unit is not None:
+                        unit.release_savepoint(savepoint)
+                    return result
+                except Exception as exc:
+                    if unit is not None:
+                        unit.rollback_to(savepoint)
+                        if unit.failed and fresh and is_retryable(exc):
+                            unit.reset()
+                    if not is_retryable(exc):
+                        raise
+                    if unit is not None and unit.failed:
+                        logger.error(
+                            "%s: %s setelah request menulis, transaksi request dibatalkan",
+                            func.__qualname__, exc.msg,
+                        )
+                        raise
+                    waited = time.perf_counter() - started
+                    deadlock = exc.errno == errorcode.ER_LOCK_DEADLOCK
+                    _count(
+                        deadlocks=1 if deadlock else 0,
+                        lock_timeouts=0 if deadlock else 1,
+                        lock_wait_time=waited,
+                    )
+                    if attempt >= max_attempts:
+                        _count(exhausted=1)
+                        record_lock_retry(waited)
+                        logger.error(
+                            "%s gagal setelah %d percobaan (%s)", func.__qualname__, attempt, exc.msg,
+                        )
+                        raise
+                    delay = backoff_delay(attempt, base, cap)
+                    _count(retries=1, backoff_time=delay)
+                    record_lock_retry(waited + delay)
+                    logger.warning(
+                        "%s: %s, ulangi %d/%d dalam %.0fms",
+                        func.__qualname__, "deadlock" if deadlock else "lock wait timeout",
+                        attempt + 1, max_attempts, delay * 1000,
+                    )
+                    time.sleep(delay)
+        finally:
+            _active.reset(token)
+
+    return wrapper
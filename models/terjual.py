@@ -0,0 +1,138 @@
+"""
+Counter jumlah terjual per makanan (kolom Makanan.Terjual).
+
+Terjual = total BanyakPesanan dari pesanan berstatus 'Selesai'. Semua perubahan
+PesananWarung.Status lewat ganti_status(), yang mengubah counter ini di transaksi
+yang sama: +jumlah saat pesanan menjadi Selesai, -jumlah jika pesanan Selesai
+diubah ke status lain. Urutan "terlaris" di home cukup ORDER BY Terjual (index
+idx_makanan_terjual), tanpa SUM atas seluruh tabel Pesanan per request.
+
+Isi awal dihitung oleh migrasi 0006. Selisih yang mungkin muncul (edit manual di
+DB) dicek dan diperbaiki per batch:
+
+    flask --app app terjual check          # laporkan makanan yang counternya meleset
+    flask --app app terjual check --fix    # sekaligus perbaiki (juga untuk backfill)
+"""
+import sys
+
+import click
+from flask.cli import AppGroup
+
+from .db import get_db_connection
+
+STATUS_TERJUAL = "Selesai"
+
+
+def ubah_terjual(cur, id_pesanan, tanda):
+    """
+    Tambah (tanda=1) atau kurangi (tanda=-1) Terjual semua makanan di pesanan ini.
+    Dipanggil dengan cursor transaksi yang sudah mengunci baris PesananWarung-nya.
+    """
+    cur.execute("""
+        UPDATE Makanan m
+        JOIN (
+            SELECT IdMakanan, SUM(BanyakPesanan) AS Jumlah
+            FROM Pesanan
+            WHERE IdPesananWarung=%s
+            GROUP BY IdMakanan
+        ) p ON p.IdMakanan = m.IdMakanan
+        SET m.Terjual = GREATEST(m.Terjual + %s * p.Jumlah, 0)
+    """, (id_pesanan, tanda))
+    return cur.rowcount
+
+
+def kunci_status(cur, id_pesanan):
+    """Status pesanan dengan baris PesananWarung-nya dikunci (FOR UPDATE), atau None."""
+    cur.execute("SELECT Status FROM PesananWarung WHERE IdPesananWarung=%s FOR UPDATE", (id_pesanan,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    return row.get("Status") if isinstance(row, dict) else row[0]
+
+
+def ganti_status(cur, id_pesanan, status_lama, status_baru, **kolom):
+    """
+    Ubah PesananWarung.Status (dan kolom lain di `kolom`, nama kolom dari kode, bukan
+    input user), lalu sesuaikan Terjual jika pesanan masuk / keluar 'Selesai'.
+    status_lama harus dibaca dengan kunci_status() di transaksi yang sama, supaya
+    dua perubahan bersamaan tidak mengubah counter dua kali. Kembalikan rowcount.
+    """
+    kolom = {"Status": status_baru, **kolom}
+    assignments = ", ".join(f"{name}=%s" for name in kolom)
+    cur.execute(
+        f"UPDATE PesananWarung SET {assignments} WHERE IdPesananWarung=%s",
+        (*kolom.values(), id_pesanan),
+    )
+    updated = int(cur.rowcount)
+    if status_lama != STATUS_TERJUAL and status_baru == STATUS_TERJUAL:
+        ubah_terjual(cur, id_pesanan, 1)
+    elif status_lama == STATUS_TERJUAL and status_baru != STATUS_TERJUAL:
+        ubah_terjual(cur, id_pesanan, -1)
+    return updated
+
+
+def periksa_terjual(fix=False, batch=500, echo=print):
+    """
+    Bandingkan Terjual dengan jumlah sebenarnya per batch makanan (keyset by id).
+    Dengan fix, counter yang meleset ditimpa; UPDATE bersyarat nilai lama, jadi
+    pesanan yang selesai di antara baca dan tulis tidak ikut tertimpa (makanan itu
+    dilewati dan terlihat lagi di run berikutnya). Kembalikan (diperiksa, meleset, diperbaiki).
+    """
+    checked = drifted = fixed = 0
+    last_id = 0
+    conn = get_db_connection(autonomous=True)
+    cur = conn.cursor()
+    try:
+        while True:
+            cur.execute("""
+                SELECT m.IdMakanan, m.Terjual,
+                       COALESCE(SUM(CASE WHEN pw.IdPesananWarung IS NOT NULL THEN p.BanyakPesanan END), 0)
+                FROM (
+                    SELECT IdMakanan, Terjual FROM Makanan
+                    WHERE IdMakanan > %s ORDER BY IdMakanan LIMIT %s
+                ) m
+                LEFT JOIN Pesanan p ON p.IdMakanan = m.IdMakanan
+                LEFT JOIN PesananWarung pw
+                    ON pw.IdPesananWarung = p.IdPesananWarung AND pw.Status = %s
+                GROUP BY m.IdMakanan, m.Terjual
+                ORDER BY m.IdMakanan
+            """, (last_id, batch, STATUS_TERJUAL))
+            rows = cur.fetchall()
+            if not rows:
+                break
+            for id_makanan, terjual, seharusnya in rows:
+                checked += 1
+                seharusnya = int(seharusnya)
+                if terjual == seharusnya:
+                    continue
+                drifted += 1
+                echo(f"Makanan {id_makanan}: Terjual {terjual}, seharusnya {seharusnya}")
+                if fix:
+                    cur.execute(
+                        "UPDATE Makanan SET Terjual=%s WHERE IdMakanan=%s AND Terjual=%s",
+                        (seharusnya, id_makanan, terjual),
+                    )
+                    fixed += cur.rowcount
+            conn.commit()
+            last_id = rows[-1][0]
+    finally:
+        cur.close()
+        conn.close()
+    return checked, drifted, fixed
+
+
+terjual_cli = AppGroup("terjual", help="Counter jumlah terjual per makanan.")
+
+
+@terjual_cli.command("check")
+@click.option("--fix", is_flag=True, help="Perbaiki counter yang meleset.")
+@click.option("--batch", type=int, default=500, show_default=True)
+def check_command(fix, batch):
+    checked, drifted, fixed = periksa_terjual(fix=fix, batch=batch, echo=click.echo)
+    click.echo(f"{checked} makanan diperiksa, {drifted} meleset, {fixed} diperbaiki")
+    if drifted > fixed:
+        sys.exit(1)
+
+
+def init_app(app):
+    app.cli.add_command(terjual_cli)
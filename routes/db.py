@@ -1,10 +1,4 @@
-import mysql.connector
-from flask import current_app
+# Routes memakai pool yang sama dengan models; lihat models/db.py
+from models.db import get_db_connection, get_pool_stats
 
-def get_db_connection():
-    return mysql.connector.connect(
-        host=current_app.config['MYSQL_HOST'],
-        user=current_app.config['MYSQL_USER'],
-        password=current_app.config['MYSQL_PASSWORD'],
-        database=current_app.config['MYSQL_DB']
-    )
+__all__ = ["get_db_connection", "get_pool_stats"]
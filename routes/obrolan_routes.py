@@ -1,11 +1,11 @@
 from flask import Blueprint, render_template, session, redirect, url_for, request, jsonify, flash
 from models.Obrolan import Obrolan
-from models.Warung import Warung
 from models.Pengguna import Pengguna
 from models.Pesanan import Pesanan
 from .db import get_db_connection
+from models import fanout
+from models import image_store
 import traceback
-import time
 
 obrolan_bp = Blueprint('obrolan', __name__)
 
@@ -94,13 +94,10 @@ def inbox():
     peran = user.get('Peran')
     user_id = user.get('IdPengguna')
 
-    # 2. Buat Timestamp (Anti-Cache untuk gambar)
-    ts = int(time.time())
-
     daftar_chat_final = []
     raw_data = []
 
-    # 3. Ambil Data Mentah dari Database (Berdasarkan Peran)
+    # 2. Ambil Data Mentah dari Database (Berdasarkan Peran)
     if peran == 'pembeli':
         # Pembeli mengambil daftar chat dengan Warung
         raw_data = Obrolan.ambil_inbox_pembeli(user_id)
@@ -119,7 +116,7 @@ def inbox():
         # Jika peran tidak jelas
         return redirect(url_for('home.home'))
 
-    # 4. PROSES DATA (COOKING TIME!)
+    # 3. PROSES DATA (COOKING TIME!)
     # Kita ubah data mentah menjadi data siap saji untuk HTML
     if raw_data:
         for item in raw_data:
@@ -132,7 +129,7 @@ def inbox():
                 # Maka ambil gambar warung menggunakan 'IdWarung'.
                 # Endpoint: 'warung.warung_image' (sesuaikan jika beda)
                 if 'IdWarung' in item:
-                    chat_item['GambarTampil'] = url_for('warung.warung_image', id_warung=item['IdWarung'], v=ts)
+                    chat_item['GambarTampil'] = image_store.image_url('warung.warung_image', item.get('HashGambar'), id_warung=item['IdWarung'])
                 else:
                     chat_item['GambarTampil'] = None
 
@@ -141,14 +138,14 @@ def inbox():
                 # Maka ambil foto profil user menggunakan 'IdPengguna'.
                 # Endpoint: 'pengguna.get_foto_profil' (sesuai log error Anda sebelumnya)
                 if 'IdPengguna' in item:
-                    chat_item['GambarTampil'] = url_for('pengguna.get_foto_profil', id=item['IdPengguna'], v=ts)
+                    chat_item['GambarTampil'] = image_store.image_url('pengguna.get_foto_profil', item.get('HashGambar'), id=item['IdPengguna'])
                 else:
                     chat_item['GambarTampil'] = None
 
             # Masukkan item yang sudah ada URL gambarnya ke list final
             daftar_chat_final.append(chat_item)
 
-    # 5. Kirim ke HTML
+    # 4. Kirim ke HTML
     # Karena kita pakai kunci 'GambarTampil', HTML Pembeli & Penjual jadi seragam.
     if peran == 'pembeli':
         return render_template('kontakPembeli.html', daftar_chat=daftar_chat_final)
@@ -158,6 +155,18 @@ def inbox():
 # =========================================================
 # 3. ROOM CHAT
 # =========================================================
+# Lawan bicara diambil dari pesan mana pun di ruang itu (IdWarung / IdPengguna sama
+# untuk seluruh ruang), atau dari ?target= jika ruang masih kosong. Tidak perlu
+# menunggu history, jadi bisa dijalankan paralel dengannya.
+SQL_LAWAN_WARUNG = """
+    SELECT IdWarung AS IdTarget, NamaWarung AS Nama FROM Warung
+    WHERE IdWarung = COALESCE((SELECT IdWarung FROM Obrolan WHERE IdRuang = %s LIMIT 1), %s)
+"""
+SQL_LAWAN_PEMBELI = """
+    SELECT IdPengguna AS IdTarget, NamaPengguna AS Nama FROM Pengguna
+    WHERE IdPengguna = COALESCE((SELECT IdPengguna FROM Obrolan WHERE IdRuang = %s LIMIT 1), %s)
+"""
+
 @obrolan_bp.route('/chat/room/<id_ruang>')
 def room_chat(id_ruang):
     if 'user' not in session:
@@ -168,82 +177,36 @@ def room_chat(id_ruang):
     
     # Ambil parameter 'target' dari URL (jika ada)
     target_param = request.args.get('target')
+    id_target = int(target_param) if target_param and target_param.isdigit() else None
 
-    history = Obrolan.get_chat_history(id_ruang)
-    
-    lawan_bicara = {}
-    
-    # --- LOGIKA PENENTUAN LAWAN BICARA ---
-    # Skenario 1: Room Baru (History Kosong) -> Wajib pakai target_param
-    if not history:
-        if not target_param:
-            flash("Chat tidak valid.", "error")
-            return redirect(url_for('obrolan.inbox'))
-            
-        # Set ID lawan dari parameter URL
-        id_lawan = int(target_param)
-        
-        if peran == 'pembeli':
-            # Pembeli ngobrol sama Warung
-            w = Warung().get_by_id(id_lawan)
-            if w:
-                lawan_bicara = {
-                    'nama': w.get_nama_warung(),
-                    # PERUBAHAN DI SINI: Key jadi 'GambarToko'
-                    'GambarToko': url_for('warung.warung_profil_image', id_warung=w.get_id_warung()),
-                    'id_target': w.get_id_warung(),
-                    'tipe_target': 'warung'
-                }
-        else:
-            # Penjual ngobrol sama Pembeli
-            conn = get_db_connection()
-            cur = conn.cursor(dictionary=True)
-            cur.execute("SELECT NamaPengguna, IdPengguna FROM Pengguna WHERE IdPengguna=%s", (id_lawan,))
-            p = cur.fetchone()
-            cur.close()
-            conn.close()
-            if p:
-                lawan_bicara = {
-                    'nama': p['NamaPengguna'],
-                    # PERUBAHAN DI SINI: Key jadi 'GambarToko'
-                    'GambarToko': url_for('pengguna.get_foto_profil', id=p['IdPengguna']),
-                    'id_target': p['IdPengguna'],
-                    'tipe_target': 'pembeli'
-                }
+    sql_lawan = SQL_LAWAN_WARUNG if peran == 'pembeli' else SQL_LAWAN_PEMBELI
+    history, lawan = fanout.fan_out(
+        lambda: Obrolan.get_chat_history(id_ruang),
+        lambda: fanout.query(sql_lawan, (id_ruang, id_target), one=True, readonly=True),
+    )
 
-    # Skenario 2: Room Sudah Ada Chat (History Ada)
-    else:
-        # Ambil info dari pesan terakhir
-        sample = history[0]
-        
-        if peran == 'pembeli':
-            w = Warung().get_by_id(sample.id_warung)
-            if w:
-                lawan_bicara = {
-                    'nama': w.get_nama_warung(),
-                    # PERUBAHAN DI SINI: Key jadi 'GambarToko'
-                    'GambarToko': url_for('warung.warung_profil_image', id_warung=w.get_id_warung()),
-                    'id_target': w.get_id_warung(),
-                    'tipe_target': 'warung'
-                }
-            
-        elif peran == 'penjual':
-            conn = get_db_connection()
-            cur = conn.cursor(dictionary=True)
-            # Asumsi: sample.id_pengguna adalah ID Pembeli
-            cur.execute("SELECT NamaPengguna, IdPengguna FROM Pengguna WHERE IdPengguna=%s", (sample.id_pengguna,))
-            p = cur.fetchone()
-            cur.close()
-            conn.close()
-            
-            if p:
-                lawan_bicara = {
-                    'nama': p['NamaPengguna'],
-                    # PERUBAHAN DI SINI: Key jadi 'GambarToko'
-                    'GambarToko': url_for('pengguna.get_foto_profil', id=p['IdPengguna']),
-                    'id_target': p['IdPengguna'],
-                    'tipe_target': 'pembeli'
-                }
+    # Room Baru (History Kosong) -> Wajib pakai target_param
+    if not history and id_target is None:
+        flash("Chat tidak valid.", "error")
+        return redirect(url_for('obrolan.inbox'))
+
+    lawan_bicara = {}
+    if lawan and peran == 'pembeli':
+        # Pembeli ngobrol sama Warung
+        lawan_bicara = {
+            'nama': lawan['Nama'],
+            'GambarToko': url_for('warung.warung_profil_image', id_warung=lawan['IdTarget']),
+            'id_target': lawan['IdTarget'],
+            'tipe_target': 'warung'
+        }
+    elif lawan:
+        # Penjual ngobrol sama Pembeli
+        lawan_bicara = {
+            'nama': lawan['Nama'],
+            'GambarToko': url_for('pengguna.get_foto_profil', id=lawan['IdTarget']),
+            'id_target': lawan['IdTarget'],
+            'tipe_target': 'pembeli'
+        }
 
     return render_template('ruangObrolan.html', 
                            chats=history, 
@@ -1,6 +1,6 @@
-from flask import Blueprint, render_template, session, redirect, url_for, request, send_file, make_response, abort, current_app, jsonify
-from io import BytesIO
+from flask import Blueprint, render_template, session, redirect, url_for, request, abort, current_app, jsonify
 from models.Pengguna import Pengguna
+from models import image_store
 from .db import get_db_connection
 
 pengguna_bp = Blueprint('pengguna', __name__)
@@ -102,12 +102,18 @@ def editProfil():
         if 'foto_profil' in request.files:
             file = request.files['foto_profil']
             if file.filename != '':
-                gambar_blob = file.read()
+                # stream upload (di-spool ke disk), tidak dibaca utuh ke memori
+                gambar_blob = file.stream
                 mime_type = file.mimetype
 
         # 1. Simpan ke Database
         # Menggunakan method update_profil yang sudah ada di model Anda
-        pengguna.update_profil(gambar_blob, mime_type)
+        try:
+            pengguna.update_profil(gambar_blob, mime_type)
+        except ValueError:
+            # file bukan gambar: simpan data teks saja
+            current_app.logger.warning("Foto profil %s bukan gambar valid", id_pengguna)
+            pengguna.update_profil()
 
         # 2. Update Session (HANYA TEXT, JANGAN GAMBAR)
         # Kita update session agar nama di navbar berubah tanpa relogin
@@ -127,22 +133,12 @@ def editProfil():
 
 @pengguna_bp.route('/foto_profil/<int:id>')
 def get_foto_profil(id):
-    # Logic persis seperti warung_image di warung_routes
-    # Ambil langsung dari DB, streaming binary ke browser
-    gambar_blob, mime_type = Pengguna.ambil_foto_profil(id)
-    
-    if not gambar_blob:
-        # Bisa return gambar default atau 404
+    # Logic persis seperti warung_image di warung_routes:
+    # file dari image_store, dikirim send_file / X-Sendfile
+    resp = image_store.send_image('pengguna', id)
+    if resp is None:
         # Disini kita abort 404, nanti di HTML handle onerror
         abort(404)
-
-    buf = BytesIO(gambar_blob)
-    mime = mime_type or "application/octet-stream"
-    
-    resp = make_response(send_file(buf, mimetype=mime))
-    resp.headers["Content-Length"] = str(len(gambar_blob))
-    resp.headers["Cache-Control"] = "public, max-age=86400"
-
     return resp
 # Menu
 @pengguna_bp.route("/menu")
@@ -12,6 +12,7 @@ from flask import (
 )
 from typing import Dict, Any
 from .db import get_db_connection
+from models import fanout
 from models.Pesanan import (
     Pesanan,
     get_pesanan_by_user,
@@ -19,7 +20,7 @@ from models.Pesanan import (
     fetch_allowed_statuses,
     get_pesanan_for_seller 
 )
-from models.Warung import Warung
+from models.Warung import Warung, KOLOM_RINGKAS as WARUNG_KOLOM_RINGKAS
 
 pesanan_bp = Blueprint("pesanan", __name__)
 
@@ -130,39 +131,34 @@ def detail_pesanan_warung(id_pesanan):
     if 'user' not in session:
         return redirect(url_for('auth.auth_page'))
 
-    conn = get_db_connection()
-    cur = conn.cursor(dictionary=True)
-    
-    # 1. Ambil Data Pesanan & Pembeli
-    cur.execute("""
-        SELECT pw.*, p.NamaPengguna as NamaPembeli, p.nomorTeleponPengguna, 
-               p.Alamat, p.Kordinat, p.Patokan
-        FROM PesananWarung pw
-        JOIN Pengguna p ON pw.IdPembeli = p.IdPengguna
-        WHERE pw.IdPesananWarung = %s
-    """, (id_pesanan,))
-    pesanan = cur.fetchone()
+    # Ketiga query hanya bergantung pada id_pesanan -> dijalankan paralel
+    pesanan, warung_data, items = fanout.fan_out(
+        # 1. Ambil Data Pesanan & Pembeli
+        lambda: fanout.query("""
+            SELECT pw.*, p.NamaPengguna as NamaPembeli, p.nomorTeleponPengguna, 
+                   p.Alamat, p.Kordinat, p.Patokan
+            FROM PesananWarung pw
+            JOIN Pengguna p ON pw.IdPembeli = p.IdPengguna
+            WHERE pw.IdPesananWarung = %s
+        """, (id_pesanan,), one=True),
+        # 2. Ambil Data Warung
+        # Kita butuh data ini karena HTML memanggil {{ warung.IdWarung }} untuk gambar profil
+        lambda: fanout.query(f"""
+            SELECT {WARUNG_KOLOM_RINGKAS} FROM Warung
+            WHERE IdWarung = (SELECT IdWarung FROM PesananWarung WHERE IdPesananWarung = %s)
+        """, (id_pesanan,), one=True),
+        # 3. Ambil Item Makanan
+        lambda: fanout.query("""
+            SELECT dp.*, m.NamaMakanan, m.HashGambarMakanan IS NOT NULL AS AdaGambar
+            FROM Pesanan dp
+            JOIN Makanan m ON dp.IdMakanan = m.IdMakanan
+            WHERE dp.IdPesananWarung = %s
+        """, (id_pesanan,)),
+    )
 
     if not pesanan:
-        cur.close(); conn.close()
         abort(404)
 
-    # === BAGIAN PENTING YANG DITAMBAHKAN ===
-    # 2. Ambil Data Warung
-    # Kita butuh data ini karena HTML memanggil {{ warung.IdWarung }} untuk gambar profil
-    cur.execute("SELECT * FROM Warung WHERE IdWarung = %s", (pesanan['IdWarung'],))
-    warung_data = cur.fetchone()
-    # =======================================
-
-    # 3. Ambil Item Makanan
-    cur.execute("""
-        SELECT dp.*, m.NamaMakanan, m.GambarMakanan
-        FROM Pesanan dp
-        JOIN Makanan m ON dp.IdMakanan = m.IdMakanan
-        WHERE dp.IdPesananWarung = %s
-    """, (id_pesanan,))
-    items = cur.fetchall()
-
     # --- HITUNG TOTAL ITEM DI SINI ---
     total_item = 0
     for i in items:
@@ -170,15 +166,7 @@ def detail_pesanan_warung(id_pesanan):
         total_item += i['BanyakPesanan']
     
     # Masukkan ke variabel pesanan agar bisa dipanggil di HTML
-    # Pastikan variabel 'pesanan' sudah didefinisikan sebelumnya (dari query Header)
-    if pesanan:
-        pesanan['TotalItem'] = total_item
-
-    cur.close()
-    conn.close()
-
-    cur.close()
-    conn.close()
+    pesanan['TotalItem'] = total_item
 
     status = pesanan['Status']
 
@@ -7,18 +7,15 @@ from flask import (
     url_for,
     abort,
     current_app,
-    send_file,
-    make_response,
     request,
     flash,
     jsonify,
 )
 import json
-import time
 from datetime import datetime, timedelta
-from io import BytesIO
-from models.Warung import Warung
+from models.Warung import Warung, KOLOM_RINGKAS as WARUNG_KOLOM_RINGKAS
 from models.Makanan import Makanan
+from models import image_jobs, image_store
 from .db import get_db_connection
 from models.Laporan import ItemLaporan, Laporan
 
@@ -67,7 +64,7 @@ def require_penjual():
     cur = conn.cursor(dictionary=True)
     try:
         cur.execute(
-            "SELECT * FROM Warung WHERE IdPenjual=%s LIMIT 1",
+            f"SELECT {WARUNG_KOLOM_RINGKAS} FROM Warung WHERE IdPenjual=%s LIMIT 1",
             (user_id,)
         )
         warung = cur.fetchone()
@@ -111,7 +108,7 @@ def home_warung():
     try:
         cur.execute("""
             SELECT IdWarung, NamaWarung, AlamatWarung, Rating, 
-                   GambarWarung, KordinatWarung
+                   HashGambarWarung IS NOT NULL AS AdaGambar, KordinatWarung
             FROM Warung
             WHERE IdPenjual=%s LIMIT 1
         """, (id_penjual,))
@@ -124,26 +121,7 @@ def home_warung():
         id_warung = warung_data['IdWarung']
 
         try:
-            makanan_db_list = Makanan().get_by_warung(id_warung) or []
-            
-            for m in makanan_db_list:
-                gambar = None
-                if m.get_gambar_makanan():
-                    if "warung.makanan_image" in current_app.view_functions:
-                        gambar = url_for("warung.makanan_image", id_m=m.get_id_makanan())
-                    else:
-                        gambar = url_for("home.makanan_gambar", id_makanan=m.get_id_makanan())
-                else:
-                    gambar = url_for('static', filename='img/noimage.png')
-
-                makanan_data.append({
-                    "IdMakanan": m.get_id_makanan(),
-                    "NamaMakanan": m.get_nama_makanan(),
-                    "HargaMakanan": m.get_harga_makanan(),
-                    "DetailMakanan": m.get_deskripsi_makanan(),
-                    "Stok": m.get_stok_makanan(),
-                    "GambarMakanan": gambar
-                })
+            makanan_data = Makanan.get_menu_warung(id_warung)
         except Exception as e:
             current_app.logger.warning(f"Gagal memuat list makanan: {e}")
         try:
@@ -228,27 +206,18 @@ def warung_detail(id_warung):
     if not warung_obj:
         abort(404)
 
-    # 3. Ambil Data Makanan
+    # 3. Ambil Data Makanan (MakananItem, langsung dipakai template)
     try:
-        makanan_db_list = Makanan().get_by_warung(id_warung) or []
+        makanan_data = Makanan.get_menu_warung(id_warung)
     except Exception:
-        makanan_db_list = []
-
-    # --- SETUP TIMESTAMP UNTUK CACHE BUSTING ---
-    # Kita buat satu angka waktu unik untuk request ini
-    ts = int(time.time()) 
-    # -------------------------------------------
+        makanan_data = []
 
     # 4. Format Data Warung (Untuk HTML)
     gambar_warung_url = None
-    if warung_obj.get_gambar_warung():
-        # Cek route mana yang tersedia untuk gambar
-        if "warung.warung_image" in current_app.view_functions:
-            # PERHATIKAN: Saya menambahkan parameter v=ts di sini
-            gambar_warung_url = url_for("warung.warung_image", id_warung=warung_obj.get_id_warung(), v=ts)
-        else:
-            # Di sini juga ditambahkan v=ts
-            gambar_warung_url = url_for("home.warung_gambar", id_warung=warung_obj.get_id_warung(), v=ts)
+    if warung_obj.has_gambar_warung():
+        # Cek route mana yang tersedia untuk gambar; v=hash gambar (berubah hanya saat gambar diganti)
+        endpoint = "warung.warung_image" if "warung.warung_image" in current_app.view_functions else "home.warung_gambar"
+        gambar_warung_url = image_store.image_url(endpoint, warung_obj.get_hash_gambar(), id_warung=warung_obj.get_id_warung())
 
     warung_data = {
         "IdWarung": warung_obj.get_id_warung(),
@@ -257,32 +226,11 @@ def warung_detail(id_warung):
         "AlamatWarung": warung_obj.get_alamat_warung(),
         "Rating": warung_obj.get_rating_warung(),
         "GambarToko": gambar_warung_url, 
+        "LqipToko": warung_obj.get_lqip_gambar(),
         "Kordinat": warung_obj.get_kordinat_warung() if hasattr(warung_obj, "get_kordinat_warung") else None
     }
 
-    # 5. Format Data Makanan List (Untuk Loop di HTML)
-    makanan_data = []
-    for m in makanan_db_list:
-        # Generate URL Gambar Makanan
-        gambar_makanan_url = None
-        if m.get_gambar_makanan():
-            if "warung.makanan_image" in current_app.view_functions:
-                # PERHATIKAN: Saya menambahkan parameter v=ts di sini juga
-                gambar_makanan_url = url_for("warung.makanan_image", id_m=m.get_id_makanan(), v=ts)
-            else:
-                gambar_makanan_url = url_for("home.makanan_gambar", id_makanan=m.get_id_makanan(), v=ts)
-        
-        # Masukkan ke list dictionary
-        makanan_data.append({
-            "IdMakanan": m.get_id_makanan(),
-            "NamaMakanan": m.get_nama_makanan(),
-            "HargaMakanan": m.get_harga_makanan(),
-            "DetailMakanan": m.get_deskripsi_makanan(),
-            "Stok": m.get_stok_makanan(),
-            "GambarMakanan": gambar_makanan_url
-        })
-
-    # 6. Render Template
+    # 5. Render Template
     return render_template("warung.html", warung=warung_data, makanan_list=makanan_data)
 
 @warung_bp.route("/makanan/<int:id_m>")
@@ -303,7 +251,7 @@ def makanan_detail(id_m):
 
 
     try:
-        if m.get_gambar_makanan():
+        if m.has_gambar():
             makanan_data["GambarMakanan"] = url_for("warung.makanan_image", id_m=m.get_id_makanan())
         else:
             makanan_data["GambarMakanan"] = url_for('static', filename='img/noimage.png') 
@@ -316,40 +264,45 @@ def makanan_detail(id_m):
 
 @warung_bp.route("/makanan/gambar/<int:id_m>")
 def makanan_image(id_m):
-    m = Makanan().get_by_id(id_m)
-    if not m or not m.get_gambar_makanan():
-        abort(404)
-    try:
-        img_bytes = m.get_gambar_makanan()
-        buf = BytesIO(img_bytes)
-        mime = getattr(m, "get_mime_gambar", lambda: None)() or "application/octet-stream"
-        resp = make_response(send_file(buf, mimetype=mime))
-        size = getattr(m, "get_size_gambar", lambda: None)() or len(img_bytes)
-        resp.headers["Content-Length"] = str(size)
-        resp.headers["Cache-Control"] = "public, max-age=86400"
-        return resp
-    except Exception:
-        current_app.logger.exception("Gagal kirim gambar makanan")
-        abort(404)
+    resp = image_store.send_image("makanan", id_m)
+    if resp is None:
+        return image_store.placeholder_redirect()
+    return resp
 
 
 @warung_bp.route("/warung/gambar/<int:id_warung>")
 def warung_image(id_warung):
-    w = Warung().get_by_id(id_warung)
-    if not w or not w.get_gambar_warung():
-        abort(404)
-    try:
-        img_bytes = w.get_gambar_warung()
-        buf = BytesIO(img_bytes)
-        mime = getattr(w, "get_mime_gambar", lambda: None)() or "application/octet-stream"
-        resp = make_response(send_file(buf, mimetype=mime))
-        size = getattr(w, "get_size_gambar", lambda: None)() or len(img_bytes)
-        resp.headers["Content-Length"] = str(size)
-        resp.headers["Cache-Control"] = "public, max-age=86400"
-        return resp
-    except Exception:
-        current_app.logger.exception("Gagal kirim gambar warung")
+    resp = image_store.send_image("warung", id_warung)
+    if resp is None:
         abort(404)
+    return resp
+
+
+# endpoint gambar per jenis job, untuk URL hasil optimasi
+_JOB_IMAGE_ENDPOINTS = {
+    "makanan": ("warung.makanan_image", "id_m"),
+    "warung": ("warung.warung_image", "id_warung"),
+    "pengguna": ("pengguna.get_foto_profil", "id"),
+}
+
+
+@warung_bp.route("/warung/gambar/job/<int:id_job>")
+def gambar_job_status(id_job):
+    """Status optimasi gambar upload (di-poll templates/gambarJob.html)."""
+    if "user" not in session:
+        return jsonify({"error": "unauthorized"}), 401
+    job = image_jobs.job_status(id_job)
+    # job untuk baris milik orang lain diperlakukan seperti tidak ada
+    if not job or image_jobs.job_owner(job) != _get_session_user_id():
+        return jsonify({"error": "not found"}), 404
+    gambar = None
+    if job["Status"] == "selesai" and job["Jenis"] in _JOB_IMAGE_ENDPOINTS:
+        endpoint, arg = _JOB_IMAGE_ENDPOINTS[job["Jenis"]]
+        gambar = image_store.image_url(endpoint, job["HashHasil"], **{arg: job["IdObjek"]})
+    return jsonify({
+        "id_job": job["IdJob"], "status": job["Status"], "pesan": job["Pesan"], "gambar": gambar,
+        "hash_asli": job["HashAsli"], "hash_hasil": job["HashHasil"],
+    })
 
 
 @warung_bp.route("/warung/daftar", methods=["GET"])
@@ -385,16 +338,12 @@ def daftar_warung_submit():
     file = request.files.get("gambar")
     if file and file.filename:
         try:
-            file_bytes = file.read()
-            if file_bytes:
-                try:
-                    w.set_gambar_from_upload(file_bytes, save_to_db=False) # Jangan save ke DB dulu karena ID belum ada
-                except Exception:
-                    # Fallback manual jika method helper gagal/beda nama
-                    try:
-                        w._gambar_warung = file_bytes
-                    except Exception:
-                        pass
+            # stream upload (di-spool ke disk oleh werkzeug), tidak dibaca utuh ke memori
+            try:
+                w.set_gambar_from_upload(file.stream, save_to_db=False) # Jangan save ke DB dulu karena ID belum ada
+            except ValueError:
+                # bukan gambar / resolusi terlalu besar: jangan simpan bytes mentah
+                flash("File gambar tidak valid, warung disimpan tanpa gambar.", "warning")
         except Exception:
             current_app.logger.warning("Gagal membaca file gambar", exc_info=True)
 
@@ -407,19 +356,13 @@ def daftar_warung_submit():
             conn = get_db_connection()
             cur = conn.cursor()
             try:
+                conn.start_transaction()
                 # Update kolom tambahan
                 cur.execute(
                     "UPDATE Warung SET JamBuka=%s, JamTutup=%s, KordinatWarung=%s WHERE IdWarung=%s",
                     (jam_buka, jam_tutup, kordinat, new_id),
                 )
-                
-                # Jika gambar diset di object tapi belum tersimpan (karena save_new mungkin tidak include blob di insert pertama)
-                # Kita pastikan update gambar di sini
-                if w.get_gambar_warung():
-                     cur.execute(
-                        "UPDATE Warung SET GambarWarung=%s WHERE IdWarung=%s",
-                        (w.get_gambar_warung(), new_id)
-                     )
+                # gambar sudah tersimpan (image_store + HashGambarWarung) oleh save_new()
 
                 conn.commit()
             except Exception:
@@ -433,6 +376,7 @@ def daftar_warung_submit():
         conn = get_db_connection()
         cur = conn.cursor()
         try:
+            conn.start_transaction()
             cur.execute("UPDATE Pengguna SET Peran=%s WHERE IdPengguna=%s", ("penjual", user_id))
             conn.commit()
 
@@ -483,8 +427,9 @@ def warung_search():
                 order_dir = "DESC" if sort == "sold_high" else "ASC"
                 sql = f"""
                     SELECT w.IdWarung, w.IdPenjual, w.NamaWarung, w.AlamatWarung,
-                           w.NomorTeleponWarung, w.GambarWarung, w.Rating, w.KordinatWarung,
-                           w.MimeGambarWarung, w.SizeGambarWarung,
+                           w.NomorTeleponWarung, w.Rating, w.KordinatWarung, w.JamBuka, w.JamTutup,
+                           w.MimeGambarWarung, w.SizeGambarWarung, w.HashGambarWarung,
+                           w.HashGambarWarung IS NOT NULL AS AdaGambar,
                            COALESCE(s.total_sold, 0) AS total_sold
                     FROM Warung w
                     LEFT JOIN (
@@ -499,18 +444,7 @@ def warung_search():
                 cur.execute(sql, (per_page, offset))
                 rows = cur.fetchall() or []
                 for row in rows:
-                    w = Warung(
-                        id_warung=row.get("IdWarung"),
-                        id_penjual=row.get("IdPenjual"),
-                        nama_warung=row.get("NamaWarung"),
-                        alamat_warung=row.get("AlamatWarung"),
-                        nomor_telepon_warung=row.get("NomorTeleponWarung"),
-                        gambar_warung=row.get("GambarWarung"),
-                        rating_warung=row.get("Rating") or 0.0,
-                        kordinat_warung=row.get("KordinatWarung"),
-                        mime_gambar=row.get("MimeGambarWarung"),
-                        size_gambar=row.get("SizeGambarWarung"),
-                    )
+                    w = Warung._dari_row(row)
                     setattr(w, "_total_sold", row.get("total_sold", 0))
                     results.append(w)
             except Exception:
@@ -543,7 +477,7 @@ def warung_search():
     for w in results:
         try:
             gambar = None
-            if getattr(w, "get_gambar_warung", None) and w.get_gambar_warung():
+            if w.has_gambar_warung():
                 if "warung.warung_image" in current_app.view_functions:
                     gambar = url_for("warung.warung_image", id_warung=w.get_id_warung())
                 elif "home.warung_gambar" in current_app.view_functions:
@@ -582,7 +516,7 @@ def makanan_edit(id_m):
     if request.method == "GET":
         # Siapkan URL Gambar agar preview muncul
         gambar_url = url_for('static', filename='img/noimage.png')
-        if m.get_gambar_makanan():
+        if m.has_gambar():
              # Sesuaikan dengan nama fungsi endpoint gambar Anda
              if "warung.makanan_image" in current_app.view_functions:
                 gambar_url = url_for("warung.makanan_image", id_m=m.get_id_makanan())
@@ -620,16 +554,11 @@ def makanan_edit(id_m):
 
         # Update Gambar (Jika user upload gambar baru)
         if file and file.filename:
-            data = file.read()
             try:
-                m.set_gambar_from_upload(data, save_to_db=True)
-            except Exception:
-                try:
-                    m.set_gambar_makanan(data)
-                    # Perlu save manual jika set_gambar_makanan tidak auto-save
-                    # m.save_update() 
-                except Exception:
-                    pass
+                m.set_gambar_from_upload(file.stream, save_to_db=True)
+            except ValueError:
+                # bukan gambar / resolusi terlalu besar: jangan simpan bytes mentah
+                flash("File gambar tidak valid, gambar tidak diubah.", "warning")
         
         # Update Rating Warung (Opsional)
         w = Warung().get_by_id(m.get_id_warung())
@@ -775,11 +704,11 @@ def makanan_tambah(id_warung):
     if not warung_obj:
         abort(404)
 
-    # 3. Ambil Data Makanan
+    # 3. Ambil Data Makanan (MakananItem, langsung dipakai template)
     try:
-        makanan_db_list = Makanan().get_by_warung(id_warung) or []
+        makanan_data = Makanan.get_menu_warung(id_warung)
     except Exception:
-        makanan_db_list = []
+        makanan_data = []
 
     # 4. Format Data Warung (Untuk HTML)
     # Kita rapikan logika URL gambar disini agar HTML tinggal pakai
@@ -801,28 +730,7 @@ def makanan_tambah(id_warung):
         "Kordinat": warung_obj.get_kordinat_warung() if hasattr(warung_obj, "get_kordinat_warung") else None
     }
 
-    # 5. Format Data Makanan List (Untuk Loop di HTML)
-    makanan_data = []
-    for m in makanan_db_list:
-        # Generate URL Gambar Makanan
-        gambar_makanan_url = None
-        if m.get_gambar_makanan():
-            if "warung.makanan_image" in current_app.view_functions:
-                gambar_makanan_url = url_for("warung.makanan_image", id_m=m.get_id_makanan())
-            else:
-                gambar_makanan_url = url_for("home.makanan_gambar", id_makanan=m.get_id_makanan())
-        
-        # Masukkan ke list dictionary
-        makanan_data.append({
-            "IdMakanan": m.get_id_makanan(),
-            "NamaMakanan": m.get_nama_makanan(),
-            "HargaMakanan": m.get_harga_makanan(),
-            "DetailMakanan": m.get_deskripsi_makanan(),
-            "Stok": m.get_stok_makanan(),
-            "GambarMakanan": gambar_makanan_url # URL siap pakai
-        })
-
-    # 6. Render Template
+    # 5. Render Template
     # Mengirim 'warung' (dict) dan 'makanan_list' (list of dicts)
     return render_template("tambahMakananWarung.html", warung=warung_data, makanan_list=makanan_data)
 
@@ -889,17 +797,12 @@ def tambah_makanan_submit():
 
         # 4. Handle Gambar (Logic Try-Except Bertingkat dari referensi)
         if file and file.filename:
-            data = file.read()
             try:
-                # Prioritas 1: Upload dengan resize/format (jika method ada)
-                m.set_gambar_from_upload(data, save_to_db=True)
-            except Exception:
-                # Prioritas 2: Fallback ke simpan blob raw
-                try:
-                    m.set_gambar_makanan(data)
-                    m.save_update() # Update record yang baru dibuat
-                except Exception:
-                    pass
+                # Upload lewat pipeline gambar (stream, resize/format, MIME dari isi file)
+                m.set_gambar_from_upload(file.stream, save_to_db=True)
+            except ValueError:
+                # bukan gambar / resolusi terlalu besar: jangan simpan bytes mentah
+                flash("File gambar tidak valid, menu disimpan tanpa gambar.", "warning")
         
         # 5. Update Rating Warung
         try:
@@ -977,7 +880,9 @@ def edit_profil_warung():
     # === [GET] TAMPILKAN FORM ===
     if request.method == 'GET':
         # Inject URL gambar untuk HTML (agar bisa pakai warung.GambarToko)
-        warung_data['GambarToko'] = url_for('warung.warung_profil_image', id_warung=warung_data['IdWarung'])
+        warung_data['GambarToko'] = image_store.image_url(
+            'warung.warung_profil_image', warung_data.get('HashGambarWarung'), id_warung=warung_data['IdWarung']
+        )
         return render_template('editProfilWarung.html', warung=warung_data)
 
     # === [POST] PROSES DATA ===
@@ -994,18 +899,15 @@ def edit_profil_warung():
 
     # B. Handle File Gambar (Hanya baca & set ke object, JANGAN save ke DB dulu)
     file = request.files.get('gambar')
-    ada_gambar_baru = False # Flag penanda
 
     if file and file.filename:
         try:
-            data_gambar = file.read()
-            # Set ke memori object saja (save_to_db=False)
+            # Masuk image_store dari stream upload; baris DB diupdate nanti (save_to_db=False)
             try:
-                w.set_gambar_from_upload(data_gambar, save_to_db=False)
-            except:
-                w.set_gambar_warung(data_gambar)
-            
-            ada_gambar_baru = True
+                w.set_gambar_from_upload(file.stream, save_to_db=False)
+            except ValueError:
+                # bukan gambar / resolusi terlalu besar: jangan simpan bytes mentah
+                flash("File gambar tidak valid, gambar tidak diubah.", "warning")
         except Exception as e:
             current_app.logger.error(f"Gagal membaca file gambar: {e}")
 
@@ -1016,20 +918,14 @@ def edit_profil_warung():
     conn = get_db_connection()
     cur = conn.cursor()
     try:
+        conn.start_transaction()
         # 1. Update Jam Buka & Tutup
         cur.execute(
             "UPDATE Warung SET JamBuka=%s, JamTutup=%s WHERE IdWarung=%s", 
             (jam_buka or None, jam_tutup or None, w.get_id_warung())
         )
+        # 2. Gambar baru sudah tersimpan (image_store + HashGambarWarung) oleh save_update()
 
-        # 2. Update Gambar (Hanya jika ada upload baru)
-        # Logika ini sama persis dengan potongan kode pendaftaran yang Anda kirim
-        if ada_gambar_baru and w.get_gambar_warung():
-             cur.execute(
-                "UPDATE Warung SET GambarWarung=%s WHERE IdWarung=%s",
-                (w.get_gambar_warung(), w.get_id_warung())
-             )
-        
         conn.commit()
     except Exception as e:
         conn.rollback()
@@ -1044,16 +940,9 @@ def edit_profil_warung():
 
 @warung_bp.route('/warung/foto_profil/<int:id_warung>')
 def warung_profil_image(id_warung):
-    w = Warung().get_by_id(id_warung)
-    if not w or not w.get_gambar_warung():
+    resp = image_store.send_image("warung", id_warung, default_mime="image/jpeg")
+    if resp is None:
         return redirect(url_for('static', filename='img/noimage.png'))
-
-    img_bytes = w.get_gambar_warung()
-    buf = BytesIO(img_bytes)
-    mime = getattr(w, "get_mime_gambar", lambda: None)() or "image/jpeg"
-
-    resp = make_response(send_file(buf, mimetype=mime))
-    resp.headers["Cache-Control"] = "public, max-age=86400"
     return resp
 
 
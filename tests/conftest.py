@@ -0,0 +1,135 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import query_stats  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    """App Flask minimal dengan instrumentasi SQL; tidak butuh MySQL."""
+    app = Flask(__name__)
+    app.config.update(TESTING=True, SECRET_KEY="test")
+    query_stats.init_app(app)
+    return app
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Batas jumlah query untuk sebuah blok; test gagal (bukan error) jika terlampaui:
+
+        def test_menu(query_budget):
+            with query_budget(2):
+                Makanan().get_by_ids([1, 2, 3])
+    """
+    @contextmanager
+    def budget(max_queries, include_commit=False):
+        try:
+            with query_stats.query_budget(max_queries, include_commit=include_commit) as executed:
+                yield executed
+        except query_stats.QueryBudgetExceeded as e:
+            pytest.fail(str(e), pytrace=False)
+
+    return budget
+
+
+class FakeCursor:
+    """Cursor tanpa database: execute() dicatat, fetch* mengembalikan `rows`."""
+
+    def __init__(self, rows=None):
+        self.rows = list(rows or [])
+        self.executed = []
+        self.rowcount = 0
+        self.lastrowid = None
+
+    def execute(self, operation, params=None):
+        self.executed.append((operation, params))
+        if operation.lstrip().upper().startswith("INSERT"):
+            self.lastrowid = len(self.executed)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Koneksi palsu yang memberi InstrumentedCursor, jadi query ikut dihitung query_budget."""
+
+    def __init__(self, rows=None):
+        self.rows = rows
+        self.cursors = []
+        self.log = []  # "COMMIT" / "ROLLBACK"
+        self.in_transaction = False
+
+    def cursor(self, *args, **kwargs):
+        cur = FakeCursor(self.rows)
+        self.cursors.append(cur)
+        return query_stats.instrument_cursor(cur)
+
+    def executed(self):
+        return [sql for cur in self.cursors for sql, _ in cur.executed]
+
+    def start_transaction(self, *args, **kwargs):
+        self.in_transaction = True
+
+    def commit(self):
+        self.log.append("COMMIT")
+        self.in_transaction = False
+
+    def rollback(self):
+        self.log.append("ROLLBACK")
+        self.in_transaction = False
+
+    def close(self):
+        pass
+
+
+class FakePool:
+    """Pengganti ConnectionPool: acquire() selalu memberi FakeConnection yang sama."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def acquire(self):
+        return self.conn
+
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    """
+    Pasang FakeConnection sebagai pool MySQL `app`; get_db_connection() dan unit of
+    work request berjalan seperti biasa di atasnya:
+
+        conn = fake_pool(app, rows=[...])
+        client.post("/keranjang/tambah", json={...})
+        assert conn.log == ["COMMIT"]
+    """
+    def install(app, rows=None):
+        conn = FakeConnection(rows)
+        monkeypatch.setitem(app.extensions, "mysql_pool", FakePool(conn))
+        monkeypatch.setitem(app.extensions, "mysql_replica_pool", False)
+        return conn
+
+    return install
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Pasang FakeConnection sebagai get_db_connection di modul yang diberikan."""
+    def install(module, rows=None):
+        conn = FakeConnection(rows)
+        monkeypatch.setattr(module, "get_db_connection", lambda *a, **kw: conn)
+        return conn
+
+    return install
@@ -0,0 +1,71 @@
+"""
+Harness EXPLAIN di pytest. plan_problems() dites tanpa database; test_plan_baseline
+menjalankan seluruh SCENARIOS (seperti `flask db explain --seed`) dan hanya jalan
+jika MYSQL_DB menunjuk database scratch yang bisa dihubungi, misalnya:
+
+    MYSQL_DB=eatrush_explain python -m pytest tests/test_explain_plans.py
+"""
+import pytest
+from mysql.connector import errors as mysql_errors
+
+from models import explain_check, migrations
+
+
+def plan_problems(plan):
+    return explain_check.plan_problems(plan, explain_check.LARGE_ROWS_DEFAULT)
+
+
+def test_full_scan_on_large_table_is_a_problem():
+    plan = [{"select_type": "SIMPLE", "table": "Makanan", "type": "ALL", "rows": 3000, "Extra": None}]
+    assert plan_problems(plan) == ["full table scan Makanan (~3000 baris)"]
+
+
+def test_small_table_scan_and_index_lookup_pass():
+    plan = [
+        {"select_type": "SIMPLE", "table": "Warung", "type": "ALL", "rows": 60, "Extra": "Using filesort"},
+        {"select_type": "SIMPLE", "table": "Makanan", "type": "ref", "key": "idx_makanan_warung", "rows": 50},
+    ]
+    assert plan_problems(plan) == []
+
+
+def test_filesort_full_index_scan_and_dependent_subquery():
+    plan = [
+        {"select_type": "PRIMARY", "table": "PesananWarung", "type": "index", "key": "PRIMARY",
+         "rows": 6000, "Extra": "Using filesort"},
+        {"select_type": "DEPENDENT SUBQUERY", "table": "Pesanan", "type": "ref", "rows": 3},
+    ]
+    assert plan_problems(plan) == [
+        "full index scan PesananWarung via PRIMARY (~6000 baris)",
+        "filesort PesananWarung (~6000 baris)",
+        "DEPENDENT SUBQUERY pada Pesanan",
+    ]
+
+
+def test_substring_search_is_allowed():
+    assert explain_check._allowed("SELECT ... WHERE NamaMakanan LIKE ?")
+    assert explain_check._allowed("SELECT ... FROM Makanan WHERE IdWarung=?") is None
+
+
+@pytest.fixture
+def scratch_app():
+    from app import app
+
+    if not explain_check._is_scratch_db(app.config.get("MYSQL_DB")):
+        pytest.skip("MYSQL_DB bukan database scratch (test/explain/scratch); harness EXPLAIN dilewati")
+    try:
+        with app.app_context():
+            migrations.upgrade(echo=lambda *a: None)
+    except mysql_errors.Error as e:
+        pytest.skip(f"MySQL tidak tersedia: {e}")
+    return app
+
+
+def test_plan_baseline(scratch_app):
+    with scratch_app.app_context():
+        findings, checked = explain_check.run(scratch_app, do_seed=True, echo=lambda *a: None)
+    assert checked > 0
+    failed = [f for f in findings if not f["allowed"]]
+    assert not failed, "rencana query bermasalah:\n" + "\n".join(
+        f"  {f['key'][:200]}: {'; '.join(f['problems'])} (dari {', '.join(f['sources'][:3])})"
+        for f in failed
+    )
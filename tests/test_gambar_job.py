@@ -0,0 +1,51 @@
+import pytest
+
+from models import image_jobs
+
+
+@pytest.fixture
+def client(monkeypatch):
+    from app import app
+
+    app.config.update(TESTING=True)
+    job = {"IdJob": 7, "Jenis": "makanan", "IdObjek": 3, "Status": "selesai",
+           "HashAsli": "a" * 64, "HashHasil": "b" * 64, "Pesan": None}
+    monkeypatch.setattr(image_jobs, "job_status", lambda id_job: job if id_job == 7 else None)
+    monkeypatch.setattr(image_jobs, "job_owner", lambda j: 42)
+    with app.test_client() as client:
+        yield client
+
+
+def _login(client, id_pengguna):
+    with client.session_transaction() as sess:
+        sess["user"] = {"IdPengguna": id_pengguna, "Peran": "penjual"}
+
+
+def test_job_status_for_owner(client):
+    _login(client, 42)
+    res = client.get("/warung/gambar/job/7")
+    assert res.status_code == 200
+    data = res.get_json()
+    assert data["status"] == "selesai"
+    assert data["hash_hasil"] == "b" * 64
+    assert "v=" + "b" * 64 in data["gambar"]
+
+
+def test_job_status_hidden_from_other_users(client):
+    _login(client, 99)
+    assert client.get("/warung/gambar/job/7").status_code == 404
+
+
+def test_job_status_requires_login(client):
+    assert client.get("/warung/gambar/job/7").status_code == 401
+
+
+def test_remembered_jobs_are_taken_once(client):
+    from flask import render_template_string
+
+    with client.application.test_request_context():
+        image_jobs.remember_job(5)
+        image_jobs.remember_job(None)
+        html = render_template_string('{% include "gambarJob.html" %}')
+        assert "[5].forEach" in html
+        assert render_template_string('{% include "gambarJob.html" %}').strip() == ""
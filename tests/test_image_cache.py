@@ -0,0 +1,55 @@
+from models import image_cache
+from models.image_cache import ByteLRU
+
+
+def test_evicts_least_recently_used():
+    lru = ByteLRU(10)
+    lru.put("a", b"aaaa", 4)
+    lru.put("b", b"bbbb", 4)
+    assert lru.get("a") == b"aaaa"  # a jadi yang terbaru
+    lru.put("c", b"cccc", 4)
+    assert lru.get("b") is None
+    assert lru.get("a") == b"aaaa"
+    assert lru.get("c") == b"cccc"
+    assert lru.stats()["evictions"] == 1
+    assert lru.stats()["bytes"] == 8
+
+
+def test_item_larger_than_cache_is_not_stored():
+    lru = ByteLRU(10)
+    lru.put("a", b"a", 1)
+    lru.put("big", b"x" * 11, 11)
+    assert lru.get("big") is None
+    assert lru.get("a") == b"a"
+
+
+def test_replacing_key_keeps_byte_count():
+    lru = ByteLRU(10)
+    lru.put("a", b"aaaa", 4)
+    lru.put("a", b"aa", 2)
+    assert lru.get("a") == b"aa"
+    assert lru.stats()["bytes"] == 2
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(image_cache.time, "monotonic", lambda: now[0])
+    lru = ByteLRU(100)
+    lru.put("miss", True, 1, ttl=30)
+    lru.put("info", ("ab", "image/webp"), 1)
+    now[0] += 29
+    assert lru.get("miss") is True
+    now[0] += 2
+    assert lru.get("miss") is None
+    assert lru.get("info") == ("ab", "image/webp")  # tanpa ttl tidak kedaluwarsa
+    assert lru.stats()["entries"] == 1
+    assert lru.stats()["bytes"] == 1
+
+
+def test_discard_by_key():
+    lru = ByteLRU(100)
+    lru.put(("info", "makanan", 1), "x", 1)
+    lru.put(("info", "makanan", 2), "y", 1)
+    lru.discard(lambda key: key[2] == 1)
+    assert lru.get(("info", "makanan", 1)) is None
+    assert lru.get(("info", "makanan", 2)) == "y"
@@ -0,0 +1,58 @@
+from concurrent.futures import Future
+
+from models import image_jobs
+
+
+class FakePool:
+    def __init__(self):
+        self.calls = []
+        self.futures = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.calls.append((fn, args, kwargs))
+        future = Future()
+        self.futures.append(future)
+        return future
+
+
+def test_submit_variants_queues_each_digest_once(app, monkeypatch, tmp_path):
+    app.config.update(IMAGE_WORKERS=1, IMAGE_STORE_DIR=str(tmp_path))
+    pool = FakePool()
+    monkeypatch.setattr(image_jobs, "_executors", lambda app: (pool, None))
+    with app.app_context():
+        assert image_jobs.submit_variants("ab" * 32) is True
+        assert image_jobs.submit_variants("ab" * 32) is True
+        assert len(pool.calls) == 1
+        assert pool.calls[0][0] is image_jobs.variants_job
+
+        # setelah selesai digest boleh diantrekan lagi (mis. varian dihapus)
+        pool.futures[0].set_result(None)
+        assert image_jobs.submit_variants("ab" * 32) is True
+        assert len(pool.calls) == 2
+
+
+def test_submit_variants_inline_without_workers(app, monkeypatch):
+    app.config.update(IMAGE_WORKERS=0)
+    made = []
+    monkeypatch.setattr(image_jobs, "make_variants", made.append)
+    with app.app_context():
+        assert image_jobs.submit_variants("cd" * 32) is False
+    assert made == ["cd" * 32]
+
+
+def test_missing_variant_falls_back_to_original(app, monkeypatch, tmp_path):
+    from models import image_store
+
+    app.config.update(IMAGE_WORKERS=0, IMAGE_STORE_DIR=str(tmp_path), IMAGE_SENDFILE="")
+    with app.app_context():
+        digest = image_store.get_store().put(b"gambar asli")
+    monkeypatch.setattr(image_store, "image_info", lambda kind, key: (digest, "image/webp"))
+    # pembuatan varian inline gagal: tidak ada file varian yang ditulis
+    monkeypatch.setattr(image_jobs, "submit_variants", lambda digest: False)
+
+    with app.test_request_context("/?w=160", headers={"Accept": "image/webp"}):
+        resp = image_store.send_image("makanan", 1)
+        resp.direct_passthrough = False
+        assert resp.status_code == 200
+        assert resp.get_data() == b"gambar asli"
+        assert resp.cache_control.no_cache
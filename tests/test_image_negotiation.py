@@ -0,0 +1,48 @@
+import pytest
+
+from models import image_store
+
+
+@pytest.fixture
+def accept(app, monkeypatch):
+    """negotiate(fmt) untuk header Accept tertentu, dengan AVIF + JPEG sebagai alternatif."""
+    monkeypatch.setattr(image_store, "alt_formats", lambda: ("AVIF", "JPEG"))
+
+    def run(header, fmt="WEBP"):
+        with app.test_request_context(headers={"Accept": header}):
+            return image_store.negotiate(fmt)
+
+    return run
+
+
+def test_avif_preferred_when_listed(accept):
+    assert accept("image/avif,image/webp,*/*;q=0.8") == "AVIF"
+
+
+def test_webp_original_kept_for_webp_clients(accept):
+    assert accept("image/webp,*/*;q=0.8") is None
+
+
+def test_wildcard_only_gets_jpeg(accept):
+    # */* saja tidak dipercaya untuk WEBP (webview lama)
+    assert accept("*/*") == "JPEG"
+
+
+def test_refused_avif_is_skipped(accept):
+    assert accept("image/avif;q=0,image/webp") is None
+
+
+def test_universal_original_needs_no_alternative(accept):
+    assert accept("*/*", fmt="JPEG") is None
+    assert accept("image/webp,*/*", fmt="PNG") is None
+
+
+def test_unknown_format_is_sent_as_is(accept):
+    assert accept("image/avif,*/*", fmt="GIF") is None
+    assert accept("image/avif,*/*", fmt=None) is None
+
+
+def test_no_alternatives_configured(app, monkeypatch):
+    monkeypatch.setattr(image_store, "alt_formats", lambda: ())
+    with app.test_request_context(headers={"Accept": "image/avif,*/*"}):
+        assert image_store.negotiate("WEBP") is None
@@ -0,0 +1,71 @@
+from models.migrations import _should_skip, split_statements
+
+
+class SchemaCursor:
+    """Cursor dictionary palsu yang menjawab query information_schema dari `indexes` / `columns`."""
+
+    def __init__(self, indexes=None, columns=()):
+        self.indexes = indexes or {}
+        self.columns = set(columns)
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        if "information_schema.STATISTICS" in sql:
+            (table,) = params
+            self._rows = [
+                {"INDEX_NAME": name, "COLUMN_NAME": col}
+                for name, cols in self.indexes.get(table, {}).items() for col in cols
+            ]
+        elif "information_schema.COLUMNS" in sql:
+            self._rows = [{"1": 1}] if tuple(params) in self.columns else []
+        else:
+            raise AssertionError(f"query tak terduga: {sql}")
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+
+def test_create_index_runs_when_missing():
+    cur = SchemaCursor({"Makanan": {"PRIMARY": ["IdMakanan"]}})
+    assert _should_skip(cur, "CREATE INDEX idx_makanan_terjual ON Makanan (Terjual)") is None
+
+
+def test_create_index_skipped_when_name_exists():
+    cur = SchemaCursor({"Makanan": {"idx_makanan_terjual": ["Terjual"]}})
+    assert "sudah ada" in _should_skip(cur, "CREATE INDEX idx_makanan_terjual ON Makanan (Terjual)")
+
+
+def test_create_index_skipped_when_prefix_covered():
+    cur = SchemaCursor({"Pesanan": {"fk_pesanan_warung": ["IdPesananWarung", "IdMakanan"]}})
+    reason = _should_skip(cur, "CREATE INDEX idx_pesanan_pw ON Pesanan (IdPesananWarung)")
+    assert "fk_pesanan_warung" in reason
+
+
+def test_create_index_not_covered_by_other_leading_column():
+    cur = SchemaCursor({"Pesanan": {"fk_pesanan_makanan": ["IdMakanan", "IdPesananWarung"]}})
+    assert _should_skip(cur, "CREATE INDEX idx_pesanan_pw ON Pesanan (IdPesananWarung)") is None
+
+
+def test_add_column_skipped_when_column_exists():
+    cur = SchemaCursor(columns=[("Makanan", "Terjual")])
+    sql = "ALTER TABLE Makanan ADD COLUMN Terjual INT NOT NULL DEFAULT 0"
+    assert _should_skip(cur, sql) == "kolom Makanan.Terjual sudah ada"
+    assert _should_skip(SchemaCursor(), sql) is None
+
+
+def test_add_index_and_multi_column_alter_are_not_guarded():
+    cur = SchemaCursor(columns=[("T", "a")])
+    assert _should_skip(cur, "ALTER TABLE T ADD INDEX a (a)") is None
+    assert _should_skip(cur, "ALTER TABLE T ADD COLUMN a INT, ADD COLUMN b INT") is None
+
+
+def test_other_statements_run():
+    assert _should_skip(SchemaCursor(), "UPDATE Makanan SET Terjual = 0 WHERE Terjual IS NULL") is None
+
+
+def test_split_statements_drops_comments():
+    sql = "-- komentar\nALTER TABLE A ADD COLUMN b INT;\n\nUPDATE A\n  SET b = 1;\n"
+    assert split_statements(sql) == ["ALTER TABLE A ADD COLUMN b INT", "UPDATE A\n  SET b = 1"]
@@ -0,0 +1,118 @@
+from decimal import Decimal
+
+import pytest
+
+from models import Makanan as makanan_module
+from models import db as models_db
+from models import query_stats
+from models.Makanan import Makanan
+from models.query_stats import instrument_cursor
+
+from conftest import FakeCursor
+
+NASI_GORENG = {
+    "IdMakanan": 5, "IdWarung": 2, "NamaMakanan": "Nasi Goreng", "HargaMakanan": Decimal("15000"),
+    "DetailMakanan": "", "Rating": 0, "Stok": 10, "MimeGambarMakanan": None,
+    "SizeGambarMakanan": None, "HashGambarMakanan": None, "AdaGambar": 0, "LqipMakanan": None,
+}
+
+
+@pytest.fixture
+def client():
+    from app import app
+
+    app.config.update(TESTING=True, CART_USE_DB=False)
+    with app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess["user"] = {"IdPengguna": 42, "Peran": "pembeli"}
+        yield client
+    app.config["CART_USE_DB"] = False
+
+
+def test_budget_counts_statements(query_budget):
+    cur = instrument_cursor(FakeCursor())
+    with query_budget(2) as executed:
+        cur.execute("SELECT 1 FROM Makanan WHERE IdMakanan=%s", (1,))
+        cur.execute("SELECT 1 FROM Makanan WHERE IdMakanan=%s", (2,))
+    assert executed == ["SELECT ? FROM Makanan WHERE IdMakanan=?"] * 2
+
+
+def test_budget_exceeded_fails_test(query_budget):
+    cur = instrument_cursor(FakeCursor())
+    with pytest.raises(pytest.fail.Exception, match="3 query dijalankan, batas 2"):
+        with query_budget(2):
+            for i in range(3):
+                cur.execute("SELECT 1 FROM Makanan WHERE IdMakanan=%s", (i,))
+
+
+def test_transaction_control_not_counted(query_budget):
+    cur = instrument_cursor(FakeCursor())
+    with query_budget(1):
+        cur.execute("SAVEPOINT uow_1")
+        cur.execute("UPDATE Makanan SET Stok=Stok-1 WHERE IdMakanan=%s", (1,))
+        cur.execute("RELEASE SAVEPOINT uow_1")
+        cur.execute("COMMIT")
+
+
+def test_get_by_ids_is_one_query(app, fake_db, query_budget):
+    conn = fake_db(makanan_module, rows=[])
+    with app.test_request_context(), query_budget(1):
+        assert Makanan().get_by_ids([3, 1, 2]) == {}
+    (sql, params), = conn.cursors[0].executed
+    assert "IN (%s,%s,%s)" in sql
+    assert params == (3, 1, 2)
+
+
+def test_get_by_ids_without_ids_skips_db(app, fake_db, query_budget):
+    fake_db(makanan_module)
+    with app.test_request_context(), query_budget(0):
+        assert Makanan().get_by_ids([]) == {}
+
+
+def test_cart_add_route_budget(client, fake_pool, query_budget):
+    # normalize_item + check_stock memakai satu baris Makanan yang sama
+    conn = fake_pool(client.application, rows=[NASI_GORENG])
+    with query_budget(1):
+        res = client.post("/keranjang/tambah", json={"id_makanan": 5, "qty": 2})
+    assert res.status_code == 200, res.get_json()
+    assert res.get_json()["cart"]["2"][0]["qty"] == 2
+    assert conn.log == ["COMMIT"]
+
+
+def test_cart_add_route_budget_with_db_cart(client, fake_pool, query_budget):
+    client.application.config["CART_USE_DB"] = True
+    conn = fake_pool(client.application, rows=[NASI_GORENG])
+    # 1 cek makanan, 2 hapus keranjang lama, 1 makanan keranjang (IN), 2 hapus, 2 insert
+    with query_budget(8):
+        res = client.post("/keranjang/tambah", json={"id_makanan": 5, "qty": 1})
+    assert res.status_code == 200, res.get_json()
+    assert sum(sql.startswith("INSERT") for sql in conn.executed()) == 2
+
+
+def test_cart_add_route_over_budget_fails(client, fake_pool, query_budget):
+    fake_pool(client.application, rows=[NASI_GORENG])
+    with pytest.raises(pytest.fail.Exception, match="batas 0"):
+        with query_budget(0):
+            client.post("/keranjang/tambah", json={"id_makanan": 5})
+
+
+def test_repeated_query_in_raise_mode_rolls_back(app, fake_pool):
+    models_db.init_app(app)
+    app.config["SQL_REPEAT_DETECTION"] = "raise"
+    conn = fake_pool(app)
+
+    @app.route("/n-plus-1")
+    def n_plus_1():
+        db = models_db.get_db_connection()
+        cur = db.cursor()
+        cur.execute("UPDATE Makanan SET Stok=Stok-1 WHERE IdMakanan=%s", (1,))
+        try:
+            for i in range(3):
+                cur.execute("SELECT Stok FROM Makanan WHERE IdMakanan=%s", (i,))
+        except query_stats.RepeatedQueryError:
+            pass  # ditelan model, tetap dilaporkan di after_request
+        return "ok"
+
+    with pytest.raises(query_stats.RepeatedQueryError):
+        app.test_client().get("/n-plus-1")
+    assert conn.log == ["ROLLBACK"]
@@ -0,0 +1,174 @@
+import pytest
+from mysql.connector import errorcode
+from mysql.connector import errors as mysql_errors
+
+from models import retry
+from models.db import RequestConnection, after_commit
+from models.retry import transactional_retry
+
+
+class RawCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.on_write = None
+
+    def execute(self, sql, params=None):
+        if self.conn.lost and sql.startswith("ROLLBACK TO"):
+            raise mysql_errors.DatabaseError(msg="SAVEPOINT does not exist", errno=1305)
+        self.conn.log.append(sql)
+        if sql.startswith(("INSERT", "UPDATE", "DELETE")) and self.on_write:
+            self.on_write()
+
+    def close(self):
+        pass
+
+
+class RawConnection:
+    """Koneksi mysql palsu yang mencatat SQL dan commit/rollback."""
+
+    def __init__(self):
+        self.log = []
+        self.in_transaction = False
+        self.lost = False  # savepoint hilang di server (deadlock)
+
+    def cursor(self, *args, **kwargs):
+        return RawCursor(self)
+
+    def start_transaction(self):
+        self.in_transaction = True
+
+    def commit(self):
+        self.log.append("COMMIT")
+
+    def rollback(self):
+        self.log.append("ROLLBACK")
+
+    def close(self):
+        pass
+
+
+def _deadlock():
+    return mysql_errors.DatabaseError(msg="Deadlock found", errno=errorcode.ER_LOCK_DEADLOCK)
+
+
+@pytest.fixture
+def unit():
+    return RequestConnection(RawConnection())
+
+
+def test_model_rollback_only_undoes_its_block(unit):
+    unit.cursor().execute("INSERT INTO A VALUES (1)")
+    unit.start_transaction()
+    unit.cursor().execute("INSERT INTO B VALUES (1)")
+    unit.rollback()
+    assert unit._conn.log[-1] == "ROLLBACK TO SAVEPOINT uow_1"
+    assert not unit.failed
+    assert unit.finish(True) is True
+
+
+def test_model_commit_releases_savepoint(unit):
+    unit.start_transaction()
+    unit.cursor().execute("UPDATE A SET x=1")
+    unit.commit()
+    assert unit._conn.log[-1] == "RELEASE SAVEPOINT uow_1"
+    assert unit.finish(True) is True
+
+
+def test_rollback_without_savepoint_fails_whole_unit(unit):
+    unit.cursor().execute("INSERT INTO A VALUES (1)")
+    unit.rollback()
+    assert unit.failed
+    raw = unit._conn
+    assert unit.finish(True) is False
+    assert "COMMIT" not in raw.log
+
+
+def test_read_only_unit_is_not_reported_as_committed(unit):
+    unit.cursor().execute("SELECT 1")
+    assert unit.finish(True) is False
+
+
+def test_retry_reruns_fresh_unit_after_deadlock(unit, monkeypatch):
+    monkeypatch.setattr(retry, "_request_unit", lambda: unit)
+    monkeypatch.setattr(retry.time, "sleep", lambda s: None)
+    calls = []
+
+    @transactional_retry
+    def kerja():
+        calls.append(1)
+        unit.cursor().execute("UPDATE Makanan SET Stok=Stok-1")
+        if len(calls) == 1:
+            unit._conn.lost = True
+            raise _deadlock()
+        return "ok"
+
+    assert kerja() == "ok"
+    assert len(calls) == 2
+    assert not unit.failed
+    assert unit.finish(True) is True
+
+
+def test_retry_does_not_rerun_after_earlier_writes(unit, monkeypatch):
+    monkeypatch.setattr(retry, "_request_unit", lambda: unit)
+    unit.cursor().execute("INSERT INTO A VALUES (1)")
+    calls = []
+
+    @transactional_retry
+    def kerja():
+        calls.append(1)
+        unit._conn.lost = True
+        raise _deadlock()
+
+    with pytest.raises(mysql_errors.DatabaseError):
+        kerja()
+    assert len(calls) == 1
+    assert unit.failed
+    assert unit.finish(True) is False
+
+
+def test_after_commit_runs_only_after_commit(unit):
+    done = []
+    unit.cursor().execute("UPDATE Makanan SET HashGambarMakanan='b'")
+    unit.after_commit(lambda: done.append(unit._conn))
+    assert done == []
+    assert unit.finish(True) is True
+    assert done == [None]  # koneksi sudah dilepas saat callback jalan
+
+
+def test_after_commit_dropped_on_rollback(unit):
+    done = []
+    unit.after_commit(lambda: done.append("request"))
+    unit.finish(False)
+    assert done == []
+
+
+def test_after_commit_of_rolled_back_block_is_dropped(unit):
+    done = []
+    unit.after_commit(lambda: done.append("luar"))
+    unit.start_transaction()
+    unit.after_commit(lambda: done.append("blok"))
+    unit.rollback()
+    unit.start_transaction()
+    unit.after_commit(lambda: done.append("blok 2"))
+    unit.commit()
+    unit.finish(True)
+    assert done == ["luar", "blok 2"]
+
+
+def test_after_commit_failure_does_not_break_finish(unit):
+    done = []
+
+    def gagal():
+        raise RuntimeError("antrean penuh")
+
+    unit.after_commit(gagal)
+    unit.after_commit(lambda: done.append(1))
+    unit.cursor().execute("INSERT INTO A VALUES (1)")
+    assert unit.finish(True) is True
+    assert done == [1]
+
+
+def test_after_commit_outside_request_runs_now():
+    done = []
+    after_commit(RawConnection(), lambda: done.append(1))
+    assert done == [1]
@@ -0,0 +1,73 @@
+import pytest
+from mysql.connector import errorcode
+from mysql.connector import errors as mysql_errors
+
+from models import retry
+from models.retry import backoff_delay, is_retryable, transactional_retry
+
+
+def _error(errno):
+    return mysql_errors.DatabaseError(msg="x", errno=errno)
+
+
+def test_is_retryable():
+    assert is_retryable(_error(errorcode.ER_LOCK_DEADLOCK))
+    assert is_retryable(_error(errorcode.ER_LOCK_WAIT_TIMEOUT))
+    assert not is_retryable(_error(errorcode.ER_DUP_ENTRY))
+    assert not is_retryable(ValueError("deadlock"))
+
+
+def test_backoff_delay_bounds(monkeypatch):
+    # uniform(0, batas): kembalikan batas atas supaya terlihat pertumbuhannya
+    monkeypatch.setattr(retry.random, "uniform", lambda low, high: high)
+    assert backoff_delay(1, 0.05, 1.0) == pytest.approx(0.05)
+    assert backoff_delay(2, 0.05, 1.0) == pytest.approx(0.1)
+    assert backoff_delay(4, 0.05, 1.0) == pytest.approx(0.4)
+    assert backoff_delay(10, 0.05, 1.0) == pytest.approx(1.0)
+
+
+def test_backoff_delay_is_never_negative():
+    for attempt in range(1, 8):
+        assert 0 <= backoff_delay(attempt, 0.05, 1.0) <= 1.0
+
+
+def test_retries_deadlock_then_succeeds(monkeypatch):
+    monkeypatch.setattr(retry.time, "sleep", lambda s: None)
+    calls = []
+
+    @transactional_retry(attempts=3)
+    def kerja():
+        calls.append(1)
+        if len(calls) < 3:
+            raise _error(errorcode.ER_LOCK_DEADLOCK)
+        return "ok"
+
+    assert kerja() == "ok"
+    assert len(calls) == 3
+
+
+def test_gives_up_after_attempts(monkeypatch):
+    monkeypatch.setattr(retry.time, "sleep", lambda s: None)
+    calls = []
+
+    @transactional_retry(attempts=2)
+    def kerja():
+        calls.append(1)
+        raise _error(errorcode.ER_LOCK_WAIT_TIMEOUT)
+
+    with pytest.raises(mysql_errors.DatabaseError):
+        kerja()
+    assert len(calls) == 2
+
+
+def test_other_errors_are_not_retried():
+    calls = []
+
+    @transactional_retry
+    def kerja():
+        calls.append(1)
+        raise ValueError("stok tidak cukup")
+
+    with pytest.raises(ValueError):
+        kerja()
+    assert len(calls) == 1